@@ -1,7 +1,7 @@
 """Management command to test AI service connection."""
 
 from django.core.management.base import BaseCommand
-from apps.core.services.ai_service import AIService
+from apps.core.services.ai_service import AIService, get_pool_stats
 
 
 class Command(BaseCommand):
@@ -29,6 +29,12 @@ class Command(BaseCommand):
                         f"Tokens used: input={result['usage']['input_tokens']}, "
                         f"output={result['usage']['output_tokens']}"
                     )
+                    # The second call should reuse the first one's connection
+                    stats = get_pool_stats()
+                    self.stdout.write(
+                        f"Connections: {stats['connections_opened']} opened, "
+                        f"{stats['connections_reused']} reused"
+                    )
                 else:
                     self.stdout.write(
                         self.style.ERROR(f"❌ Test failed: {result.get('error')}")
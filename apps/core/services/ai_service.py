@@ -1,12 +1,213 @@
 """AI Service for Claude SDK integration."""
 
-from typing import Optional, Dict, Any
+from typing import (
+    Optional,
+    Dict,
+    Any,
+    Tuple,
+    List,
+    Iterable,
+    Iterator,
+    AsyncIterator,
+    Awaitable,
+    TypeVar,
+)
+import asyncio
 import logging
-from anthropic import Anthropic
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import httpx
+from anthropic import (
+    Anthropic,
+    AsyncAnthropic,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    Timeout,
+)
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Defaults for AI_CONFIG keys that may be missing
+DEFAULT_TIMEOUT = 30
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_POOL_TIMEOUT = 10
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 60
+DEFAULT_MAX_CONCURRENT_REQUESTS = 4
+
+T = TypeVar("T")
+
+
+class PoolStats:
+    """Thread-safe counters of requests and new connections of pooled clients.
+
+    Connections are counted through httpcore's trace hook, so requests minus
+    connections opened is the number served on a kept-alive connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.clients = 0
+            self.requests = 0
+            self.connections_opened = 0
+
+    def _add(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def on_request(self, request: httpx.Request) -> None:
+        self._add("requests")
+        request.extensions["trace"] = self._trace
+
+    async def on_async_request(self, request: httpx.Request) -> None:
+        self._add("requests")
+        request.extensions["trace"] = self._atrace
+
+    def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self._add("connections_opened")
+
+    async def _atrace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self._trace(event_name, info)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(self.requests - self.connections_opened, 0)
+            return {
+                "clients": self.clients,
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connections_reused": reused,
+                "reuse_ratio": reused / self.requests if self.requests else None,
+            }
+
+
+pool_stats = PoolStats()
+
+# One client per process and configuration; each owns a connection pool
+_clients: Dict[Tuple, Anthropic] = {}
+# Async connections belong to the event loop that opened them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict]" = (
+    weakref.WeakKeyDictionary()
+)
+_clients_lock = threading.Lock()
+
+
+def _client_options(config: Dict[str, Any]) -> Tuple:
+    return (
+        # A forked worker must not share its parent's sockets
+        os.getpid(),
+        config["ANTHROPIC_API_KEY"],
+        config.get("TIMEOUT", DEFAULT_TIMEOUT),
+        config.get("CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+        config.get("POOL_TIMEOUT", DEFAULT_POOL_TIMEOUT),
+        config.get("MAX_RETRIES", DEFAULT_MAX_RETRIES),
+        config.get("MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS),
+        config.get("MAX_KEEPALIVE_CONNECTIONS", DEFAULT_MAX_KEEPALIVE_CONNECTIONS),
+        config.get("KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY),
+    )
+
+
+def get_client() -> Anthropic:
+    """Return the process-wide Anthropic client, creating it on first use.
+
+    The client keeps connections alive between calls, so only the first
+    request of a process (or after KEEPALIVE_EXPIRY idle seconds) pays for
+    the TCP and TLS handshake. Reads and writes time out after TIMEOUT
+    seconds, connecting after CONNECT_TIMEOUT and waiting for a free pooled
+    connection after POOL_TIMEOUT; failed calls are retried MAX_RETRIES times.
+    """
+    options = _client_options(settings.AI_CONFIG)
+    client = _clients.get(options)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(options)
+            if client is None:
+                client = _clients[options] = _build_client(*options[1:])
+                pool_stats._add("clients")
+    return client
+
+
+def get_async_client() -> AsyncAnthropic:
+    """Return the AsyncAnthropic client of the running event loop.
+
+    Configured and pooled like get_client(). Each event loop gets its own
+    client, which is dropped with the loop.
+    """
+    loop = asyncio.get_running_loop()
+    options = _client_options(settings.AI_CONFIG)
+    with _clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(options)
+        if client is None:
+            client = clients[options] = _build_client(*options[1:], use_async=True)
+            pool_stats._add("clients")
+    return client
+
+
+def _build_client(
+    api_key: str,
+    timeout: float,
+    connect_timeout: float,
+    pool_timeout: float,
+    max_retries: int,
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry: float,
+    use_async: bool = False,
+):
+    logger.info(
+        f"Creating {'async ' if use_async else ''}Anthropic client for process "
+        f"{os.getpid()} ({max_connections} connections, {timeout}s timeout)"
+    )
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    if use_async:
+        http_client = DefaultAsyncHttpxClient(
+            limits=limits, event_hooks={"request": [pool_stats.on_async_request]}
+        )
+        client_class = AsyncAnthropic
+    else:
+        http_client = DefaultHttpxClient(
+            limits=limits, event_hooks={"request": [pool_stats.on_request]}
+        )
+        client_class = Anthropic
+    return client_class(
+        api_key=api_key,
+        timeout=Timeout(timeout, connect=connect_timeout, pool=pool_timeout),
+        max_retries=max_retries,
+        http_client=http_client,
+    )
+
+
+def close_clients() -> None:
+    """Close every pooled client, e.g. before a process exits.
+
+    Async clients can only be closed on their event loop; they are dropped.
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _async_clients.clear()
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Requests sent and connections opened by pooled clients in this process."""
+    return pool_stats.snapshot()
+
 
 class AIService:
     """Base service for AI interactions using Anthropic Claude SDK."""
@@ -18,10 +219,48 @@ class AIService:
         if not settings.AI_CONFIG["ANTHROPIC_API_KEY"]:
             raise ValueError("ANTHROPIC_API_KEY not configured")
 
-        self.client = Anthropic(api_key=settings.AI_CONFIG["ANTHROPIC_API_KEY"])
+        # Shared, so connections are reused across calls
+        self.client = self._shared_client()
         self.model = settings.AI_CONFIG["MODEL"]
         self.max_tokens = settings.AI_CONFIG["MAX_TOKENS"]
 
+    def _shared_client(self):
+        return get_client()
+
+    def _message_kwargs(self, prompt: str, system: Optional[str]) -> Dict[str, Any]:
+        logger.debug(f"Sending message to Claude API with model: {self.model}")
+        logger.debug(f"Prompt length: {len(prompt)} characters")
+
+        messages = [{"role": "user", "content": prompt}]
+
+        kwargs = {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "messages": messages,
+        }
+
+        if system:
+            kwargs["system"] = system
+            logger.debug(f"Using system prompt: {system[:100]}...")
+        return kwargs
+
+    def _message_result(self, message) -> Dict[str, Any]:
+        response_text = message.content[0].text if message.content else ""
+        logger.debug(f"Response received: {response_text[:100]}...")
+        logger.info(
+            f"Tokens used: input={message.usage.input_tokens}, "
+            f"output={message.usage.output_tokens}"
+        )
+
+        return {
+            "success": True,
+            "content": response_text,
+            "usage": {
+                "input_tokens": message.usage.input_tokens,
+                "output_tokens": message.usage.output_tokens,
+            },
+        }
+
     def send_message(self, prompt: str, system: Optional[str] = None) -> Dict[str, Any]:
         """
         Send a message to Claude and return the response.
@@ -34,44 +273,142 @@ class AIService:
             Dict containing success status, content, and usage info
         """
         try:
-            logger.debug(f"Sending message to Claude API with model: {self.model}")
-            logger.debug(f"Prompt length: {len(prompt)} characters")
+            message = self.client.messages.create(
+                **self._message_kwargs(prompt, system)
+            )
+            return self._message_result(message)
 
-            messages = [{"role": "user", "content": prompt}]
+        except Exception as e:
+            logger.error(f"AI Service error: {str(e)}")
+            return {"success": False, "error": str(e), "content": None}
 
-            kwargs = {
-                "model": self.model,
-                "max_tokens": self.max_tokens,
-                "messages": messages,
-            }
+    def _concurrency(self, concurrency: Optional[int]) -> int:
+        if concurrency is None:
+            concurrency = settings.AI_CONFIG.get(
+                "MAX_CONCURRENT_REQUESTS", DEFAULT_MAX_CONCURRENT_REQUESTS
+            )
+        return max(1, concurrency)
 
-            if system:
-                kwargs["system"] = system
-                logger.debug(f"Using system prompt: {system[:100]}...")
+    def send_messages(
+        self,
+        prompts: Iterable[str],
+        system: Optional[str] = None,
+        concurrency: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Send many prompts concurrently, at most ``concurrency`` at a time.
 
-            message = self.client.messages.create(**kwargs)
+        Defaults to AI_CONFIG's MAX_CONCURRENT_REQUESTS. Results are in the
+        order of ``prompts``; failures are reported per prompt as in
+        send_message().
+        """
+        prompts = list(prompts)
+        results: List[Dict[str, Any]] = [{}] * len(prompts)
+        for index, result in self.iter_messages(prompts, system, concurrency):
+            results[index] = result
+        return results
 
-            response_text = message.content[0].text if message.content else ""
-            logger.debug(f"Response received: {response_text[:100]}...")
-            logger.info(
-                f"Tokens used: input={message.usage.input_tokens}, "
-                f"output={message.usage.output_tokens}"
-            )
+    def iter_messages(
+        self,
+        prompts: Iterable[str],
+        system: Optional[str] = None,
+        concurrency: Optional[int] = None,
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Like send_messages(), but yield ``(index, result)`` as replies arrive."""
+        prompts = list(prompts)
+        if len(prompts) < 2:
+            for index, prompt in enumerate(prompts):
+                yield index, self.send_message(prompt, system)
+            return
 
-            return {
-                "success": True,
-                "content": response_text,
-                "usage": {
-                    "input_tokens": message.usage.input_tokens,
-                    "output_tokens": message.usage.output_tokens,
-                },
+        # The pooled client is thread-safe; calls share its connections
+        with ThreadPoolExecutor(
+            max_workers=min(self._concurrency(concurrency), len(prompts)),
+            thread_name_prefix="ai",
+        ) as pool:
+            futures = {
+                pool.submit(self.send_message, prompt, system): index
+                for index, prompt in enumerate(prompts)
             }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def test_connection(self) -> bool:
+        """Test if the AI service is properly configured and working."""
+        result = self.send_message("Say 'OK' if you receive this.")
+        return result.get("success", False)
+
+
+async def bounded_gather(
+    aws: Iterable[Awaitable[T]], limit: int, return_exceptions: bool = False
+) -> List[T]:
+    """Like ``asyncio.gather``, but awaits at most ``limit`` at a time.
+
+    Results are returned in the order of ``aws``.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw: Awaitable[T]) -> T:
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(
+        *(run(aw) for aw in aws), return_exceptions=return_exceptions
+    )
+
+
+class AsyncAIService(AIService):
+    """AIService on AsyncAnthropic, for async views under ASGI.
+
+    Must be created inside a running event loop. Several prompts can be sent
+    at once with send_messages().
+    """
+
+    def _shared_client(self):
+        return get_async_client()
+
+    async def send_message(  # type: ignore[override]
+        self, prompt: str, system: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Async send_message(); returns the same dict."""
+        try:
+            message = await self.client.messages.create(
+                **self._message_kwargs(prompt, system)
+            )
+            return self._message_result(message)
 
         except Exception as e:
             logger.error(f"AI Service error: {str(e)}")
             return {"success": False, "error": str(e), "content": None}
 
-    def test_connection(self) -> bool:
-        """Test if the AI service is properly configured and working."""
-        result = self.send_message("Say 'OK' if you receive this.")
+    async def send_messages(  # type: ignore[override]
+        self,
+        prompts: Iterable[str],
+        system: Optional[str] = None,
+        concurrency: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Async send_messages(); concurrency is bounded with a semaphore."""
+        return await bounded_gather(
+            (self.send_message(prompt, system) for prompt in prompts),
+            self._concurrency(concurrency),
+        )
+
+    async def iter_messages(  # type: ignore[override]
+        self,
+        prompts: Iterable[str],
+        system: Optional[str] = None,
+        concurrency: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """Async iter_messages(); concurrency is bounded with a semaphore."""
+        semaphore = asyncio.Semaphore(self._concurrency(concurrency))
+
+        async def send(index: int, prompt: str) -> Tuple[int, Dict[str, Any]]:
+            async with semaphore:
+                return index, await self.send_message(prompt, system)
+
+        sends = [send(index, prompt) for index, prompt in enumerate(prompts)]
+        for next_result in asyncio.as_completed(sends):
+            yield await next_result
+
+    async def test_connection(self) -> bool:  # type: ignore[override]
+        result = await self.send_message("Say 'OK' if you receive this.")
         return result.get("success", False)
@@ -1,8 +1,30 @@
 """Unit tests for AI Service."""
 
+import asyncio
+import threading
+
+import httpx
 import pytest
-from unittest.mock import patch, MagicMock
-from apps.core.services.ai_service import AIService
+from unittest.mock import AsyncMock, patch, MagicMock
+from anthropic import Timeout
+from apps.core.services.ai_service import (
+    AIService,
+    AsyncAIService,
+    bounded_gather,
+    close_clients,
+    get_client,
+    get_pool_stats,
+    pool_stats,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    """Each test builds its own pooled client."""
+    close_clients()
+    pool_stats.reset()
+    yield
+    close_clients()
 
 
 class TestAIService:
@@ -197,4 +219,237 @@ class TestAIService:
         result = service.test_connection()
 
         # Assertions
-        assert result is False
\ No newline at end of file
+        assert result is False
+
+AI_CONFIG = {
+    'ENABLED': True,
+    'ANTHROPIC_API_KEY': 'test-key',
+    'MODEL': 'test-model',
+    'MAX_TOKENS': 100,
+    'TIMEOUT': 30,
+    'CONNECT_TIMEOUT': 5,
+    'POOL_TIMEOUT': 10,
+    'MAX_RETRIES': 1,
+    'MAX_CONNECTIONS': 8,
+    'MAX_KEEPALIVE_CONNECTIONS': 4,
+    'KEEPALIVE_EXPIRY': 60,
+}
+
+
+@patch('apps.core.services.ai_service.DefaultHttpxClient')
+@patch('apps.core.services.ai_service.Anthropic')
+@patch('apps.core.services.ai_service.settings')
+class TestClientPool:
+    """The Anthropic client is built once per process and configuration."""
+
+    def test_services_share_one_configured_client(
+        self, mock_settings, mock_anthropic, mock_http_client
+    ):
+        mock_settings.AI_CONFIG = AI_CONFIG
+
+        first, second = AIService(), AIService()
+
+        assert first.client is second.client
+        mock_anthropic.assert_called_once_with(
+            api_key='test-key',
+            timeout=Timeout(30, connect=5, pool=10),
+            max_retries=1,
+            http_client=mock_http_client.return_value,
+        )
+        limits = mock_http_client.call_args.kwargs['limits']
+        assert limits == httpx.Limits(
+            max_connections=8, max_keepalive_connections=4, keepalive_expiry=60
+        )
+        assert get_pool_stats()['clients'] == 1
+
+    def test_changed_settings_and_forked_processes_get_new_clients(
+        self, mock_settings, mock_anthropic, mock_http_client
+    ):
+        mock_anthropic.side_effect = lambda **kwargs: MagicMock()
+        mock_settings.AI_CONFIG = AI_CONFIG
+        client = get_client()
+
+        mock_settings.AI_CONFIG = {**AI_CONFIG, 'TIMEOUT': 60}
+        assert get_client() is not client
+
+        mock_settings.AI_CONFIG = AI_CONFIG
+        with patch('apps.core.services.ai_service.os.getpid', return_value=-1):
+            assert get_client() is not client
+        assert get_client() is client
+
+    def test_concurrent_first_use_builds_one_client(
+        self, mock_settings, mock_anthropic, mock_http_client
+    ):
+        mock_settings.AI_CONFIG = AI_CONFIG
+        clients = []
+        threads = [
+            threading.Thread(target=lambda: clients.append(get_client()))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(clients) == 8
+        mock_anthropic.assert_called_once()
+
+
+class TestPoolStats:
+
+    def test_requests_without_a_new_connection_count_as_reused(self):
+        for _ in range(3):
+            request = httpx.Request('POST', 'https://api.anthropic.com/v1/messages')
+            pool_stats.on_request(request)
+        request.extensions['trace']('connection.connect_tcp.complete', {})
+
+        assert get_pool_stats() == {
+            'clients': 0,
+            'requests': 3,
+            'connections_opened': 1,
+            'connections_reused': 2,
+            'reuse_ratio': 2 / 3,
+        }
+
+
+@patch('apps.core.services.ai_service.DefaultHttpxClient')
+@patch('apps.core.services.ai_service.Anthropic')
+@patch('apps.core.services.ai_service.settings')
+def test_send_messages_runs_prompts_in_parallel_threads(
+    mock_settings, mock_anthropic, mock_http_client
+):
+    """Prompts share the pooled client, at most MAX_CONCURRENT_REQUESTS at once."""
+    mock_settings.AI_CONFIG = {**AI_CONFIG, 'MAX_CONCURRENT_REQUESTS': 2}
+    lock = threading.Lock()
+    in_flight = peak = 0
+
+    def create(**kwargs):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        threading.Event().wait(0.02)
+        with lock:
+            in_flight -= 1
+        message = MagicMock()
+        message.content = [MagicMock(text=kwargs['messages'][0]['content'])]
+        message.usage.input_tokens = 1
+        message.usage.output_tokens = 1
+        return message
+
+    mock_anthropic.return_value.messages.create.side_effect = create
+
+    results = AIService().send_messages(['a', 'b', 'c', 'd'])
+
+    assert [result['content'] for result in results] == ['a', 'b', 'c', 'd']
+    assert peak == 2
+    mock_anthropic.assert_called_once()
+
+
+@patch('apps.core.services.ai_service.DefaultHttpxClient')
+@patch('apps.core.services.ai_service.Anthropic')
+@patch('apps.core.services.ai_service.settings')
+def test_iter_messages_yields_replies_as_they_arrive(
+    mock_settings, mock_anthropic, mock_http_client
+):
+    mock_settings.AI_CONFIG = AI_CONFIG
+
+    def create(**kwargs):
+        prompt = kwargs['messages'][0]['content']
+        if prompt == 'slow':
+            threading.Event().wait(0.05)
+        message = MagicMock()
+        message.content = [MagicMock(text=prompt)]
+        message.usage.input_tokens = 1
+        message.usage.output_tokens = 1
+        return message
+
+    mock_anthropic.return_value.messages.create.side_effect = create
+
+    replies = list(AIService().iter_messages(['slow', 'fast']))
+
+    assert [(index, reply['content']) for index, reply in replies] == [
+        (1, 'fast'),
+        (0, 'slow'),
+    ]
+
+
+@patch('apps.core.services.ai_service.DefaultAsyncHttpxClient')
+@patch('apps.core.services.ai_service.AsyncAnthropic')
+@patch('apps.core.services.ai_service.settings')
+class TestAsyncAIService:
+    """AsyncAIService sends prompts concurrently on AsyncAnthropic."""
+
+    def test_send_messages_keeps_order_and_limits_concurrency(
+        self, mock_settings, mock_anthropic, mock_http_client
+    ):
+        mock_settings.AI_CONFIG = {**AI_CONFIG, 'MAX_CONCURRENT_REQUESTS': 2}
+        in_flight = peak = 0
+
+        async def create(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            message = MagicMock()
+            message.content = [MagicMock(text=kwargs['messages'][0]['content'])]
+            message.usage.input_tokens = 1
+            message.usage.output_tokens = 1
+            return message
+
+        mock_anthropic.return_value.messages.create = create
+
+        async def send():
+            return await AsyncAIService().send_messages(['a', 'b', 'c', 'd', 'e'])
+
+        results = asyncio.run(send())
+
+        assert [result['content'] for result in results] == ['a', 'b', 'c', 'd', 'e']
+        assert peak == 2
+        assert mock_anthropic.call_args.kwargs['http_client'] == (
+            mock_http_client.return_value
+        )
+
+    def test_failures_are_reported_per_prompt(
+        self, mock_settings, mock_anthropic, mock_http_client
+    ):
+        mock_settings.AI_CONFIG = AI_CONFIG
+        mock_anthropic.return_value.messages.create = AsyncMock(
+            side_effect=Exception('Overloaded')
+        )
+
+        async def send():
+            return await AsyncAIService().send_messages(['a', 'b'])
+
+        results = asyncio.run(send())
+
+        assert results == [{'success': False, 'error': 'Overloaded', 'content': None}] * 2
+
+    def test_each_event_loop_gets_its_own_client(
+        self, mock_settings, mock_anthropic, mock_http_client
+    ):
+        mock_settings.AI_CONFIG = AI_CONFIG
+        mock_anthropic.side_effect = lambda **kwargs: MagicMock()
+
+        async def clients():
+            return AsyncAIService().client, AsyncAIService().client
+
+        first, second = asyncio.run(clients())
+        (third, _) = asyncio.run(clients())
+
+        assert first is second
+        assert third is not first
+
+
+def test_bounded_gather_returns_exceptions_when_asked():
+    async def fail():
+        raise ValueError('boom')
+
+    async def ok():
+        return 1
+
+    results = asyncio.run(bounded_gather([ok(), fail()], 1, return_exceptions=True))
+
+    assert results[0] == 1
+    assert isinstance(results[1], ValueError)
@@ -1,6 +1,6 @@
 from django.conf import settings
 from django.contrib import admin
-from .models import ExcelUpload, ExcelData
+from .models import ExcelBlob, ExcelUpload, ExcelData, IngestJob
 
 # TODO: Update to use consistent pattern with other apps:
 # if settings.DEBUG or getattr(settings, 'ADMIN_ENABLED', False):
@@ -35,3 +35,23 @@ if settings.DEBUG:
         list_display = ["upload", "sheet_name", "sheet_index", "row_count"]
         list_filter = ["upload__uploaded_at"]
         search_fields = ["upload__original_filename", "sheet_name"]
+
+    @admin.register(IngestJob)
+    class IngestJobAdmin(admin.ModelAdmin):
+        list_display = [
+            "upload",
+            "status",
+            "attempts",
+            "available_at",
+            "leased_by",
+            "leased_until",
+        ]
+        list_filter = ["status"]
+        search_fields = ["upload__original_filename", "leased_by"]
+        readonly_fields = ["created_at", "finished_at", "last_error"]
+
+    @admin.register(ExcelBlob)
+    class ExcelBlobAdmin(admin.ModelAdmin):
+        list_display = ["sha256", "size", "ref_count", "sheet_count", "parsed_at"]
+        search_fields = ["sha256"]
+        readonly_fields = ["sha256", "size", "ref_count", "created_at", "parsed_at"]
@@ -2,6 +2,7 @@ import magic
 from django import forms
 from django.core.exceptions import ValidationError
 from .models import ExcelUpload
+from .upload_handlers import MAGIC_HEADER_BYTES, MACRO_SIGNATURES
 
 
 class ExcelUploadForm(forms.ModelForm):
@@ -46,11 +47,16 @@ class ExcelUploadForm(forms.ModelForm):
                         f'Invalid file type. Allowed: {", ".join(self.ALLOWED_EXTENSIONS)}'
                     )
 
-            # Check magic bytes (actual file type, not just extension)
-            try:
-                file_mime = magic.from_buffer(excel_file.read(2048), mime=True)
+            # Check magic bytes (actual file type, not just extension).
+            # SinglePassUploadHandler captured these while the upload streamed in.
+            header = getattr(excel_file, "magic_header", None)
+            if header is None:
+                header = excel_file.read(MAGIC_HEADER_BYTES)
                 excel_file.seek(0)  # Reset file pointer
 
+            try:
+                file_mime = magic.from_buffer(header, mime=True)
+
                 if file_mime not in self.ALLOWED_MIME_TYPES:
                     raise ValidationError("Invalid Excel file format")
 
@@ -59,12 +65,12 @@ class ExcelUploadForm(forms.ModelForm):
 
             # Basic check for malicious content
             # Excel files with macros could be dangerous
-            excel_file.seek(0)
-            content = excel_file.read(1024)
-            excel_file.seek(0)
+            has_macros = getattr(excel_file, "has_macros", None)
+            if has_macros is None:
+                has_macros = any(sig in header for sig in MACRO_SIGNATURES)
 
             # Check for VBA macro signatures
-            if b"vbaProject" in content or b"_VBA_PROJECT" in content:
+            if has_macros:
                 raise ValidationError(
                     "Files with macros are not allowed for security reasons"
                 )
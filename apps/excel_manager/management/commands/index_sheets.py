@@ -0,0 +1,25 @@
+"""Management command to index sheets parsed before search existed."""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.excel_manager.services.search import index_sheet, unindexed_sheets
+
+
+class Command(BaseCommand):
+    help = 'Build the search index of parsed sheets that have none'
+
+    def handle(self, *args, **options):
+        if not settings.EXCEL_CONFIG['SEARCH_INDEX_ENABLED']:
+            raise CommandError('SEARCH_INDEX_ENABLED is off')
+
+        batch_size = settings.EXCEL_CONFIG['INGEST_BATCH_ROWS']
+        # Unparsed sheets are indexed when their rows are first parsed
+        sheets = unindexed_sheets().filter(parsed_at__isnull=False)
+        indexed = 0
+        for sheet in sheets.iterator():
+            index_sheet(sheet, batch_size)
+            indexed += 1
+            self.stdout.write(f'Indexed {sheet}')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Indexed {indexed} sheet(s)'))
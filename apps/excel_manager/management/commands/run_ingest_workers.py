@@ -0,0 +1,118 @@
+"""Management command to run background Excel ingestion workers."""
+
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.excel_manager.services.job_queue import run_worker
+
+
+def _worker_main(max_jobs, burst):
+    """Entry point for a forked worker process."""
+    # Never share the parent's database connections across a fork
+    connections.close_all()
+
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    # Finish the current job, then exit
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    try:
+        run_worker(max_jobs=max_jobs, burst=burst, should_stop=lambda: stopping)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run background workers that parse queued Excel uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of worker processes (default: 1)',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=settings.EXCEL_CONFIG['INGEST_MAX_JOBS_PER_WORKER'],
+            help='Recycle a worker process after this many jobs',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling',
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        max_jobs = options['max_jobs'] or None
+        burst = options['burst']
+
+        self.stdout.write(
+            f'Starting {concurrency} ingest worker(s), '
+            f'recycling after {max_jobs or "unlimited"} jobs...'
+        )
+
+        # Children inherit nothing from the parent's connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+
+        stopping = False
+
+        def request_stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        def spawn():
+            process = context.Process(target=_worker_main, args=(max_jobs, burst))
+            process.start()
+            return process
+
+        workers = [spawn() for _ in range(concurrency)]
+        recycled = 0
+
+        while workers:
+            time.sleep(0.5)
+            alive = []
+            for process in workers:
+                if process.is_alive():
+                    alive.append(process)
+                    continue
+
+                process.join()
+                if process.exitcode != 0:
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f'⚠️  Worker {process.pid} exited with code {process.exitcode}'
+                        )
+                    )
+                # Burst workers exit when the queue drains; keep them down
+                if not stopping and not burst:
+                    recycled += 1
+                    alive.append(spawn())
+            workers = alive
+
+            if stopping:
+                for process in workers:
+                    if process.is_alive():
+                        process.terminate()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ Ingest workers stopped ({recycled} recycled)'
+            )
+        )
@@ -0,0 +1,60 @@
+"""Management command to run background AI validation workers."""
+
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core.services.ai_service import close_clients
+from apps.excel_manager.services.validation_jobs import run_validation_worker
+
+
+class Command(BaseCommand):
+    help = 'Run a worker that performs queued AI validations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.EXCEL_CONFIG['VALIDATION_WORKER_CONCURRENCY'],
+            help='Validations run at once in this process',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='Exit after this many jobs',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling',
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        self.stdout.write(
+            f'Starting validation worker running up to {concurrency} job(s) at once...'
+        )
+
+        stopping = False
+
+        def request_stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        # Finish the running validations, then exit
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        try:
+            processed = run_validation_worker(
+                concurrency=concurrency,
+                max_jobs=options['max_jobs'],
+                burst=options['burst'],
+                should_stop=lambda: stopping,
+            )
+        finally:
+            # Close the pooled Anthropic connections before the process exits
+            close_clients()
+        self.stdout.write(f'Validation worker stopped after {processed} job(s)')
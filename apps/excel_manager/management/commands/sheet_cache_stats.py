@@ -0,0 +1,31 @@
+"""Management command to report the sheet table fragment cache hit rate."""
+
+from django.core.management.base import BaseCommand
+
+from apps.excel_manager.services.fragment_cache import (
+    get_fragment_cache_stats,
+    reset_fragment_cache_stats,
+)
+
+
+class Command(BaseCommand):
+    help = 'Show hits and misses of the rendered sheet table cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after reporting them',
+        )
+
+    def handle(self, *args, **options):
+        stats = get_fragment_cache_stats()
+        hit_rate = stats['hit_rate']
+        self.stdout.write(
+            f"Hits: {stats['hits']}\n"
+            f"Misses: {stats['misses']}\n"
+            f"Hit rate: {'n/a' if hit_rate is None else f'{hit_rate:.1%}'}"
+        )
+        if options['reset']:
+            reset_fragment_cache_stats()
+            self.stdout.write('Counters reset.')
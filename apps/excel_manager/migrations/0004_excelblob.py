@@ -0,0 +1,111 @@
+# Generated by Django 5.1.15 on 2026-10-17 02:34
+
+import apps.excel_manager.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("excel_manager", "0003_ingestjob"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExcelBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha256", models.CharField(max_length=64, unique=True)),
+                (
+                    "file",
+                    models.FileField(
+                        max_length=255,
+                        upload_to=apps.excel_manager.models.blob_upload_to,
+                    ),
+                ),
+                ("size", models.BigIntegerField()),
+                ("ref_count", models.PositiveIntegerField(default=0)),
+                ("sheet_count", models.IntegerField(blank=True, null=True)),
+                ("parsed_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name="exceldata",
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name="exceldata",
+            name="upload",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="sheets",
+                to="excel_manager.excelupload",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="excelupload",
+            name="file_hash",
+            field=models.CharField(
+                help_text="SHA256 hash for duplicate detection", max_length=64
+            ),
+        ),
+        migrations.AddField(
+            model_name="exceldata",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="sheets",
+                to="excel_manager.excelblob",
+            ),
+        ),
+        migrations.AddField(
+            model_name="excelupload",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Shared content; empty for uploads stored before deduplication",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="uploads",
+                to="excel_manager.excelblob",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="exceldata",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("upload__isnull", False)),
+                fields=("upload", "sheet_index"),
+                name="unique_sheet_per_upload",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="exceldata",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("blob__isnull", False)),
+                fields=("blob", "sheet_index"),
+                name="unique_sheet_per_blob",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="excelupload",
+            constraint=models.UniqueConstraint(
+                fields=("user", "file_hash"), name="unique_upload_hash_per_user"
+            ),
+        ),
+    ]
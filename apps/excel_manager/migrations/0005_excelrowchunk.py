@@ -0,0 +1,61 @@
+# Generated by Django 5.1.15 on 2026-10-17 02:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("excel_manager", "0004_excelblob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exceldata",
+            name="column_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="exceldata",
+            name="headers",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="exceldata",
+            name="row_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="ExcelRowChunk",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("chunk_index", models.IntegerField()),
+                ("rows", models.JSONField(default=list)),
+                (
+                    "sheet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chunks",
+                        to="excel_manager.exceldata",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["sheet", "chunk_index"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("sheet", "chunk_index"), name="unique_chunk_per_sheet"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Moves ExcelData.row_data blobs into ExcelRowChunk records.
+
+from django.db import migrations, models, transaction
+
+# Must match ExcelRowChunk.ROWS_PER_CHUNK at the time of this migration
+ROWS_PER_CHUNK = 500
+# Sheets converted per transaction, to keep statements short
+SHEETS_PER_BATCH = 50
+
+
+def forwards(apps, schema_editor):
+    ExcelData = apps.get_model("excel_manager", "ExcelData")
+    ExcelRowChunk = apps.get_model("excel_manager", "ExcelRowChunk")
+
+    sheet_ids = list(
+        # Converted sheets have an empty row_data, so reruns skip them
+        ExcelData.objects.filter(
+            models.Q(row_data__has_key="rows") | models.Q(row_data__has_key="headers")
+        )
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+    for start in range(0, len(sheet_ids), SHEETS_PER_BATCH):
+        batch = sheet_ids[start : start + SHEETS_PER_BATCH]
+        with transaction.atomic():
+            for sheet in ExcelData.objects.filter(pk__in=batch):
+                headers = sheet.row_data.get("headers", [])
+                rows = sheet.row_data.get("rows", [])
+                ExcelRowChunk.objects.bulk_create(
+                    [
+                        ExcelRowChunk(
+                            sheet=sheet,
+                            chunk_index=i,
+                            rows=rows[pos : pos + ROWS_PER_CHUNK],
+                        )
+                        for i, pos in enumerate(range(0, len(rows), ROWS_PER_CHUNK))
+                    ]
+                )
+                sheet.headers = headers
+                sheet.row_count = len(rows)
+                sheet.column_count = max([len(headers)] + [len(r) for r in rows])
+                sheet.row_data = {}
+                sheet.save(
+                    update_fields=["headers", "row_count", "column_count", "row_data"]
+                )
+
+
+def backwards(apps, schema_editor):
+    ExcelData = apps.get_model("excel_manager", "ExcelData")
+    ExcelRowChunk = apps.get_model("excel_manager", "ExcelRowChunk")
+
+    for sheet in ExcelData.objects.order_by("pk").iterator(chunk_size=SHEETS_PER_BATCH):
+        rows = []
+        for chunk in ExcelRowChunk.objects.filter(sheet=sheet).order_by("chunk_index"):
+            rows.extend(chunk.rows)
+        sheet.row_data = {"headers": sheet.headers, "rows": rows}
+        sheet.save(update_fields=["row_data"])
+        ExcelRowChunk.objects.filter(sheet=sheet).delete()
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own so large tables don't hold one long
+    # transaction (or hit statement_timeout)
+    atomic = False
+
+    dependencies = [
+        ("excel_manager", "0005_excelrowchunk"),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
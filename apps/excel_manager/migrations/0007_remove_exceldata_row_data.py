@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-17 02:36
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("excel_manager", "0006_backfill_row_chunks"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="exceldata",
+            name="row_data",
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.15 on 2026-10-17 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("excel_manager", "0007_remove_exceldata_row_data"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exceldata",
+            name="schema",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                help_text="Inferred column types: [{name, type, null_ratio}]",
+            ),
+        ),
+    ]
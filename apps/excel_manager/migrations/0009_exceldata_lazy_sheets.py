@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-17 02:48
+
+from django.db import migrations, models
+from django.db.models.functions import Now
+
+
+def mark_existing_sheets_parsed(apps, schema_editor):
+    # Sheets created before lazy parsing already hold all of their rows
+    ExcelData = apps.get_model("excel_manager", "ExcelData")
+    ExcelData.objects.filter(parsed_at__isnull=True).update(parsed_at=Now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("excel_manager", "0008_exceldata_schema"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exceldata",
+            name="dimension",
+            field=models.CharField(
+                blank=True,
+                help_text="Used range declared by the sheet, e.g. A1:F200",
+                max_length=32,
+            ),
+        ),
+        migrations.AddField(
+            model_name="exceldata",
+            name="parsed_at",
+            field=models.DateTimeField(
+                blank=True, help_text="When the sheet's rows were parsed", null=True
+            ),
+        ),
+        migrations.RunPython(mark_existing_sheets_parsed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-17 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("excel_manager", "0009_exceldata_lazy_sheets"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exceldata",
+            name="encoded_columns",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="exceldata",
+            name="string_pool",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
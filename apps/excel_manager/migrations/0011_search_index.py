@@ -0,0 +1,103 @@
+# Generated by Django 5.1.15 on 2026-10-17 03:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SEARCH_INDEXES = [
+    # Whole-word matches, ranked
+    "CREATE INDEX excel_search_row_tsv ON excel_manager_excelsearchrow "
+    "USING gin (to_tsvector('simple', text))",
+    # Substring matches (ILIKE '%sku%')
+    "CREATE INDEX excel_search_row_trgm ON excel_manager_excelsearchrow "
+    "USING gin (text gin_trgm_ops)",
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    # Other databases search through ExcelSearchTerm instead
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for sql in SEARCH_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS excel_search_row_tsv")
+    schema_editor.execute("DROP INDEX IF EXISTS excel_search_row_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("excel_manager", "0010_exceldata_string_pool"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExcelSearchTerm",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("term", models.CharField(db_index=True, max_length=64)),
+                (
+                    "rows",
+                    models.JSONField(default=list, help_text="Ascending row indexes"),
+                ),
+                (
+                    "sheet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_terms",
+                        to="excel_manager.exceldata",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["sheet", "term"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ExcelSearchRow",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("row_index", models.IntegerField()),
+                ("text", models.TextField()),
+                (
+                    "sheet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_rows",
+                        to="excel_manager.exceldata",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["sheet", "row_index"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("sheet", "row_index"),
+                        name="unique_search_row_per_sheet",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.15 on 2026-10-17 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("excel_manager", "0011_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exceldata",
+            name="profile",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                help_text="Per-column statistics computed at ingest, see services.profile",
+            ),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.1.15 on 2026-10-17 03:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("excel_manager", "0013_validationjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ValidationChunk",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("start_row", models.IntegerField()),
+                ("stop_row", models.IntegerField()),
+                (
+                    "result",
+                    models.JSONField(
+                        help_text="Parsed validation result of these rows"
+                    ),
+                ),
+                (
+                    "usage",
+                    models.JSONField(
+                        default=dict, help_text="Tokens used for this chunk"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "excel_upload",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="validation_chunks",
+                        to="excel_manager.excelupload",
+                    ),
+                ),
+                (
+                    "sheet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="excel_manager.exceldata",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["sheet", "start_row"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("excel_upload", "sheet", "start_row", "stop_row"),
+                        name="unique_validation_chunk",
+                    )
+                ],
+            },
+        ),
+    ]
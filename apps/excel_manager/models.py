@@ -1,5 +1,5 @@
 import hashlib
-from typing import Dict, Any
+from typing import Any, Dict, Iterator, List, Optional
 from django.conf import settings
 from django.core.validators import FileExtensionValidator
 from django.db import models
@@ -12,6 +12,45 @@ def upload_to(instance, filename):
     return f"excel_uploads/{instance.user.id}/{filename}"
 
 
+def blob_upload_to(instance, filename):
+    """Generate a content-addressed path, sharded by hash prefix.
+
+    e.g. ``blobs/3f/a2/3fa2...c9.xlsx`` keeps directories small even with
+    millions of stored workbooks.
+    """
+    digest = instance.sha256
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else "bin"
+    return f"blobs/{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+class ExcelBlob(models.Model):
+    """Content-addressed storage for uploaded workbook bytes.
+
+    Identical files are stored and parsed once, no matter how many users
+    upload them. Every ExcelUpload pointing at a blob holds one reference;
+    the file and its parsed sheets are removed when the last one is released.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=blob_upload_to, max_length=255)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+
+    # Parsed once, shared by every upload of this content
+    sheet_count = models.IntegerField(null=True, blank=True)
+    parsed_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+    @property
+    def is_parsed(self) -> bool:
+        """Whether sheets have been extracted for this content."""
+        return self.parsed_at is not None
+
+
 class ExcelUpload(models.Model):
     """Represents an uploaded Excel file."""
 
@@ -40,7 +79,15 @@ class ExcelUpload(models.Model):
     )
     original_filename = models.CharField(max_length=255)
     file_hash = models.CharField(
-        max_length=64, unique=True, help_text="SHA256 hash for duplicate detection"
+        max_length=64, help_text="SHA256 hash for duplicate detection"
+    )
+    blob = models.ForeignKey(
+        ExcelBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="uploads",
+        help_text="Shared content; empty for uploads stored before deduplication",
     )
 
     # Processing status
@@ -64,10 +111,25 @@ class ExcelUpload(models.Model):
             models.Index(fields=["status"]),
             models.Index(fields=["file_hash"]),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "file_hash"], name="unique_upload_hash_per_user"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.original_filename} ({self.user.email})"
 
+    def get_sheets(self):
+        """Return the parsed sheets for this upload.
+
+        Content-addressed uploads share the sheets of their blob; older
+        uploads own their sheets directly.
+        """
+        if self.blob_id:
+            return ExcelData.objects.filter(blob_id=self.blob_id)
+        return self.sheets.all()  # type: ignore
+
     def get_absolute_url(self):
         return reverse("excel_manager:detail", kwargs={"pk": self.pk})
 
@@ -93,20 +155,19 @@ class ExcelUpload(models.Model):
             Dict with columns and sample data
         """
         # Get first sheet's data for validation
-        first_sheet = self.sheets.first()  # type: ignore
+        first_sheet = self.get_sheets().first()
         if not first_sheet:
             return {"columns": [], "sample": []}
+        return first_sheet.get_preview_data(rows)
 
-        sheet_data = first_sheet.row_data
-        headers = sheet_data.get("headers", [])
-        data_rows = sheet_data.get("rows", [])[:rows]
-
-        return {
-            "columns": headers,
-            "sample": data_rows,
-            "total_rows": len(sheet_data.get("rows", [])),
-            "sheet_name": first_sheet.sheet_name,
-        }
+    def get_sheets_preview_data(self, rows: int = 100) -> List[Dict[str, Any]]:
+        """get_preview_data() for every sheet that has rows, in workbook order."""
+        previews = []
+        for sheet in self.get_sheets():
+            preview = sheet.get_preview_data(rows)
+            if preview["sample"]:
+                previews.append(preview)
+        return previews
 
     def has_recent_validation(self, hours: int = 1) -> bool:
         """Check if a recent validation exists."""
@@ -116,39 +177,306 @@ class ExcelUpload(models.Model):
         return self.ai_validations.filter(validated_at__gte=cutoff).exists()  # type: ignore
 
 
+class ExcelDataQuerySet(models.QuerySet):
+    # Per-sheet fields that grow with the sheet's content
+    CONTENT_FIELDS = ("headers", "schema", "profile", "string_pool", "encoded_columns")
+
+    def metadata(self) -> "ExcelDataQuerySet":
+        """Load only what sheet tabs and listings need.
+
+        Headers, schema, profile and the string pool can be large; they are fetched
+        for the one sheet whose rows are actually shown.
+        """
+        return self.defer(*self.CONTENT_FIELDS)
+
+
 class ExcelData(models.Model):
     """Stores parsed Excel data for display."""
 
-    # Relationships
+    # Relationships (exactly one of upload/blob is set)
     upload = models.ForeignKey(
-        ExcelUpload, on_delete=models.CASCADE, related_name="sheets"
+        ExcelUpload,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="sheets",
+    )
+    blob = models.ForeignKey(
+        ExcelBlob,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="sheets",
     )
 
     # Sheet info
     sheet_name = models.CharField(max_length=255)
     sheet_index = models.IntegerField()
 
-    # Data storage
-    row_data = models.JSONField(
-        default=dict, help_text="Stores headers and rows as JSON"
+    # Sheet metadata (rows live in ExcelRowChunk)
+    headers = models.JSONField(default=list, blank=True)
+    row_count = models.IntegerField(default=0)
+    column_count = models.IntegerField(default=0)
+    schema = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Inferred column types: [{name, type, null_ratio}]",
     )
+    profile = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Per-column statistics computed at ingest, see services.profile",
+    )
+    dimension = models.CharField(
+        max_length=32,
+        blank=True,
+        help_text="Used range declared by the sheet, e.g. A1:F200",
+    )
+    parsed_at = models.DateTimeField(
+        null=True, blank=True, help_text="When the sheet's rows were parsed"
+    )
+    # Dictionary encoding of low-cardinality text columns. In the columns
+    # listed in encoded_columns, a stored integer n stands for string_pool[n]
+    # and other non-empty values are wrapped as [value].
+    string_pool = models.JSONField(default=list, blank=True)
+    encoded_columns = models.JSONField(default=list, blank=True)
+
+    objects = ExcelDataQuerySet.as_manager()
 
     class Meta:
         ordering = ["sheet_index"]
-        unique_together = ["upload", "sheet_index"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["upload", "sheet_index"],
+                condition=models.Q(upload__isnull=False),
+                name="unique_sheet_per_upload",
+            ),
+            models.UniqueConstraint(
+                fields=["blob", "sheet_index"],
+                condition=models.Q(blob__isnull=False),
+                name="unique_sheet_per_blob",
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.upload.original_filename} - {self.sheet_name}"
+        source = self.upload.original_filename if self.upload_id else self.blob
+        return f"{source} - {self.sheet_name}"
 
     @property
-    def row_count(self):
-        """Return the number of rows in this sheet."""
-        return len(self.row_data.get("rows", []))
+    def is_parsed(self) -> bool:
+        """Whether the sheet's rows have been read, or it is still a stub."""
+        return self.parsed_at is not None
 
-    @property
-    def headers(self):
-        """Return the headers for this sheet."""
-        return self.row_data.get("headers", [])
+    def ensure_parsed(self) -> "ExcelData":
+        """Parse the sheet's rows now if ingestion only created a stub.
+
+        See apps.excel_manager.services.ingestion.materialize_sheet.
+        """
+        if self.is_parsed:
+            return self
+
+        from .services.ingestion import materialize_sheet
+
+        return materialize_sheet(self)
+
+    def get_preview_data(self, rows: int = 100) -> Dict[str, Any]:
+        """Columns, types, statistics and the first ``rows`` rows, for AI validation."""
+        self.ensure_parsed()
+
+        return {
+            "columns": self.headers,
+            "sample": self.get_rows(0, rows),
+            "total_rows": self.row_count,
+            "sheet_name": self.sheet_name,
+            "schema": self.schema,
+            "profile": self.profile,
+        }
+
+    def get_rows(self, start: int = 0, stop: Optional[int] = None) -> List[List[Any]]:
+        """Return rows ``start`` to ``stop`` (exclusive), loading only the
+        chunks that cover that range.
+        """
+        if stop is None or stop > self.row_count:
+            stop = self.row_count
+        if start >= stop:
+            return []
+
+        size = ExcelRowChunk.ROWS_PER_CHUNK
+        chunks = self.chunks.filter(  # type: ignore
+            chunk_index__gte=start // size, chunk_index__lte=(stop - 1) // size
+        ).order_by("chunk_index")
+
+        rows: List[List[Any]] = []
+        offset = (start // size) * size
+        for chunk in chunks:
+            rows.extend(chunk.rows)
+        return self.decode_rows(rows[start - offset : stop - offset])
+
+    def iter_rows(self) -> Iterator[List[Any]]:
+        """Yield every row of the sheet, one chunk in memory at a time."""
+        chunks = self.chunks.order_by("chunk_index")  # type: ignore
+        for chunk in chunks.iterator(chunk_size=10):
+            yield from self.decode_rows(chunk.rows)
+
+    def decode_rows(self, rows: List[List[Any]]) -> List[List[Any]]:
+        """Decode dictionary-encoded cells of freshly loaded rows in place."""
+        pool = self.string_pool
+        for row in rows:
+            for i in self.encoded_columns:
+                if i < len(row):
+                    cell = row[i]
+                    if type(cell) is int:
+                        row[i] = pool[cell]
+                    elif type(cell) is list:
+                        row[i] = cell[0]
+        return rows
+
+    def columns(self):
+        """Return the sheet's memory-mapped columns, or None if not built.
+
+        See apps.excel_manager.services.columnar.ColumnarSheet.
+        """
+        from .services.columnar import open_columnar
+
+        return open_columnar(self)
+
+
+class ExcelRowChunk(models.Model):
+    """A fixed-size block of consecutive rows of one sheet.
+
+    Row ``n`` of a sheet lives in chunk ``n // ROWS_PER_CHUNK`` at position
+    ``n % ROWS_PER_CHUNK``, so a page of rows costs one or two small reads
+    instead of deserializing the whole sheet.
+    """
+
+    ROWS_PER_CHUNK = 500
+
+    sheet = models.ForeignKey(
+        ExcelData, on_delete=models.CASCADE, related_name="chunks"
+    )
+    chunk_index = models.IntegerField()
+    rows = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ["sheet", "chunk_index"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["sheet", "chunk_index"], name="unique_chunk_per_sheet"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.sheet} - chunk {self.chunk_index}"
+
+    @classmethod
+    def build(
+        cls, sheet: ExcelData, rows: List[List[Any]], first_index: int = 0
+    ) -> List["ExcelRowChunk"]:
+        """Split rows into unsaved chunks starting at ``first_index``."""
+        size = cls.ROWS_PER_CHUNK
+        return [
+            cls(sheet=sheet, chunk_index=first_index + i, rows=rows[pos : pos + size])
+            for i, pos in enumerate(range(0, len(rows), size))
+        ]
+
+
+class ExcelSearchRow(models.Model):
+    """Searchable text of one sheet row, for search across uploads.
+
+    Cells are joined with CELL_SEPARATOR so a hit can be traced back to its
+    column. On PostgreSQL the text carries a GIN full-text index and a
+    pg_trgm index (see migration 0011); other databases search through the
+    ExcelSearchTerm inverted index instead.
+    """
+
+    CELL_SEPARATOR = "\t"
+
+    sheet = models.ForeignKey(
+        ExcelData, on_delete=models.CASCADE, related_name="search_rows"
+    )
+    row_index = models.IntegerField()
+    text = models.TextField()
+
+    class Meta:
+        ordering = ["sheet", "row_index"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["sheet", "row_index"], name="unique_search_row_per_sheet"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.sheet} - row {self.row_index}"
+
+
+class ExcelSearchTerm(models.Model):
+    """Posting list of one term within one sheet: the rows containing it.
+
+    Only written on databases without PostgreSQL full-text search.
+    """
+
+    sheet = models.ForeignKey(
+        ExcelData, on_delete=models.CASCADE, related_name="search_terms"
+    )
+    term = models.CharField(max_length=64, db_index=True)
+    rows = models.JSONField(default=list, help_text="Ascending row indexes")
+
+    class Meta:
+        ordering = ["sheet", "term"]
+
+    def __str__(self):
+        return f"{self.sheet} - {self.term}"
+
+
+class IngestJob(models.Model):
+    """Queue entry for parsing an ExcelUpload outside the request cycle.
+
+    Workers lease jobs for a fixed time window. A job whose lease expires
+    (e.g. the worker was killed) becomes available to other workers again.
+    """
+
+    STATUS_QUEUED = "queued"
+    STATUS_LEASED = "leased"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_LEASED, "Leased"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    # Relationships
+    upload = models.ForeignKey(
+        ExcelUpload, on_delete=models.CASCADE, related_name="ingest_jobs"
+    )
+
+    # Queue state
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    available_at = models.DateTimeField(
+        default=timezone.now, help_text="Earliest time the job may be leased"
+    )
+    leased_until = models.DateTimeField(null=True, blank=True)
+    leased_by = models.CharField(max_length=255, blank=True)
+    last_error = models.TextField(blank=True)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["available_at"]
+        indexes = [
+            models.Index(fields=["status", "available_at"]),
+        ]
+
+    def __str__(self):
+        return f"Ingest {self.upload_id} ({self.status}, attempt {self.attempts})"
 
 
 class AIValidation(models.Model):
@@ -226,3 +554,112 @@ class AIValidation(models.Model):
     def summary(self) -> str:
         """Get summary from validation result."""
         return self.validation_result.get("summary", "")
+
+    @property
+    def sheets(self) -> List[Dict[str, Any]]:
+        """Per-sheet sections of a multi-sheet validation."""
+        return self.validation_result.get("sheets", [])
+
+
+class ValidationChunk(models.Model):
+    """Result of validating one block of rows of a sheet.
+
+    Full-coverage validation sends a sheet in row chunks and saves each result
+    as it arrives, so a retry after a failure only sends the chunks that are
+    missing. Chunks are deleted once the AIValidation is recorded.
+    """
+
+    # Relationships
+    excel_upload = models.ForeignKey(
+        ExcelUpload, on_delete=models.CASCADE, related_name="validation_chunks"
+    )
+    sheet = models.ForeignKey(ExcelData, on_delete=models.CASCADE, related_name="+")
+
+    # Rows start_row to stop_row (exclusive), 0-based
+    start_row = models.IntegerField()
+    stop_row = models.IntegerField()
+
+    result = models.JSONField(help_text="Parsed validation result of these rows")
+    usage = models.JSONField(default=dict, help_text="Tokens used for this chunk")
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["sheet", "start_row"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["excel_upload", "sheet", "start_row", "stop_row"],
+                name="unique_validation_chunk",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Rows {self.start_row + 1}-{self.stop_row} of {self.sheet_id}"
+
+
+class ValidationJob(models.Model):
+    """Queue entry for an AI validation run outside the request cycle.
+
+    Workers lease jobs like IngestJob; the detail page polls the job until it
+    is done or failed.
+    """
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+    ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+    # Relationships
+    excel_upload = models.ForeignKey(
+        ExcelUpload, on_delete=models.CASCADE, related_name="validation_jobs"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="validation_jobs",
+        help_text="Owner of the upload, for per-user limits",
+    )
+    validation = models.ForeignKey(
+        AIValidation,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+
+    # Queue state
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    leased_until = models.DateTimeField(null=True, blank=True)
+    leased_by = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+            models.Index(fields=["user", "status"]),
+        ]
+
+    def __str__(self):
+        return f"Validation of {self.excel_upload_id} ({self.status})"
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in self.ACTIVE_STATUSES
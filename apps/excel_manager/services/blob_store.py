@@ -0,0 +1,74 @@
+"""Content-addressed blob storage with reference counting."""
+
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from ..models import ExcelBlob
+from .columnar import delete_columnar
+
+logger = logging.getLogger(__name__)
+
+
+def acquire_blob(file, sha256: str) -> ExcelBlob:
+    """Return the blob for ``sha256``, storing ``file`` if it is new.
+
+    Takes one reference on the blob. Must be paired with release_blob() when
+    the referencing upload is deleted.
+    """
+    with transaction.atomic():
+        blob = ExcelBlob.objects.select_for_update().filter(sha256=sha256).first()
+
+        if blob is None:
+            blob = ExcelBlob(sha256=sha256, size=file.size)
+            name = blob.file.field.generate_filename(blob, file.name)
+            if blob.file.storage.exists(name):
+                # Left behind by a blob whose row was rolled back
+                blob.file.name = name
+            else:
+                blob.file.save(file.name, file, save=False)
+
+            try:
+                with transaction.atomic():
+                    blob.save()
+            except IntegrityError:
+                # Another request stored the same content concurrently
+                blob = ExcelBlob.objects.select_for_update().get(sha256=sha256)
+
+        ExcelBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+        blob.refresh_from_db(fields=["ref_count"])
+
+    return blob
+
+
+def release_blob(blob_id: int) -> bool:
+    """Drop one reference; delete the file and parsed sheets at zero.
+
+    Returns:
+        True if the blob was deleted
+    """
+    with transaction.atomic():
+        blob = ExcelBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return False
+
+        if blob.ref_count > 1:
+            ExcelBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") - 1)
+            return False
+
+        field_file = blob.file
+        # Cascades to the shared ExcelData rows
+        blob.delete()
+
+        # Only remove bytes once the row is gone for good
+        transaction.on_commit(lambda: _delete_files(field_file))
+
+    logger.info(f"Deleted unreferenced blob {blob.sha256}")
+    return True
+
+
+def _delete_files(field_file) -> None:
+    """Remove a blob's workbook and the columnar files derived from it."""
+    delete_columnar(field_file)
+    field_file.storage.delete(field_file.name)
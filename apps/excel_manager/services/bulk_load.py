@@ -0,0 +1,47 @@
+"""Bulk loading of ExcelRowChunk records.
+
+On PostgreSQL, chunks are streamed into the table with a single
+``COPY ... FROM STDIN`` per batch through psycopg 3's ``cursor.copy()``,
+which skips per-row INSERT parsing and planning. Other databases (SQLite
+in tests) fall back to ``bulk_create``.
+
+Each call is one short statement of at most INGEST_BATCH_ROWS rows, so
+loading a large sheet never runs into production's ``statement_timeout``.
+"""
+
+import logging
+from typing import List
+
+from django.db import connection
+
+from ..models import ExcelRowChunk
+
+logger = logging.getLogger(__name__)
+
+
+def load_chunks(chunks: List[ExcelRowChunk]) -> None:
+    """Insert unsaved chunks as fast as the database allows."""
+    if not chunks:
+        return
+    if connection.vendor == "postgresql":
+        copy_chunks(chunks)
+    else:
+        ExcelRowChunk.objects.bulk_create(chunks)
+
+
+def copy_chunks(chunks: List[ExcelRowChunk]) -> None:
+    """Write chunks with PostgreSQL COPY."""
+    from psycopg.types.json import Jsonb
+
+    meta = ExcelRowChunk._meta
+    quote = connection.ops.quote_name
+    columns = ", ".join(
+        quote(meta.get_field(name).column) for name in ("sheet", "chunk_index", "rows")
+    )
+    sql = f"COPY {quote(meta.db_table)} ({columns}) FROM STDIN"
+
+    with connection.cursor() as cursor:
+        # The psycopg cursor behind Django's wrapper
+        with cursor.cursor.copy(sql) as copy:
+            for chunk in chunks:
+                copy.write_row((chunk.sheet_id, chunk.chunk_index, Jsonb(chunk.rows)))
@@ -0,0 +1,582 @@
+"""Memory-mapped columnar copies of parsed sheets.
+
+Each sheet can be written once, after ingestion, as a directory of NumPy
+files next to the workbook in MEDIA_ROOT::
+
+    blobs/3f/a2/3fa2...c9.xlsx.columns/0/
+        meta.json              column names and kinds, row count
+        c0.npy, c1.npy, ...    one array per column
+        strings.bin            UTF-8 bytes of the sheet's string pool
+        strings.offsets.npy    int64 start offsets into strings.bin
+        o0.npy, o1.npy, ...    each column's ascending sort order
+
+Numeric columns, whose cells are all int or float values, are float64
+with NaN for blanks. All other columns are int32 codes into the string pool
+(-1 for blanks), so repeated values are stored once. Arrays are opened with ``mmap_mode="r"``: column scans touch
+pages on demand and never parse JSON.
+
+Sort orders are int32 row permutations computed once when the columns are
+written, so a window of a sorted sheet is read by slicing the permutation
+and gathering just those rows from the columns.
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from ..models import ExcelData
+
+logger = logging.getLogger(__name__)
+
+KIND_NUMBER = "number"
+KIND_STRING = "string"
+
+META_FILE = "meta.json"
+POOL_FILE = "strings.bin"
+POOL_OFFSETS_FILE = "strings.offsets.npy"
+SORT_ORDER_FILE = "o{index}.npy"
+# Written while a sheet's pool grows, then wrapped as POOL_OFFSETS_FILE
+POOL_OFFSETS_RAW_FILE = "strings.offsets.i64"
+
+# Values read or written at a time when rewriting spilled columns
+COPY_BLOCK_ROWS = 65536
+
+
+def _parse_number(value: Any) -> Optional[float]:
+    """``value`` as a float if the cell holds a number, else None.
+
+    Text is never parsed, so "00123" or "1e3" typed into a text cell stays
+    a string.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, float):
+        return _format_number(value)
+    return str(value)
+
+
+class ColumnarSheet:
+    """Read-only view over a sheet's columnar files.
+
+    Columns are addressed by position because headers are not guaranteed to
+    be unique. ``sheet[i]`` returns the raw memory-mapped array: float64
+    values for number columns, int32 pool codes for string columns.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        self.row_count: int = meta["row_count"]
+        self.names: List[str] = [col["name"] for col in meta["columns"]]
+        self.kinds: List[str] = [col["kind"] for col in meta["columns"]]
+        self._arrays: Dict[int, np.ndarray] = {}
+        self._pool_bytes: Optional[np.ndarray] = None
+        self._pool_offsets: Optional[np.ndarray] = None
+        self._pool_values: Optional[List[str]] = None
+        self._pool_ranks: Optional[np.ndarray] = None
+        self._sort_orders: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        if index not in self._arrays:
+            self._arrays[index] = _load(os.path.join(self.path, f"c{index}.npy"))
+        return self._arrays[index]
+
+    def index_of(self, name: str) -> int:
+        """Position of the first column called ``name``."""
+        return self.names.index(name)
+
+    def is_numeric(self, index: int) -> bool:
+        return self.kinds[index] == KIND_NUMBER
+
+    @property
+    def pool_size(self) -> int:
+        self._open_pool()
+        return len(self._pool_offsets) - 1  # type: ignore
+
+    def pool_value(self, code: int) -> str:
+        """Decode a single string pool entry."""
+        if code < 0:
+            return ""
+        self._open_pool()
+        start, end = self._pool_offsets[code], self._pool_offsets[code + 1]  # type: ignore
+        return bytes(self._pool_bytes[start:end]).decode("utf-8")  # type: ignore
+
+    def pool_values(self) -> List[str]:
+        """Decode the whole string pool, in code order."""
+        if self._pool_values is None:
+            self._open_pool()
+            offsets = self._pool_offsets.tolist()  # type: ignore
+            data = bytes(self._pool_bytes)  # type: ignore
+            self._pool_values = [
+                data[start:end].decode("utf-8")
+                for start, end in zip(offsets, offsets[1:])
+            ]
+        return self._pool_values
+
+    def sort_order(self, index: int) -> np.ndarray:
+        """Row positions of column ``index`` in ascending order, blanks last.
+
+        A missing order is computed on first use and kept next to the
+        column; ColumnarWriter relies on this, as do sheets written before
+        sort orders existed.
+        """
+        if index not in self._sort_orders:
+            path = os.path.join(self.path, SORT_ORDER_FILE.format(index=index))
+            if not os.path.exists(path):
+                if self._pool_ranks is None:
+                    self._pool_ranks = _pool_ranks(self.pool_values())
+                order = _sort_order(
+                    self[index], self.is_numeric(index), self._pool_ranks
+                )
+                _save_atomic(path, order)
+            self._sort_orders[index] = _load(path)
+        return self._sort_orders[index]
+
+    def is_blank(self, index: int, positions) -> np.ndarray:
+        """Which of the given rows are empty in column ``index``."""
+        values = self[index][positions]
+        if self.is_numeric(index):
+            return np.isnan(values)
+        return values < 0
+
+    def match(self, text: str, index: Optional[int] = None) -> np.ndarray:
+        """Boolean row mask of cells containing ``text``, ignoring case.
+
+        Searches column ``index``, or every column when it is None. Each
+        distinct value is tested once and the result is broadcast to the
+        rows with a single array lookup.
+        """
+        needle = text.casefold()
+        mask = np.zeros(self.row_count, dtype=bool)
+        indexes = range(len(self)) if index is None else [index]
+        pool_hits = None
+        for i in indexes:
+            column = self[i]
+            if self.is_numeric(i):
+                values = np.unique(column[~np.isnan(column)])
+                hits = [v for v in values.tolist() if needle in _format_number(v)]
+                mask |= np.isin(column, hits)
+            else:
+                if pool_hits is None:
+                    # One extra False slot, which blank cells (-1) index
+                    pool_hits = np.array(
+                        [needle in value.casefold() for value in self.pool_values()]
+                        + [False]
+                    )
+                mask |= pool_hits[column]
+        return mask
+
+    def window(
+        self,
+        start: int,
+        stop: int,
+        sort: Optional[int] = None,
+        descending: bool = False,
+        query: str = "",
+        query_column: Optional[int] = None,
+    ) -> Tuple[np.ndarray, int]:
+        """Row positions ``start`` to ``stop`` of a sorted and filtered view.
+
+        Without a filter this only reads the requested slice of the sort
+        order, so paging a sorted view costs the same as an unsorted one.
+        Descending order keeps blanks last.
+
+        Returns:
+            The row positions and the number of rows in the whole view
+        """
+        total = self.row_count
+        if sort is None:
+            order = None
+        else:
+            order = self.sort_order(sort)
+            filled = self._filled_count(sort, order) if descending else total
+
+        if query:
+            if order is None:
+                positions = np.arange(total)
+            elif descending:
+                positions = np.concatenate([order[:filled][::-1], order[filled:]])
+            else:
+                positions = order
+            positions = positions[self.match(query, query_column)[positions]]
+            return positions[start:stop], len(positions)
+
+        stop = min(stop, total)
+        if order is None:
+            return np.arange(start, stop), total
+        if not descending:
+            return np.asarray(order[start:stop]), total
+        ranks = np.arange(start, stop)
+        return order[np.where(ranks < filled, filled - 1 - ranks, ranks)], total
+
+    def rows(
+        self, positions, start: int = 0, stop: Optional[int] = None
+    ) -> List[List[Any]]:
+        """Gather rows by position for display, decoding only those cells.
+
+        Only columns ``start`` to ``stop`` are read.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        columns = []
+        for i in range(start, stop):
+            values = self[i][positions].tolist()
+            if self.is_numeric(i):
+                columns.append([None if v != v else _number_value(v) for v in values])
+            else:
+                columns.append([self.pool_value(c) if c >= 0 else None for c in values])
+        if not columns:
+            return [[] for _ in range(len(positions))]
+        return [list(row) for row in zip(*columns)]
+
+    def _filled_count(self, index: int, order: np.ndarray) -> int:
+        """Number of non-blank cells in a column, by bisecting its sort order."""
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if self.is_blank(index, order[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def strings(self, index: int) -> List[str]:
+        """Materialize a column as Python strings (copies; use sparingly)."""
+        column = self[index]
+        if self.is_numeric(index):
+            return ["" if np.isnan(v) else _format_number(v) for v in column]
+        # Decode each distinct code once
+        lookup = {int(code): self.pool_value(int(code)) for code in np.unique(column)}
+        return [lookup[int(code)] for code in column]
+
+    def _open_pool(self) -> None:
+        if self._pool_offsets is None:
+            self._pool_offsets = _load(os.path.join(self.path, POOL_OFFSETS_FILE))
+            pool_path = os.path.join(self.path, POOL_FILE)
+            if os.path.getsize(pool_path):
+                self._pool_bytes = np.memmap(pool_path, dtype=np.uint8, mode="r")
+            else:
+                # Zero-length files cannot be memory-mapped
+                self._pool_bytes = np.zeros(0, dtype=np.uint8)
+
+
+def _load(path: str) -> np.ndarray:
+    return np.load(path, mmap_mode="r", allow_pickle=False)
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if value.is_integer() else str(value)
+
+
+def _number_value(value: float) -> Any:
+    return int(value) if value.is_integer() else value
+
+
+def _pool_ranks(pool: Sequence[str]) -> np.ndarray:
+    """Sort rank of each pool code, plus a last slot for blanks (-1)."""
+    by_value = sorted(range(len(pool)), key=lambda code: pool[code].casefold())
+    ranks = np.empty(len(pool) + 1, dtype=np.int64)
+    ranks[np.array(by_value, dtype=np.int64)] = np.arange(len(pool))
+    ranks[-1] = len(pool)
+    return ranks
+
+
+def _sort_order(column: np.ndarray, numeric: bool, ranks: np.ndarray) -> np.ndarray:
+    """Stable ascending row order of a column with blanks last."""
+    # argsort already places NaN last
+    key = column if numeric else ranks[column]
+    return np.argsort(key, kind="stable").astype(np.int32)
+
+
+def _save_atomic(path: str, data: np.ndarray) -> None:
+    # Unique, so readers computing the same file at once never collide
+    with tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(path), suffix=".npy", delete=False
+    ) as f:
+        try:
+            np.save(f, data)
+        except BaseException:
+            os.remove(f.name)
+            raise
+    os.replace(f.name, path)
+
+
+def get_columnar_path(sheet: ExcelData) -> Optional[str]:
+    """Filesystem directory for a sheet's columns, or None if the storage
+    backend has no local paths (mmap needs a real file).
+    """
+    field_file = sheet.blob.file if sheet.blob_id else sheet.upload.file  # type: ignore
+    try:
+        base = field_file.storage.path(field_file.name)
+    except NotImplementedError:
+        return None
+    return os.path.join(f"{base}.columns", str(sheet.sheet_index))
+
+
+class ColumnarWriter:
+    """Encodes rows into columns as they stream past during ingestion.
+
+    Rows are buffered ``batch_size`` at a time, then each column is appended
+    to a raw file in a private temporary directory next to the sheet's, so
+    memory use does not grow with the sheet. A column is kept as float64
+    while every cell is a number; its first text cell rewrites the file as
+    pool codes. New strings go straight to the pool file, and only the first
+    POOL_LOOKUP_MAX are remembered for reuse: later repeats get a new code.
+
+    Use open_columnar_writer() to create one, and save() or discard() it.
+    """
+
+    # Bounds the string -> code lookup kept while writing
+    POOL_LOOKUP_MAX = 100000
+
+    def __init__(self, path: str, batch_size: int):
+        self.path = path
+        self.batch_size = batch_size
+        parent, name = os.path.split(path)
+        os.makedirs(parent, exist_ok=True)
+        # Unique, so concurrent writers of one sheet never share files
+        self.tmp_path = tempfile.mkdtemp(dir=parent, prefix=f".{name}.tmp-")
+        self.buffer: List[List[Any]] = []
+        self.numeric: List[bool] = []
+        # Whether a numeric column has seen a number yet
+        self.filled: List[bool] = []
+        self.row_count = 0
+        self.pool: Dict[str, int] = {}
+        self.pool_size = 0
+        self.pool_bytes = 0
+        self.new_strings: List[str] = []
+        open(os.path.join(self.tmp_path, POOL_FILE), "wb").close()
+        self._append(POOL_OFFSETS_RAW_FILE, np.zeros(1, dtype=np.int64))
+
+    def write(self, row: List[Any]) -> None:
+        self.buffer.append(row)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        while len(self.numeric) < max(len(row) for row in self.buffer):
+            self._add_column()
+
+        for i in range(len(self.numeric)):
+            values = [
+                None if i >= len(row) or row[i] == "" else row[i] for row in self.buffer
+            ]
+            if self.numeric[i]:
+                numbers = [np.nan if v is None else _parse_number(v) for v in values]
+                if None not in numbers:
+                    self._append(
+                        self._column_file(i), np.array(numbers, dtype=np.float64)
+                    )
+                    self.filled[i] = self.filled[i] or any(
+                        v is not None for v in values
+                    )
+                    continue
+                # Stop tracking numbers once a column proves textual
+                self._to_codes(i)
+            codes = [-1 if v is None else self._code(_format_value(v)) for v in values]
+            self._append(self._column_file(i), np.array(codes, dtype=np.int32))
+
+        self._write_strings()
+        self.row_count += len(self.buffer)
+        self.buffer = []
+
+    def _column_file(self, index: int) -> str:
+        return f"c{index}.f64" if self.numeric[index] else f"c{index}.i32"
+
+    def _append(self, name: str, data: np.ndarray) -> None:
+        with open(os.path.join(self.tmp_path, name), "ab") as f:
+            f.write(data.tobytes())
+
+    def _add_column(self) -> None:
+        self.numeric.append(True)
+        self.filled.append(False)
+        index = len(self.numeric) - 1
+        # Earlier rows are blank in a column that appears late
+        self._append(self._column_file(index), np.zeros(0))
+        for start in range(0, self.row_count, COPY_BLOCK_ROWS):
+            blanks = min(COPY_BLOCK_ROWS, self.row_count - start)
+            self._append(self._column_file(index), np.full(blanks, np.nan))
+
+    def _to_codes(self, index: int) -> None:
+        """Rewrite a numeric column's spilled values as pool codes."""
+        source = os.path.join(self.tmp_path, self._column_file(index))
+        self.numeric[index] = False
+        self._append(self._column_file(index), np.zeros(0, dtype=np.int32))
+        with open(source, "rb") as f:
+            while True:
+                block = np.fromfile(f, dtype=np.float64, count=COPY_BLOCK_ROWS)
+                if not len(block):
+                    break
+                codes = [
+                    -1 if v != v else self._code(_format_number(v))
+                    for v in block.tolist()
+                ]
+                self._append(self._column_file(index), np.array(codes, dtype=np.int32))
+                self._write_strings()
+        os.remove(source)
+
+    def _code(self, text: str) -> int:
+        code = self.pool.get(text)
+        if code is None:
+            code = self.pool_size
+            self.pool_size += 1
+            self.new_strings.append(text)
+            if len(self.pool) < self.POOL_LOOKUP_MAX:
+                self.pool[text] = code
+        return code
+
+    def _write_strings(self) -> None:
+        """Append the strings added since the last call to the pool files."""
+        if not self.new_strings:
+            return
+        offsets = array("q")
+        with open(os.path.join(self.tmp_path, POOL_FILE), "ab") as f:
+            for value in self.new_strings:
+                encoded = value.encode("utf-8")
+                f.write(encoded)
+                self.pool_bytes += len(encoded)
+                offsets.append(self.pool_bytes)
+        self._append(POOL_OFFSETS_RAW_FILE, np.frombuffer(offsets, np.int64))
+        self.new_strings = []
+
+    def save(self, sheet: ExcelData) -> str:
+        """Finish the columns of ``sheet`` and swap them into place.
+
+        Returns:
+            The directory written
+        """
+        try:
+            self.flush()
+            while len(self.numeric) < sheet.column_count:
+                self._add_column()
+
+            columns = []
+            for i in range(len(self.numeric)):
+                if self.numeric[i] and not self.filled[i]:
+                    # Columns that are entirely blank stay strings
+                    self._to_codes(i)
+                is_number = self.numeric[i]
+                _raw_to_npy(
+                    os.path.join(self.tmp_path, self._column_file(i)),
+                    os.path.join(self.tmp_path, f"c{i}.npy"),
+                    np.float64 if is_number else np.int32,
+                )
+                name = sheet.headers[i] if i < len(sheet.headers) else f"Column {i+1}"
+                columns.append(
+                    {"name": name, "kind": KIND_NUMBER if is_number else KIND_STRING}
+                )
+
+            self._write_strings()
+            _raw_to_npy(
+                os.path.join(self.tmp_path, POOL_OFFSETS_RAW_FILE),
+                os.path.join(self.tmp_path, POOL_OFFSETS_FILE),
+                np.int64,
+            )
+            with open(os.path.join(self.tmp_path, META_FILE), "w") as f:
+                json.dump({"row_count": self.row_count, "columns": columns}, f)
+
+            # Sorted from the memory-mapped columns rather than from memory
+            finished = ColumnarSheet(self.tmp_path)
+            for i in range(len(finished)):
+                finished.sort_order(i)
+        except BaseException:
+            self.discard()
+            raise
+
+        # Swap in the finished directory so readers never see half a sheet
+        shutil.rmtree(self.path, ignore_errors=True)
+        try:
+            os.replace(self.tmp_path, self.path)
+        except OSError:
+            # Another writer of the same sheet swapped in its copy first
+            self.discard()
+        return self.path
+
+    def discard(self) -> None:
+        """Remove the temporary files of an unfinished sheet."""
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+def open_columnar_writer(sheet: ExcelData, batch_size: int) -> Optional[ColumnarWriter]:
+    """A ColumnarWriter for ``sheet``, or None if storage has no local paths."""
+    path = get_columnar_path(sheet)
+    if path is None:
+        return None
+    return ColumnarWriter(path, batch_size)
+
+
+def write_columnar(sheet: ExcelData) -> Optional[str]:
+    """Build the columnar files for an already stored sheet."""
+    writer = open_columnar_writer(sheet, settings.EXCEL_CONFIG["INGEST_BATCH_ROWS"])
+    if writer is None:
+        return None
+    try:
+        for row in sheet.iter_rows():
+            writer.write(row)
+    except BaseException:
+        writer.discard()
+        raise
+    return writer.save(sheet)
+
+
+def _raw_to_npy(raw_path: str, path: str, dtype) -> None:
+    """Turn a file of raw ``dtype`` values into a .npy file, block by block."""
+    dtype = np.dtype(dtype)
+    with open(raw_path, "rb") as f, open(path, "wb") as out:
+        np.lib.format.write_array_header_1_0(
+            out,
+            {
+                "descr": np.lib.format.dtype_to_descr(dtype),
+                "fortran_order": False,
+                "shape": (os.path.getsize(raw_path) // dtype.itemsize,),
+            },
+        )
+        shutil.copyfileobj(f, out)
+    os.remove(raw_path)
+
+
+def ensure_columnar(sheet: ExcelData) -> Optional[ColumnarSheet]:
+    """Open a sheet's columnar files, writing them first if they are missing.
+
+    Returns None when the columnar format is disabled or storage has no
+    local paths.
+    """
+    columns = open_columnar(sheet)
+    if columns is None and settings.EXCEL_CONFIG["COLUMNAR_ENABLED"]:
+        # Sheets stored before the columnar format existed
+        if write_columnar(sheet):
+            columns = open_columnar(sheet)
+    return columns
+
+
+def open_columnar(sheet: ExcelData) -> Optional[ColumnarSheet]:
+    """Open a sheet's columnar files, or return None if none were written."""
+    path = get_columnar_path(sheet)
+    if path is None or not os.path.exists(os.path.join(path, META_FILE)):
+        return None
+    return ColumnarSheet(path)
+
+
+def delete_columnar(field_file) -> None:
+    """Remove the columnar files stored next to a workbook."""
+    try:
+        base = field_file.storage.path(field_file.name)
+    except NotImplementedError:
+        return
+    shutil.rmtree(f"{base}.columns", ignore_errors=True)
@@ -0,0 +1,185 @@
+"""Cache of rendered sheet table fragments.
+
+Rendering a window of a sheet reads and formats up to hundreds of rows, and
+the same windows (the first page of a sheet, a popular sort) are requested
+again and again. Rendered HTML is kept in the default cache (Redis in
+production) under a key built from everything the fragment depends on: the
+upload, its content hash, the sheet and when it was parsed, the window,
+sort and filter, and the template version. Parsed sheets never change, so
+entries do not go stale; they only expire or get evicted.
+
+- Fragments larger than TABLE_CACHE_MAX_FRAGMENT_BYTES are not cached, and
+  each upload keeps at most TABLE_CACHE_UPLOAD_BYTES of fragments, evicting
+  its oldest first.
+- On a miss, one request takes a short lock and renders while concurrent
+  requests for the same fragment wait briefly for its result. Hits are
+  re-rendered early with a probability that grows as they near expiry
+  (XFetch), so a popular fragment is refreshed by one request before it
+  expires instead of by all of them after.
+- Deleting an upload drops its fragments.
+- Hits and misses are counted; see get_fragment_cache_stats().
+
+The per-upload index used for eviction and invalidation is updated without
+a lock, so concurrent writes can lose an entry. An untracked fragment still
+expires after TABLE_CACHE_SECONDS.
+"""
+
+import hashlib
+import logging
+import math
+import random
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "sheet-table"
+LOCK_SECONDS = 10
+LOCK_WAIT_SECONDS = 2.0
+LOCK_POLL_SECONDS = 0.05
+# XFetch beta: higher values refresh earlier
+EARLY_REFRESH_BETA = 1.0
+# Log the hit rate every this many hits or misses
+STATS_LOG_INTERVAL = 1000
+
+HITS_KEY = f"{KEY_PREFIX}:stats:hits"
+MISSES_KEY = f"{KEY_PREFIX}:stats:misses"
+
+
+def fragment_key(upload_pk: int, *parts: Any) -> str:
+    """Cache key of a fragment of an upload, from the inputs that determine it."""
+    digest = hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:32]
+    return f"{KEY_PREFIX}:{upload_pk}:{digest}"
+
+
+def _index_key(upload_pk: int) -> str:
+    return f"{KEY_PREFIX}:{upload_pk}:index"
+
+
+def _lock_key(key: str) -> str:
+    return f"{key}:lock"
+
+
+def get_or_render(
+    upload_pk: int, key: str, render: Callable[[], str]
+) -> Tuple[str, bool]:
+    """Return the fragment cached under ``key``, calling ``render`` on a miss.
+
+    Returns:
+        The HTML and whether it came from the cache
+    """
+    lock_key = _lock_key(key)
+    entry = cache.get(key)
+    if entry is not None:
+        if not _should_refresh(entry) or not cache.add(lock_key, 1, LOCK_SECONDS):
+            _record(hit=True)
+            return entry["html"], True
+        locked = True
+    else:
+        locked = cache.add(lock_key, 1, LOCK_SECONDS)
+        if not locked:
+            entry = _wait_for(key, lock_key)
+            if entry is not None:
+                _record(hit=True)
+                return entry["html"], True
+            # The lock holder is slow or failed; render without it
+
+    _record(hit=False)
+    try:
+        started = time.monotonic()
+        html = render()
+        _store(upload_pk, key, html, time.monotonic() - started)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return html, False
+
+
+def _should_refresh(entry: Dict[str, Any]) -> bool:
+    """XFetch: refresh ahead of expiry, earlier for slower renders."""
+    jitter = -math.log(1.0 - random.random())
+    refresh_at = entry["expires"] - entry["delta"] * EARLY_REFRESH_BETA * jitter
+    return time.time() >= refresh_at
+
+
+def _wait_for(key: str, lock_key: str) -> Optional[Dict[str, Any]]:
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_SECONDS)
+        entry = cache.get(key)
+        if entry is not None or lock_key not in cache:
+            return entry
+    return None
+
+
+def _store(upload_pk: int, key: str, html: str, delta: float) -> None:
+    config = settings.EXCEL_CONFIG
+    size = len(html.encode("utf-8"))
+    if size > config["TABLE_CACHE_MAX_FRAGMENT_BYTES"]:
+        return
+    timeout = config["TABLE_CACHE_SECONDS"]
+    cache.set(
+        key,
+        {"html": html, "delta": delta, "expires": time.time() + timeout},
+        timeout,
+    )
+
+    # Oldest first; evict until the upload is back within its budget
+    index_key = _index_key(upload_pk)
+    entries = [e for e in cache.get(index_key, []) if e[0] != key]
+    entries.append([key, size])
+    total = sum(entry_size for _, entry_size in entries)
+    evicted = []
+    while total > config["TABLE_CACHE_UPLOAD_BYTES"] and len(entries) > 1:
+        old_key, old_size = entries.pop(0)
+        evicted.append(old_key)
+        total -= old_size
+    if evicted:
+        cache.delete_many(evicted)
+    cache.set(index_key, entries, timeout)
+
+
+def invalidate_upload(upload_pk: int) -> None:
+    """Drop every cached fragment of an upload."""
+    index_key = _index_key(upload_pk)
+    keys = [key for key, _ in cache.get(index_key, [])]
+    cache.delete_many([*keys, index_key])
+
+
+def _record(hit: bool) -> None:
+    key = HITS_KEY if hit else MISSES_KEY
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # First count, or the counter was evicted
+        cache.add(key, 1, timeout=None)
+        return
+    if count % STATS_LOG_INTERVAL == 0:
+        stats = get_fragment_cache_stats()
+        logger.info(
+            f"Sheet table cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.1%} hit rate)"
+        )
+
+
+def get_fragment_cache_stats() -> Dict[str, Any]:
+    """Hits and misses since the counters were last reset.
+
+    ``hit_rate`` is None before the first lookup.
+    """
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counts.get(HITS_KEY, 0)
+    misses = counts.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else None,
+    }
+
+
+def reset_fragment_cache_stats() -> None:
+    cache.delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,451 @@
+"""Excel ingestion: parse an uploaded workbook into ExcelData records."""
+
+import logging
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import ExcelBlob, ExcelUpload, ExcelData, ExcelRowChunk
+from .bulk_load import load_chunks
+from .columnar import open_columnar_writer
+from .leases import LeaseLostError
+from .parallel import iter_sheets_in_parallel
+from .parsers import ENGINE_LXML, SheetParser, choose_engine, open_parser
+from .profile import ColumnProfiler
+from .schema import SchemaTracker, to_json_value
+from .search import SearchIndexWriter, clear_search_index
+
+logger = logging.getLogger(__name__)
+
+
+class SheetWriter:
+    """Buffers parsed rows and flushes them to storage in bounded batches.
+
+    It only ever holds ``batch_size`` rows of a sheet at a time (rounded up
+    to a whole ExcelRowChunk); the rest have either not been read from the
+    workbook yet or were written out as ExcelRowChunk records.
+
+    Low-cardinality text columns are dictionary-encoded: their strings go
+    into the sheet's string pool and cells store the integer code instead.
+    Columns are picked from the first batch, where at most
+    ENCODE_MAX_DISTINCT_RATIO of a column's strings may be distinct. See
+    ExcelData.string_pool.
+
+    ``heartbeat``, if given, is called after every flush; the ingest queue
+    uses it to renew the job's lease.
+    """
+
+    ENCODE_MAX_DISTINCT_RATIO = 0.5
+    # Keeps the pool, which is loaded with every page of rows, small
+    POOL_MAX_ENTRIES = 10000
+
+    def __init__(
+        self,
+        sheet: ExcelData,
+        batch_size: int,
+        heartbeat: Optional[Callable[[], None]] = None,
+    ):
+        self.sheet = sheet
+        self.heartbeat = heartbeat
+        # Flush whole chunks only, so chunk boundaries stay fixed
+        self.batch_size = max(batch_size, ExcelRowChunk.ROWS_PER_CHUNK)
+        self.buffer: List[List[Any]] = []
+        self.rows_written = 0
+        self.column_count = len(sheet.headers)
+        self.pool: Dict[str, int] = {}
+        self.encoded_columns: Optional[Set[int]] = None
+        # Time spent writing chunks, for load throughput
+        self.load_seconds = 0.0
+
+    def write(self, row: List[Any]) -> None:
+        self.buffer.append(row)
+        self.column_count = max(self.column_count, len(row))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self, final: bool = False) -> None:
+        size = ExcelRowChunk.ROWS_PER_CHUNK
+        # Hold back a trailing partial chunk until the sheet is finished
+        ready = len(self.buffer) if final else len(self.buffer) // size * size
+        if not ready:
+            return
+
+        if self.encoded_columns is None:
+            self.encoded_columns = self._pick_encoded_columns(self.buffer)
+        rows = [self._encode(row) for row in self.buffer[:ready]]
+
+        started = time.perf_counter()
+        load_chunks(
+            ExcelRowChunk.build(self.sheet, rows, first_index=self.rows_written // size)
+        )
+        self.load_seconds += time.perf_counter() - started
+        self.rows_written += ready
+        self.buffer = self.buffer[ready:]
+        if self.heartbeat:
+            self.heartbeat()
+
+    def _pick_encoded_columns(self, sample: List[List[Any]]) -> Set[int]:
+        columns: Dict[int, List[str]] = {}
+        for row in sample:
+            for i, value in enumerate(row):
+                if type(value) is str:
+                    columns.setdefault(i, []).append(value)
+        return {
+            i
+            for i, values in columns.items()
+            if len(values) > 1
+            and len(set(values)) <= len(values) * self.ENCODE_MAX_DISTINCT_RATIO
+        }
+
+    def _encode(self, row: List[Any]) -> List[Any]:
+        encoded = list(row)
+        for i in self.encoded_columns:  # type: ignore
+            if i >= len(row) or row[i] is None:
+                continue
+            value = row[i]
+            if type(value) is not str:
+                # Keeps numbers apart from pool codes
+                encoded[i] = [value]
+                continue
+            code = self.pool.get(value)
+            if code is None and len(self.pool) < self.POOL_MAX_ENTRIES:
+                code = self.pool[value] = len(self.pool)
+            if code is not None:
+                # Strings past the cap stay literal
+                encoded[i] = code
+        return encoded
+
+    def close(self) -> None:
+        self.flush(final=True)
+        self.sheet.row_count = self.rows_written
+        self.sheet.column_count = self.column_count
+        # dicts keep insertion order, which is code order
+        self.sheet.string_pool = list(self.pool)
+        self.sheet.encoded_columns = sorted(self.encoded_columns or ())
+        self.sheet.save(
+            update_fields=[
+                "row_count",
+                "column_count",
+                "string_pool",
+                "encoded_columns",
+            ]
+        )
+        if self.load_seconds:
+            logger.info(
+                f"Loaded {self.rows_written} rows of sheet {self.sheet.pk} in "
+                f"{self.load_seconds:.2f}s "
+                f"({self.rows_written / self.load_seconds:.0f} rows/s)"
+            )
+
+
+def iter_sheet_rows(rows: Iterator[tuple]) -> Iterator[List[Any]]:
+    """Yield worksheet rows as lists of raw cell values, skipping empty rows."""
+    for row in rows:
+        # Only add non-empty rows
+        if any(cell is not None and cell != "" for cell in row):
+            yield list(row)
+
+
+def write_sheet(
+    sheet: ExcelData,
+    rows: Iterator[tuple],
+    heartbeat: Optional[Callable[[], None]] = None,
+) -> None:
+    """Parse a worksheet's raw rows (header row first) into ``sheet``.
+
+    Cells keep their native types. Each column's inferred type is saved on
+    ExcelData.schema and its statistics on ExcelData.profile. ``heartbeat``
+    is called after every batch of rows is written.
+    """
+    # Get headers from first row
+    headers = []
+    first_row = next(rows, None)
+    if first_row:
+        headers = [
+            str(cell) if cell is not None else f"Column {i+1}"
+            for i, cell in enumerate(first_row)
+        ]
+    sheet.headers = headers
+
+    # Drop leftovers from an earlier attempt before re-parsing
+    sheet.chunks.all().delete()  # type: ignore
+    clear_search_index(sheet)
+    batch_size = settings.EXCEL_CONFIG["INGEST_BATCH_ROWS"]
+    writer = SheetWriter(sheet, batch_size, heartbeat)
+    schema = SchemaTracker()
+    profiler = ColumnProfiler(batch_size)
+    columnar = (
+        open_columnar_writer(sheet, batch_size)
+        if settings.EXCEL_CONFIG["COLUMNAR_ENABLED"]
+        else None
+    )
+    search = (
+        SearchIndexWriter(sheet, batch_size)
+        if settings.EXCEL_CONFIG["SEARCH_INDEX_ENABLED"]
+        else None
+    )
+    try:
+        for raw_row in iter_sheet_rows(rows):
+            # Types are read from the raw values, before dates
+            # are flattened to ISO strings for JSON storage
+            schema.write(raw_row)
+            row_data = [to_json_value(cell) for cell in raw_row]
+            writer.write(row_data)
+            profiler.write(row_data)
+            if columnar:
+                columnar.write(row_data)
+            if search:
+                search.write(row_data)
+        writer.close()
+        if search:
+            search.close()
+
+        sheet.schema = schema.infer(headers)
+        sheet.profile = profiler.profile(headers)
+        sheet.parsed_at = timezone.now()
+        sheet.save(update_fields=["headers", "schema", "profile", "parsed_at"])
+    except BaseException:
+        if columnar:
+            # Leaves no half-written columns behind
+            columnar.discard()
+        raise
+    if columnar:
+        columnar.save(sheet)
+
+
+def store_sheet(
+    owner: dict,
+    sheet_index: int,
+    sheet_name: str,
+    rows: Iterator[tuple],
+    heartbeat: Optional[Callable[[], None]] = None,
+) -> ExcelData:
+    """Write one worksheet's raw rows (header row first) as an ExcelData."""
+    sheet = ExcelData.objects.create(
+        **owner, sheet_name=sheet_name, sheet_index=sheet_index
+    )
+    write_sheet(sheet, rows, heartbeat)
+    return sheet
+
+
+def create_sheet_stubs(owner: dict, parser: SheetParser) -> List[ExcelData]:
+    """Create one unparsed ExcelData per sheet from workbook metadata only."""
+    return ExcelData.objects.bulk_create(
+        [
+            ExcelData(
+                **owner,
+                sheet_name=name,
+                sheet_index=index,
+                dimension=(parser.sheet_dimension(index) or "")[:32],
+            )
+            for index, name in enumerate(parser.sheet_names)
+        ]
+    )
+
+
+def materialize_sheet(sheet: ExcelData) -> ExcelData:
+    """Parse the rows of a stub sheet created by lazy ingestion.
+
+    The sheet row is locked while parsing, so concurrent viewers wait for
+    the first parse instead of repeating it.
+
+    Raises:
+        Exception: If the workbook cannot be parsed
+    """
+    with transaction.atomic():
+        locked = ExcelData.objects.select_for_update().get(pk=sheet.pk)
+        if not locked.is_parsed:
+            field_file = locked.blob.file if locked.blob_id else locked.upload.file  # type: ignore
+            try:
+                field_file.open("rb")
+                try:
+                    with open_parser(
+                        field_file, get_parser_engine(field_file)
+                    ) as parser:
+                        write_sheet(locked, parser.iter_rows(locked.sheet_index))
+                finally:
+                    field_file.close()
+            except Exception as e:
+                raise Exception(f"Error processing Excel file: {str(e)}")
+            logger.info(f"Parsed sheet {locked.sheet_index} of {locked}")
+
+    sheet.refresh_from_db()
+    return sheet
+
+
+def get_parse_workers(upload: ExcelUpload, sheet_count: int) -> int:
+    """Number of processes to parse sheets with, or 0 to parse serially.
+
+    Small files and single-sheet workbooks are not worth the process start-up
+    cost, and workers need a local path to open the workbook themselves.
+    """
+    workers = settings.EXCEL_CONFIG["INGEST_PARSE_WORKERS"]
+    if workers < 2 or sheet_count < 2:
+        return 0
+    if upload.file.size < settings.EXCEL_CONFIG["INGEST_PARALLEL_MIN_BYTES"]:
+        return 0
+    try:
+        upload.file.path
+    except NotImplementedError:
+        return 0
+    return min(workers, sheet_count)
+
+
+def get_parser_engine(field_file, preferred: Optional[str] = None) -> str:
+    """Parser engine for a stored workbook; see parsers.choose_engine()."""
+    return choose_engine(
+        field_file.name,
+        field_file.size,
+        preferred=preferred or settings.EXCEL_CONFIG["INGEST_PARSER"],
+        lxml_min_bytes=settings.EXCEL_CONFIG["INGEST_LXML_MIN_BYTES"],
+    )
+
+
+def process_excel_file(
+    upload: ExcelUpload, heartbeat: Optional[Callable[[], None]] = None
+) -> None:
+    """Process the Excel file and store data.
+
+    The workbook is read by the parser engine chosen for its type and size,
+    which streams each sheet instead of building a cell tree for the whole
+    file. Every row of every sheet is kept; SheetWriter writes them out as
+    ExcelRowChunk records in batches of INGEST_BATCH_ROWS, so only one batch
+    per sheet is held in memory.
+
+    With INGEST_LAZY_SHEETS only the workbook's sheet list and declared
+    dimensions are read: each sheet is stored as a stub and its rows are
+    parsed by materialize_sheet() the first time they are viewed.
+
+    Large multi-sheet workbooks are parsed on a pool of INGEST_PARSE_WORKERS
+    processes, one sheet per task; sheets are still stored in order by this
+    process.
+
+    Sheets are attached to the upload's blob when it has one, so every
+    upload of the same content shares them.
+
+    ``heartbeat`` is called after every batch of rows and every sheet. It
+    may raise LeaseLostError to stop parsing; that error is not wrapped.
+    """
+    owner = {"blob_id": upload.blob_id} if upload.blob_id else {"upload": upload}
+    try:
+        # Load workbook
+        lazy = settings.EXCEL_CONFIG["INGEST_LAZY_SHEETS"]
+        # lxml reads sheet metadata without loading shared strings
+        engine = get_parser_engine(upload.file, ENGINE_LXML if lazy else None)
+        upload.file.open("rb")
+        parser: SheetParser = open_parser(upload.file, engine)
+        sheets: Optional[Generator[Tuple[str, Iterator[tuple]], None, None]] = None
+        try:
+            sheet_names = parser.sheet_names
+            upload.sheet_count = len(sheet_names)
+            upload.save(update_fields=["sheet_count"])
+
+            if lazy:
+                create_sheet_stubs(owner, parser)
+                return
+
+            workers = get_parse_workers(upload, len(sheet_names))
+            if workers:
+                sheets = iter_sheets_in_parallel(
+                    upload.file.path, engine, len(sheet_names), workers
+                )
+            else:
+                sheets = (
+                    (name, parser.iter_rows(index))
+                    for index, name in enumerate(sheet_names)
+                )
+
+            # Process each sheet
+            for sheet_index, (sheet_name, rows) in enumerate(sheets):
+                store_sheet(owner, sheet_index, sheet_name, rows, heartbeat)
+                if heartbeat:
+                    heartbeat()
+        finally:
+            if sheets is not None:
+                # Stops the worker pool, if any, and removes its spool files
+                sheets.close()
+            parser.close()
+            upload.file.close()
+
+    except LeaseLostError:
+        raise
+    except Exception as e:
+        raise Exception(f"Error processing Excel file: {str(e)}")
+
+
+def ingest_blob(
+    upload: ExcelUpload, heartbeat: Optional[Callable[[], None]] = None
+) -> None:
+    """Parse the upload's blob once, or reuse sheets parsed earlier.
+
+    The blob row is locked while parsing so concurrent uploads of the same
+    content wait for the first parse instead of repeating it.
+    """
+    blob = ExcelBlob.objects.select_for_update().get(pk=upload.blob_id)
+
+    if not blob.is_parsed:
+        blob.sheets.all().delete()  # type: ignore
+        process_excel_file(upload, heartbeat)
+        blob.sheet_count = upload.sheet_count
+        blob.parsed_at = timezone.now()
+        blob.save(update_fields=["sheet_count", "parsed_at"])
+    else:
+        logger.info(f"Reusing parsed sheets of blob {blob.sha256}")
+        upload.sheet_count = blob.sheet_count
+        upload.save(update_fields=["sheet_count"])
+
+
+def ingest_upload(
+    upload: ExcelUpload, heartbeat: Optional[Callable[[], None]] = None
+) -> ExcelUpload:
+    """Run ingestion for an upload and record the status transitions.
+
+    The upload moves to STATUS_PROCESSING before parsing starts so that the
+    file list reflects the running job. Parsed sheets are written in one
+    transaction, so a failed attempt leaves no partial ExcelData behind.
+
+    ``heartbeat`` is called as parsing progresses and once more before the
+    transaction commits, so a worker that lost its job's lease (it raises
+    LeaseLostError) rolls its sheets back instead of committing them.
+
+    Raises:
+        Exception: The parsing error. The upload is left processing: the
+            caller decides whether it is retried or marked failed
+    """
+    upload.status = ExcelUpload.STATUS_PROCESSING
+    upload.error_message = ""
+    upload.save(update_fields=["status", "error_message"])
+
+    try:
+        with transaction.atomic():
+            if heartbeat:
+                heartbeat()
+            if upload.blob_id:
+                ingest_blob(upload, heartbeat)
+            else:
+                # Drop leftovers from an earlier attempt before re-parsing
+                upload.sheets.all().delete()  # type: ignore
+                process_excel_file(upload, heartbeat)
+            if heartbeat:
+                heartbeat()
+    except Exception as e:
+        logger.error(f"Ingestion failed for upload {upload.pk}: {str(e)}")
+        raise
+
+    upload.status = ExcelUpload.STATUS_COMPLETED
+    upload.processed_at = timezone.now()
+    upload.save(update_fields=["status", "processed_at"])
+    return upload
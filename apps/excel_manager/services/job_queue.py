@@ -0,0 +1,254 @@
+"""Database-backed job queue for out-of-band Excel ingestion.
+
+Jobs live in the IngestJob table. Workers lease a job by stamping it with
+their id and a lease deadline; PostgreSQL's ``SELECT ... FOR UPDATE SKIP
+LOCKED`` keeps concurrent workers from picking the same row. Failed jobs are
+retried with exponential backoff until ``INGEST_MAX_ATTEMPTS`` is reached;
+so are jobs whose worker died (their lease expired), which count as failed
+attempts too. A running job renews its lease after every batch of rows it
+writes, and a worker whose lease was taken over rolls back its sheets and
+stops without recording anything.
+"""
+
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..models import ExcelUpload, IngestJob
+from .ingestion import ingest_upload
+from .leases import LeaseLostError
+
+logger = logging.getLogger(__name__)
+
+
+def get_worker_id() -> str:
+    """Return an identifier for the current worker process."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_ingest(upload: ExcelUpload) -> IngestJob:
+    """Queue an upload for background parsing."""
+    return IngestJob.objects.create(
+        upload=upload,
+        max_attempts=settings.EXCEL_CONFIG["INGEST_MAX_ATTEMPTS"],
+    )
+
+
+def lease_next_job(
+    worker_id: str, lease_seconds: Optional[int] = None
+) -> Optional[IngestJob]:
+    """Lease the oldest runnable job, or return None if the queue is empty.
+
+    A job is runnable when it is queued and its backoff has elapsed, or when
+    it is leased but the lease has expired.
+    """
+    if lease_seconds is None:
+        lease_seconds = settings.EXCEL_CONFIG["INGEST_LEASE_SECONDS"]
+
+    now = timezone.now()
+    stale = Q(status=IngestJob.STATUS_LEASED, leased_until__lt=now)
+    # Give up on jobs that keep taking their worker down (e.g. OOM kills),
+    # which never get to fail_job()
+    error = "The ingest worker stopped responding"
+    with transaction.atomic():
+        abandoned = IngestJob.objects.filter(stale, attempts__gte=F("max_attempts"))
+        if connection.features.has_select_for_update_skip_locked:
+            # A running job's row stays locked by its lease renewal until
+            # its ingest transaction commits; don't wait for it
+            abandoned = abandoned.select_for_update(skip_locked=True)
+        abandoned = list(abandoned.values_list("pk", "upload_id"))
+        upload_ids = [upload_id for _, upload_id in abandoned]
+        IngestJob.objects.filter(pk__in=[pk for pk, _ in abandoned]).update(
+            status=IngestJob.STATUS_FAILED,
+            last_error=error,
+            leased_until=None,
+            finished_at=now,
+        )
+        ExcelUpload.objects.filter(pk__in=upload_ids).update(
+            status=ExcelUpload.STATUS_FAILED, error_message=error
+        )
+
+    runnable = IngestJob.objects.filter(
+        Q(status=IngestJob.STATUS_QUEUED, available_at__lte=now) | stale
+    ).order_by("available_at", "pk")
+
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            runnable = runnable.select_for_update(skip_locked=True)
+        job = runnable.first()
+        if job is None:
+            return None
+
+        job.status = IngestJob.STATUS_LEASED
+        job.attempts += 1
+        job.leased_by = worker_id
+        job.leased_until = now + timedelta(seconds=lease_seconds)
+        job.save(update_fields=["status", "attempts", "leased_by", "leased_until"])
+
+    return job
+
+
+def _held_lease(job: IngestJob):
+    """Queryset matching ``job`` only while this lease of it is current.
+
+    Every lease increments ``attempts``, so it tells leases by the same
+    worker apart.
+    """
+    return IngestJob.objects.filter(
+        pk=job.pk,
+        status=IngestJob.STATUS_LEASED,
+        leased_by=job.leased_by,
+        attempts=job.attempts,
+    )
+
+
+def renew_lease(job: IngestJob, lease_seconds: Optional[int] = None) -> None:
+    """Extend the lease of a running job.
+
+    Called from inside the ingest transaction, so on PostgreSQL the job's
+    row also stays locked until the sheets are committed and
+    lease_next_job() skips it.
+
+    Raises:
+        LeaseLostError: Another worker leased the job in the meantime
+    """
+    if lease_seconds is None:
+        lease_seconds = settings.EXCEL_CONFIG["INGEST_LEASE_SECONDS"]
+    leased_until = timezone.now() + timedelta(seconds=lease_seconds)
+    if not _held_lease(job).update(leased_until=leased_until):
+        raise LeaseLostError(f"Ingest job {job.pk} was leased by another worker")
+    job.leased_until = leased_until
+
+
+def complete_job(job: IngestJob) -> bool:
+    """Mark a leased job as done.
+
+    Returns:
+        Whether it was recorded; not if another worker leased the job
+    """
+    job.status = IngestJob.STATUS_DONE
+    job.leased_until = None
+    job.finished_at = timezone.now()
+    recorded = _held_lease(job).update(
+        status=job.status, leased_until=None, finished_at=job.finished_at
+    )
+    if not recorded:
+        logger.warning(
+            f"Ingest job {job.pk} was leased by another worker; " "not marking it done"
+        )
+    return bool(recorded)
+
+
+def fail_job(job: IngestJob, error: str) -> bool:
+    """Record a failed attempt and either reschedule or give up.
+
+    Returns:
+        Whether it was recorded; not if another worker leased the job
+    """
+    job.last_error = error
+    job.leased_until = None
+    retry = job.attempts < job.max_attempts
+
+    if retry:
+        backoff = settings.EXCEL_CONFIG["INGEST_RETRY_BACKOFF"] * 2 ** (
+            job.attempts - 1
+        )
+        job.status = IngestJob.STATUS_QUEUED
+        job.available_at = timezone.now() + timedelta(seconds=backoff)
+    else:
+        job.status = IngestJob.STATUS_FAILED
+        job.finished_at = timezone.now()
+
+    recorded = _held_lease(job).update(
+        status=job.status,
+        last_error=error,
+        leased_until=None,
+        available_at=job.available_at,
+        finished_at=job.finished_at,
+    )
+    if not recorded:
+        logger.warning(
+            f"Ingest job {job.pk} was leased by another worker; "
+            f"not recording its failure: {error}"
+        )
+        return False
+
+    if retry:
+        # The upload waits for the retry instead of showing as failed
+        ExcelUpload.objects.filter(pk=job.upload_id).update(
+            status=ExcelUpload.STATUS_PENDING
+        )
+        logger.warning(
+            f"Ingest job {job.pk} failed (attempt {job.attempts}/"
+            f"{job.max_attempts}), retrying in {backoff}s: {error}"
+        )
+    else:
+        ExcelUpload.objects.filter(pk=job.upload_id).update(
+            status=ExcelUpload.STATUS_FAILED, error_message=error
+        )
+        logger.error(f"Ingest job {job.pk} failed permanently: {error}")
+    return True
+
+
+def run_job(job: IngestJob) -> bool:
+    """Execute a leased job. Returns True on success."""
+    try:
+        ingest_upload(job.upload, heartbeat=lambda: renew_lease(job))
+    except LeaseLostError as e:
+        logger.warning(f"{e}; stopping")
+        return False
+    except Exception as e:
+        fail_job(job, str(e))
+        return False
+
+    return complete_job(job)
+
+
+def run_worker(
+    max_jobs: Optional[int] = None,
+    burst: bool = False,
+    poll_interval: Optional[float] = None,
+    should_stop: Callable[[], bool] = lambda: False,
+) -> int:
+    """Process jobs until ``max_jobs`` have run or the worker is stopped.
+
+    Args:
+        max_jobs: Exit after this many jobs so the parent can recycle the
+            process and release memory held by openpyxl
+        burst: Exit as soon as the queue is empty instead of polling
+        poll_interval: Seconds to sleep when the queue is empty
+        should_stop: Callback checked between jobs for graceful shutdown
+
+    Returns:
+        Number of jobs processed
+    """
+    if poll_interval is None:
+        poll_interval = settings.EXCEL_CONFIG["INGEST_POLL_INTERVAL"]
+
+    worker_id = get_worker_id()
+    processed = 0
+
+    while not should_stop():
+        if max_jobs is not None and processed >= max_jobs:
+            break
+
+        job = lease_next_job(worker_id)
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        logger.info(f"Worker {worker_id} running ingest job {job.pk}")
+        run_job(job)
+        processed += 1
+
+    return processed
@@ -0,0 +1,5 @@
+"""Errors shared by the leased job queues (ingest and AI validation)."""
+
+
+class LeaseLostError(Exception):
+    """The job's lease expired and another worker leased it."""
@@ -0,0 +1,92 @@
+"""Parse the worksheets of one workbook in parallel worker processes.
+
+Workers only parse XML: each opens the workbook with the chosen parser
+engine, streams a single worksheet and spools its raw rows to a temporary
+pickle file. The parent replays the spools in sheet order and does every
+database write itself, so ingestion still runs in one transaction.
+
+Worker processes are started with the "spawn" method and import this module
+without a configured Django, so it must not import models or settings.
+"""
+
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Tuple
+
+from .parsers import open_parser
+
+# Rows pickled together; bounds worker and parent memory per sheet
+SPOOL_BATCH_ROWS = 1000
+
+
+def spool_sheet(path: str, engine: str, sheet_index: int, spool_path: str) -> str:
+    """Write the raw rows of one worksheet to ``spool_path``.
+
+    Runs in a worker process.
+
+    Returns:
+        The worksheet's title
+    """
+    with open_parser(path, engine) as parser:
+        with open(spool_path, "wb") as f:
+            batch = []
+            for row in parser.iter_rows(sheet_index):
+                batch.append(row)
+                if len(batch) >= SPOOL_BATCH_ROWS:
+                    pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    batch = []
+            if batch:
+                pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return parser.sheet_names[sheet_index]
+
+
+def read_spool(spool_path: str) -> Iterator[tuple]:
+    """Yield the rows written by spool_sheet(), one batch in memory at a time."""
+    with open(spool_path, "rb") as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+
+def iter_sheets_in_parallel(
+    path: str, engine: str, sheet_count: int, workers: int
+) -> Iterator[Tuple[str, Iterator[tuple]]]:
+    """Parse every sheet on a process pool and yield them in sheet order.
+
+    Each item is ``(sheet_name, rows)``. A sheet's spool is deleted once the
+    caller moves on to the next one, while later sheets keep parsing in the
+    background.
+
+    Raises:
+        Exception: Whatever a worker raised while parsing a sheet
+    """
+    spool_dir = tempfile.mkdtemp(prefix="excel-sheets-")
+    pool = ProcessPoolExecutor(
+        max_workers=min(workers, sheet_count),
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+    try:
+        futures = [
+            pool.submit(
+                spool_sheet,
+                path,
+                engine,
+                index,
+                os.path.join(spool_dir, f"{index}.pickle"),
+            )
+            for index in range(sheet_count)
+        ]
+        for index, future in enumerate(futures):
+            spool_path = os.path.join(spool_dir, f"{index}.pickle")
+            yield future.result(), read_spool(spool_path)
+            os.remove(spool_path)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(spool_dir, ignore_errors=True)
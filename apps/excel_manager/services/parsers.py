@@ -0,0 +1,487 @@
+"""Pluggable workbook parsers.
+
+Every engine exposes the same small interface: the workbook's sheet names
+and an iterator of raw value tuples per sheet, header row included. Values
+keep the types openpyxl would return (int, float, bool, str, datetime,
+None) so ingestion does not care which engine produced them.
+
+Engines:
+
+* ``openpyxl`` -- openpyxl in read-only mode. Handles every .xlsx feature
+  but builds a cell object for every value.
+* ``lxml`` -- streams ``xl/worksheets/sheetN.xml`` straight out of the zip
+  with ``lxml.etree.iterparse``, clearing each row once read. Several times
+  faster than openpyxl for plain value extraction.
+* ``xls`` -- legacy BIFF workbooks via xlrd, which openpyxl cannot read.
+
+Real-world exports often format whole columns, so a sheet declares a
+dimension such as ``A1:XFD1048576`` and may even contain a million styled
+but empty rows. When the declared dimension reaches the sheet limits, the
+xlsx engines first scan the cell elements for the range actually holding
+values and trim every row to it, so no per-row work is spent on padding.
+
+Like parallel.py, this module is imported by spawned worker processes and
+must not import Django.
+"""
+
+import os
+import posixpath
+import re
+import zipfile
+from abc import ABC, abstractmethod
+from typing import IO, Dict, Iterator, List, Optional, Set, Tuple, Type, Union
+
+import openpyxl
+from lxml import etree
+from openpyxl.styles.numbers import (
+    BUILTIN_FORMATS,
+    is_date_format,
+    is_timedelta_format,
+)
+from openpyxl.utils.datetime import (
+    CALENDAR_MAC_1904,
+    CALENDAR_WINDOWS_1900,
+    from_excel,
+    from_ISO8601,
+)
+
+Source = Union[str, IO[bytes]]
+
+ENGINE_OPENPYXL = "openpyxl"
+ENGINE_LXML = "lxml"
+ENGINE_XLS = "xls"
+# Let choose_engine() decide from the file name and size
+ENGINE_AUTO = "auto"
+
+# Sheet size limits of .xlsx files
+MAX_ROWS = 1048576
+MAX_COLUMNS = 16384
+
+
+class SheetParser(ABC):
+    """Reads sheet names and raw row values from one workbook."""
+
+    name: str
+
+    @property
+    @abstractmethod
+    def sheet_names(self) -> List[str]:
+        """Names of all sheets, in workbook order."""
+
+    @abstractmethod
+    def iter_rows(self, sheet_index: int) -> Iterator[tuple]:
+        """Yield each row of a sheet as a tuple of cell values.
+
+        Rows missing from the file are yielded as empty tuples so the first
+        row is always the sheet's header row.
+        """
+
+    def sheet_dimension(self, sheet_index: int) -> Optional[str]:
+        """Used range the sheet declares, such as ``"A1:F200"``, if known
+        without reading its rows.
+        """
+        return None
+
+    def close(self) -> None:
+        """Release the underlying file."""
+
+    def __enter__(self) -> "SheetParser":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class OpenpyxlParser(SheetParser):
+    name = ENGINE_OPENPYXL
+
+    def __init__(self, source: Source):
+        self.source = source
+        self.workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return self.workbook.sheetnames
+
+    def _worksheet(self, sheet_index: int):
+        # sheetnames includes chartsheets, which have no cells
+        sheet = self.workbook[self.sheet_names[sheet_index]]
+        return sheet if hasattr(sheet, "iter_rows") else None
+
+    def iter_rows(self, sheet_index: int) -> Iterator[tuple]:
+        worksheet = self._worksheet(sheet_index)
+        if worksheet is None:
+            return iter(())
+
+        if is_bogus_dimension(self.sheet_dimension(sheet_index)):
+            # openpyxl would pad every row to the declared width
+            with LxmlXlsxParser(self.source) as scanner:
+                max_row, max_column = scanner.used_range(sheet_index)
+            if not max_row:
+                return iter(())
+            return worksheet.iter_rows(
+                max_row=max_row, max_col=max_column, values_only=True
+            )
+        return worksheet.iter_rows(values_only=True)
+
+    def sheet_dimension(self, sheet_index: int) -> Optional[str]:
+        worksheet = self._worksheet(sheet_index)
+        try:
+            return worksheet.calculate_dimension() if worksheet else None
+        except ValueError:
+            # No <dimension> element
+            return None
+
+    def close(self) -> None:
+        # Read-only workbooks keep the archive open until closed
+        self.workbook.close()
+
+
+SHEET_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+WORKSHEET_REL_TYPE = f"{REL_NS}/worksheet"
+
+ROW_TAG = f"{{{SHEET_NS}}}row"
+DIMENSION_TAG = f"{{{SHEET_NS}}}dimension"
+SHEET_DATA_TAG = f"{{{SHEET_NS}}}sheetData"
+VALUE_TAG = f"{{{SHEET_NS}}}v"
+INLINE_TAG = f"{{{SHEET_NS}}}is"
+TEXT_TAG = f"{{{SHEET_NS}}}t"
+RUN_TEXT_PATH = f"{{{SHEET_NS}}}r/{{{SHEET_NS}}}t"
+STRING_ITEM_TAG = f"{{{SHEET_NS}}}si"
+
+COORDINATE_RE = re.compile(r"([A-Z]+)(\d+)")
+
+
+def _column_index(letters: str) -> int:
+    """1-based column number of a column name such as ``"AB"``."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index
+
+
+def dimension_bounds(ref: Optional[str]) -> Optional[Tuple[int, int]]:
+    """``(max_row, max_column)`` of a range such as ``"A1:F200"``."""
+    if not ref:
+        return None
+    match = COORDINATE_RE.fullmatch(ref.split(":")[-1].replace("$", ""))
+    if match is None:
+        return None
+    return int(match.group(2)), _column_index(match.group(1))
+
+
+def is_bogus_dimension(ref: Optional[str]) -> bool:
+    """Whether a declared dimension spans whole rows or columns.
+
+    Such ranges come from formatting applied to entire columns or rows and
+    say nothing about where the data ends.
+    """
+    bounds = dimension_bounds(ref)
+    return bounds is not None and (bounds[0] >= MAX_ROWS or bounds[1] >= MAX_COLUMNS)
+
+
+def _cast_number(value: str):
+    # Same rule as openpyxl: integers stay ints
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+def _string_item_text(element) -> str:
+    """Text of a shared or inline string, without phonetic runs."""
+    parts = element.findall(TEXT_TAG) + element.findall(RUN_TEXT_PATH)
+    return "".join(part.text or "" for part in parts)
+
+
+def _iterparse(stream, tag: str):
+    """Yield completed ``tag`` elements, freeing each one after use."""
+    for _, element in etree.iterparse(
+        stream, events=("end",), tag=tag, resolve_entities=False
+    ):
+        yield element
+        element.clear()
+        # Drop already processed siblings still referenced by the root
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+class LxmlXlsxParser(SheetParser):
+    """Streams worksheet XML without creating openpyxl cell objects.
+
+    Opening only reads ``xl/workbook.xml``; styles and the shared string
+    table are loaded when rows are first read, so listing sheets and their
+    dimensions stays cheap.
+    """
+
+    name = ENGINE_LXML
+
+    def __init__(self, source: Source):
+        self.archive = zipfile.ZipFile(source)
+        self.shared_strings: Optional[List[str]] = None
+        try:
+            self._read_workbook()
+        except Exception:
+            self.archive.close()
+            raise
+
+    def _read_xml(self, name: str):
+        parser = etree.XMLParser(resolve_entities=False)
+        with self.archive.open(name) as f:
+            return etree.parse(f, parser).getroot()
+
+    def _read_workbook(self) -> None:
+        workbook = self._read_xml("xl/workbook.xml")
+        rels = self._read_xml("xl/_rels/workbook.xml.rels")
+        targets = {
+            rel.get("Id"): rel for rel in rels.iter(f"{{{PKG_REL_NS}}}Relationship")
+        }
+
+        properties = workbook.find(f"{{{SHEET_NS}}}workbookPr")
+        date1904 = properties is not None and properties.get("date1904") in (
+            "1",
+            "true",
+        )
+        self.epoch = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+
+        self._names: List[str] = []
+        # Worksheet part per sheet; None for chartsheets and the like
+        self.parts: List[Optional[str]] = []
+        for sheet in workbook.iter(f"{{{SHEET_NS}}}sheet"):
+            self._names.append(sheet.get("name"))
+            rel = targets.get(sheet.get(f"{{{REL_NS}}}id"))
+            if rel is None or rel.get("Type") != WORKSHEET_REL_TYPE:
+                self.parts.append(None)
+                continue
+            target = rel.get("Target")
+            if target.startswith("/"):
+                self.parts.append(target.lstrip("/"))
+            else:
+                self.parts.append(posixpath.normpath(posixpath.join("xl", target)))
+
+    def _read_styles(self) -> None:
+        """Find the cell styles whose number format makes values dates."""
+        self.date_styles: Set[int] = set()
+        self.timedelta_styles: Set[int] = set()
+        if "xl/styles.xml" not in self.archive.namelist():
+            return
+
+        styles = self._read_xml("xl/styles.xml")
+        formats: Dict[int, str] = dict(BUILTIN_FORMATS)
+        for fmt in styles.iter(f"{{{SHEET_NS}}}numFmt"):
+            formats[int(fmt.get("numFmtId"))] = fmt.get("formatCode", "")
+
+        cell_xfs = styles.find(f"{{{SHEET_NS}}}cellXfs")
+        if cell_xfs is None:
+            return
+        for style_id, xf in enumerate(cell_xfs.iter(f"{{{SHEET_NS}}}xf")):
+            code = formats.get(int(xf.get("numFmtId", 0)), "")
+            if is_date_format(code):
+                self.date_styles.add(style_id)
+                if is_timedelta_format(code):
+                    self.timedelta_styles.add(style_id)
+
+    def _read_shared_strings(self) -> List[str]:
+        if "xl/sharedStrings.xml" not in self.archive.namelist():
+            return []
+        with self.archive.open("xl/sharedStrings.xml") as f:
+            return [_string_item_text(si) for si in _iterparse(f, STRING_ITEM_TAG)]
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return self._names
+
+    def sheet_dimension(self, sheet_index: int) -> Optional[str]:
+        part = self.parts[sheet_index]
+        if part is None:
+            return None
+        with self.archive.open(part) as f:
+            # <dimension> precedes <sheetData>, so stop at the first of them
+            for _, element in etree.iterparse(
+                f,
+                events=("start",),
+                tag=(DIMENSION_TAG, SHEET_DATA_TAG),
+                resolve_entities=False,
+            ):
+                return element.get("ref") if element.tag == DIMENSION_TAG else None
+        return None
+
+    def used_range(self, sheet_index: int) -> Tuple[int, int]:
+        """``(max_row, max_column)`` of the cells that hold a value.
+
+        Reads the whole sheet XML but never decodes a value; ``(0, 0)``
+        means the sheet is empty.
+        """
+        max_row = max_column = 0
+        part = self.parts[sheet_index]
+        if part is None:
+            return max_row, max_column
+        with self.archive.open(part) as f:
+            next_row = 1
+            for row in _iterparse(f, ROW_TAG):
+                row_number = int(row.get("r", next_row))
+                next_row = row_number + 1
+                column = 0
+                for cell in row:
+                    column = self._cell_column(cell, column)
+                    if cell.findtext(VALUE_TAG) or cell.find(INLINE_TAG) is not None:
+                        max_row = row_number
+                        max_column = max(max_column, column)
+        return max_row, max_column
+
+    def iter_rows(self, sheet_index: int) -> Iterator[tuple]:
+        part = self.parts[sheet_index]
+        if part is None:
+            return
+
+        max_row = max_column = None
+        if is_bogus_dimension(self.sheet_dimension(sheet_index)):
+            max_row, max_column = self.used_range(sheet_index)
+
+        if self.shared_strings is None:
+            self._read_styles()
+            self.shared_strings = self._read_shared_strings()
+        with self.archive.open(part) as f:
+            next_row = 1
+            for row in _iterparse(f, ROW_TAG):
+                row_number = int(row.get("r", next_row))
+                if max_row is not None and row_number > max_row:
+                    # Only styled, empty rows remain
+                    return
+                # Rows without cells are not written to the file
+                for _ in range(next_row, row_number):
+                    yield ()
+                next_row = row_number + 1
+                yield self._parse_row(row, max_column)
+
+    @staticmethod
+    def _cell_column(cell, previous: int) -> int:
+        coordinate = cell.get("r")
+        if not coordinate:
+            return previous + 1
+        return _column_index(COORDINATE_RE.match(coordinate).group(1))
+
+    def _parse_row(self, row, max_column: Optional[int] = None) -> tuple:
+        values: list = []
+        for cell in row:
+            column = self._cell_column(cell, len(values))
+            if max_column is not None and column > max_column:
+                break
+            # Cells without values are not written to the file either
+            values.extend([None] * (column - 1 - len(values)))
+            values.append(self._parse_cell(cell))
+        return tuple(values)
+
+    def _parse_cell(self, cell):
+        data_type = cell.get("t", "n")
+        if data_type == "inlineStr":
+            inline = cell.find(INLINE_TAG)
+            return _string_item_text(inline) if inline is not None else None
+
+        value = cell.findtext(VALUE_TAG) or None
+        if value is None:
+            return None
+        if data_type == "n":
+            number = _cast_number(value)
+            style_id = int(cell.get("s", 0))
+            if style_id in self.date_styles:
+                try:
+                    return from_excel(
+                        number,
+                        self.epoch,
+                        timedelta=style_id in self.timedelta_styles,
+                    )
+                except (OverflowError, ValueError):
+                    return "#VALUE!"
+            return number
+        if data_type == "s":
+            return self.shared_strings[int(value)]  # type: ignore
+        if data_type == "b":
+            return bool(int(value))
+        if data_type == "d":
+            return from_ISO8601(value)
+        # "str" (formula result) and "e" (error) are plain text
+        return value
+
+    def close(self) -> None:
+        self.archive.close()
+
+
+class XlsParser(SheetParser):
+    """Legacy .xls (BIFF) workbooks, read with xlrd."""
+
+    name = ENGINE_XLS
+
+    def __init__(self, source: Source):
+        import xlrd
+
+        self.xlrd = xlrd
+        if isinstance(source, str):
+            self.book = xlrd.open_workbook(source, on_demand=True)
+        else:
+            # .xls uploads are capped by the form's MAX_FILE_SIZE
+            self.book = xlrd.open_workbook(file_contents=source.read(), on_demand=True)
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return self.book.sheet_names()
+
+    def iter_rows(self, sheet_index: int) -> Iterator[tuple]:
+        sheet = self.book.sheet_by_index(sheet_index)
+        try:
+            for row_index in range(sheet.nrows):
+                yield tuple(self._cell_value(cell) for cell in sheet.row(row_index))
+        finally:
+            self.book.unload_sheet(sheet_index)
+
+    def _cell_value(self, cell):
+        xlrd = self.xlrd
+        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+            return None
+        if cell.ctype == xlrd.XL_CELL_NUMBER:
+            # BIFF stores every number as a double
+            return int(cell.value) if cell.value.is_integer() else cell.value
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            try:
+                return xlrd.xldate.xldate_as_datetime(cell.value, self.book.datemode)
+            except xlrd.xldate.XLDateError:
+                return "#VALUE!"
+        if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            return bool(cell.value)
+        if cell.ctype == xlrd.XL_CELL_ERROR:
+            return xlrd.error_text_from_code.get(cell.value, "#VALUE!")
+        return cell.value
+
+    def close(self) -> None:
+        self.book.release_resources()
+
+
+PARSERS: Dict[str, Type[SheetParser]] = {
+    ENGINE_OPENPYXL: OpenpyxlParser,
+    ENGINE_LXML: LxmlXlsxParser,
+    ENGINE_XLS: XlsParser,
+}
+
+
+def choose_engine(
+    filename: str, size: int, preferred: str = ENGINE_AUTO, lxml_min_bytes: int = 0
+) -> str:
+    """Pick the engine for a workbook.
+
+    .xls files always use the BIFF engine. For .xlsx, ``preferred`` wins
+    unless it is ``auto``, in which case files of at least
+    ``lxml_min_bytes`` use the lxml engine and smaller ones openpyxl.
+    """
+    if os.path.splitext(filename)[1].lower() == ".xls":
+        return ENGINE_XLS
+    if preferred != ENGINE_AUTO:
+        if preferred not in PARSERS:
+            raise ValueError(f"Unknown parser engine: {preferred}")
+        return preferred
+    return ENGINE_LXML if size >= lxml_min_bytes else ENGINE_OPENPYXL
+
+
+def open_parser(source: Source, engine: str) -> SheetParser:
+    """Open ``source`` with the named engine."""
+    return PARSERS[engine](source)
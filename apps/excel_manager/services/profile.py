@@ -0,0 +1,247 @@
+"""Per-column statistical profiles computed while a sheet is ingested.
+
+ColumnProfiler sees every row once, in the same pass that writes the row
+chunks, and summarizes each batch of rows with NumPy before merging it into
+running state of bounded size:
+
+- null and value counts
+- a HyperLogLog estimate of distinct values
+- min/max, plus mean and standard deviation for numbers
+- the most frequent values (Misra-Gries, so counts are lower bounds once a
+  column has more than TOP_CAPACITY distinct values)
+- a histogram of text lengths in power-of-two buckets
+
+The result is saved on ExcelData.profile, so readers never rescan rows.
+"""
+
+import math
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# HyperLogLog with 2**12 registers: ~1.6% standard error in 4 KB per column
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+# Hash bits left after the register index; low enough to be exact in float64
+HLL_RANK_BITS = 64 - HLL_PRECISION
+
+TOP_CAPACITY = 64
+TOP_K = 5
+
+# Text lengths are bucketed as 1, 2-3, 4-7, ... and 256 or longer
+LENGTH_BUCKETS = 9
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+# Keeps the number 1 and the text "1" apart
+_TEXT_SALT = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: spreads input bits over the whole hash."""
+    with np.errstate(over="ignore"):
+        z = values.astype(np.uint64)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return (z ^ (z >> np.uint64(31))) & _MASK64
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    # Exact for values below 2**53, which frexp represents without rounding
+    return np.frexp(values.astype(np.float64))[1]
+
+
+def _plain_number(value: float) -> Any:
+    return int(value) if value.is_integer() else value
+
+
+class HyperLogLog:
+    """Distinct-count estimator over deterministic 64-bit hashes."""
+
+    def __init__(self):
+        self.registers = np.zeros(HLL_REGISTERS, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        if not len(hashes):
+            return
+        index = (hashes >> np.uint64(HLL_RANK_BITS)).astype(np.intp)
+        rest = hashes & np.uint64((1 << HLL_RANK_BITS) - 1)
+        rank = (HLL_RANK_BITS - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def add_numbers(self, numbers: np.ndarray) -> None:
+        self.add_hashes(_mix64(numbers.astype(np.float64).view(np.uint64)))
+
+    def add_strings(self, strings) -> None:
+        crcs = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in strings), dtype=np.uint64
+        )
+        self.add_hashes(_mix64(crcs ^ _TEXT_SALT))
+
+    def estimate(self) -> int:
+        m = HLL_REGISTERS
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+
+class _ColumnState:
+    def __init__(self):
+        self.count = 0
+        self.nulls = 0
+        self.distinct = HyperLogLog()
+        # Running numeric moments, merged per batch (Chan et al.)
+        self.numbers = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min_number: Optional[float] = None
+        self.max_number: Optional[float] = None
+        self.min_text: Optional[str] = None
+        self.max_text: Optional[str] = None
+        self.top: Dict[Tuple[str, Any], int] = {}
+        self.lengths = np.zeros(LENGTH_BUCKETS, dtype=np.int64)
+
+    def update(self, cells: List[Any]) -> None:
+        numbers = []
+        strings = []
+        others = []
+        for cell in cells:
+            kind = type(cell)
+            if cell is None or cell == "":
+                self.nulls += 1
+            elif kind is int or kind is float:
+                numbers.append(cell)
+            elif kind is str:
+                strings.append(cell)
+            else:
+                others.append(cell)
+        self.count += len(numbers) + len(strings) + len(others)
+
+        if numbers:
+            self._update_numbers(np.array(numbers, dtype=np.float64))
+        if strings:
+            self._update_strings(strings)
+        if others:
+            # Booleans and anything else non-numeric are profiled as text
+            self._update_strings([str(cell) for cell in others])
+
+        batch = Counter((type(cell).__name__, cell) for cell in numbers)
+        batch.update(("str", cell) for cell in strings)
+        batch.update(("str", str(cell)) for cell in others)
+        self._update_top(batch)
+
+    def _update_numbers(self, values: np.ndarray) -> None:
+        finite = values[np.isfinite(values)]
+        self.distinct.add_numbers(values)
+        if not len(finite):
+            return
+        n, mean = len(finite), float(finite.mean())
+        m2 = float(((finite - mean) ** 2).sum())
+        total = self.numbers + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.numbers * n / total
+        self.numbers = total
+        low, high = float(finite.min()), float(finite.max())
+        self.min_number = low if self.min_number is None else min(self.min_number, low)
+        self.max_number = (
+            high if self.max_number is None else max(self.max_number, high)
+        )
+
+    def _update_strings(self, strings: List[str]) -> None:
+        unique = set(strings)
+        # Duplicates cannot change a HyperLogLog, so hash each value once
+        self.distinct.add_strings(unique)
+        low, high = min(unique), max(unique)
+        self.min_text = low if self.min_text is None else min(self.min_text, low)
+        self.max_text = high if self.max_text is None else max(self.max_text, high)
+        lengths = np.fromiter((len(s) for s in strings), dtype=np.int64)
+        buckets = np.minimum(_bit_length(lengths) - 1, LENGTH_BUCKETS - 1)
+        self.lengths += np.bincount(buckets, minlength=LENGTH_BUCKETS)
+
+    def _update_top(self, batch: Counter) -> None:
+        for key, count in batch.items():
+            self.top[key] = self.top.get(key, 0) + count
+        if len(self.top) > TOP_CAPACITY:
+            # Misra-Gries merge: subtract the (capacity + 1)-th largest count
+            cut = sorted(self.top.values(), reverse=True)[TOP_CAPACITY]
+            self.top = {
+                key: count - cut for key, count in self.top.items() if count > cut
+            }
+
+    def result(self, name: str) -> Dict[str, Any]:
+        numeric = self.numbers > 0 and self.numbers >= self.count - self.numbers
+        top = sorted(self.top.items(), key=lambda item: -item[1])[:TOP_K]
+        histogram = [
+            {
+                "min_length": 1 << bucket,
+                "max_length": (
+                    (1 << (bucket + 1)) - 1 if bucket < LENGTH_BUCKETS - 1 else None
+                ),
+                "count": int(count),
+            }
+            for bucket, count in enumerate(self.lengths)
+            if count
+        ]
+        return {
+            "name": name,
+            "count": self.count,
+            "null_count": self.nulls,
+            "distinct": min(self.distinct.estimate(), self.count),
+            "min": _plain_number(self.min_number) if numeric else self.min_text,
+            "max": _plain_number(self.max_number) if numeric else self.max_text,
+            "mean": round(self.mean, 6) if numeric else None,
+            "stddev": (
+                round(math.sqrt(self.m2 / self.numbers), 6) if numeric else None
+            ),
+            "top_values": [[value, count] for (_, value), count in top],
+            "length_histogram": histogram,
+        }
+
+
+class ColumnProfiler:
+    """Streams rows into per-column profiles, ``batch_size`` rows at a time."""
+
+    def __init__(self, batch_size: int = 1000):
+        self.batch_size = batch_size
+        self.buffer: List[List[Any]] = []
+        self.columns: List[_ColumnState] = []
+        self.row_count = 0
+
+    def write(self, row: List[Any]) -> None:
+        self.buffer.append(row)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        width = max(len(row) for row in self.buffer)
+        while len(self.columns) < width:
+            column = _ColumnState()
+            # Earlier rows are blank in a column that appears late
+            column.nulls = self.row_count
+            self.columns.append(column)
+        for i, column in enumerate(self.columns):
+            column.update([row[i] if i < len(row) else None for row in self.buffer])
+        self.row_count += len(self.buffer)
+        self.buffer = []
+
+    def profile(self, headers: List[str]) -> List[Dict[str, Any]]:
+        """Finish the pass and return one profile dict per column."""
+        self.flush()
+        profiles = []
+        for i in range(max(len(headers), len(self.columns))):
+            name = headers[i] if i < len(headers) else f"Column {i+1}"
+            if i < len(self.columns):
+                profiles.append(self.columns[i].result(name))
+            else:
+                column = _ColumnState()
+                column.nulls = self.row_count
+                profiles.append(column.result(name))
+        return profiles
@@ -0,0 +1,127 @@
+"""Cell type preservation and per-column type inference.
+
+openpyxl already returns typed values (int, float, bool, datetime, str).
+Ingestion keeps them as JSON-native values instead of ``str(cell)`` and
+counts the type codes of each column as rows stream past. Once a sheet is
+read, the counts are enough to infer each column's type.
+"""
+
+import datetime
+from decimal import Decimal
+from typing import Any, Dict, List
+
+import numpy as np
+
+TYPE_NULL = 0
+TYPE_BOOL = 1
+TYPE_INT = 2
+TYPE_FLOAT = 3
+TYPE_DATE = 4
+TYPE_TEXT = 5
+
+TYPE_NAMES = {
+    TYPE_BOOL: "bool",
+    TYPE_INT: "int",
+    TYPE_FLOAT: "float",
+    TYPE_DATE: "date",
+    TYPE_TEXT: "text",
+}
+
+# Inferred type of a column with no values at all
+EMPTY_TYPE = "empty"
+MIXED_TYPE = "mixed"
+
+
+def cell_type(value: Any) -> int:
+    """Return the type code of a raw openpyxl cell value."""
+    if value is None or value == "":
+        return TYPE_NULL
+    # bool is a subclass of int, so it must be checked first
+    if isinstance(value, bool):
+        return TYPE_BOOL
+    if isinstance(value, int):
+        return TYPE_INT
+    if isinstance(value, (float, Decimal)):
+        return TYPE_FLOAT
+    if isinstance(value, (datetime.date, datetime.time)):
+        return TYPE_DATE
+    return TYPE_TEXT
+
+
+def to_json_value(value: Any) -> Any:
+    """Convert a raw cell value to something JSONField can store.
+
+    Numbers, booleans and None are kept as-is; dates and times become ISO
+    8601 strings (the column schema records that they were dates).
+    """
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        # NaN and infinity are not valid JSON
+        return value if np.isfinite(value) else str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    return str(value)
+
+
+class SchemaTracker:
+    """Counts the type codes of each column of a sheet.
+
+    Memory use depends on the number of columns only: one counter per type
+    code and column, however many rows are written.
+    """
+
+    def __init__(self):
+        # counts[i][code] is the number of cells of that type in column i;
+        # blanks are not counted, they are the rest of the rows
+        self.counts: List[List[int]] = []
+        self.row_count = 0
+
+    def write(self, row: List[Any]) -> None:
+        while len(self.counts) < len(row):
+            self.counts.append([0] * (len(TYPE_NAMES) + 1))
+
+        for counts, value in zip(self.counts, row):
+            counts[cell_type(value)] += 1
+        self.row_count += 1
+
+    def infer(self, headers: List[str]) -> List[Dict[str, Any]]:
+        """Infer each column's type and null ratio.
+
+        Returns:
+            One ``{"name", "type", "null_ratio"}`` dict per column, where
+            type is int, float, date, bool, text, mixed or empty
+        """
+        schema = []
+        for i in range(max(len(headers), len(self.counts))):
+            counts = (
+                self.counts[i] if i < len(self.counts) else [0] * (len(TYPE_NAMES) + 1)
+            )
+            present = {code for code in TYPE_NAMES if counts[code]}
+            nulls = self.row_count - sum(counts[code] for code in present)
+            schema.append(
+                {
+                    "name": headers[i] if i < len(headers) else f"Column {i+1}",
+                    "type": resolve_type(present),
+                    "null_ratio": (
+                        round(nulls / self.row_count, 4) if self.row_count else 1.0
+                    ),
+                }
+            )
+        return schema
+
+
+def resolve_type(present: set) -> str:
+    """Pick a column type from the set of type codes seen in it."""
+    if not present:
+        return EMPTY_TYPE
+    if present == {TYPE_INT, TYPE_FLOAT}:
+        # Whole numbers in a float column are still floats
+        return TYPE_NAMES[TYPE_FLOAT]
+    if len(present) == 1:
+        return TYPE_NAMES[present.pop()]
+    return MIXED_TYPE
@@ -0,0 +1,278 @@
+"""Full-text search over the cells of every sheet a user can see.
+
+Rows are indexed as they are parsed: each becomes an ExcelSearchRow holding
+its cells as tab-separated text. PostgreSQL searches that text through a GIN
+full-text index (whole words, ranked with ``ts_rank``) and a pg_trgm index
+(substrings such as partial SKUs). Other databases, SQLite in tests, fall
+back to an inverted index built in Python at ingest: one ExcelSearchTerm
+posting list per distinct word of a sheet, matched by prefix.
+
+Sheets stored as unparsed stubs (INGEST_LAZY_SHEETS) are indexed when their
+rows are first parsed. Sheets parsed before the index existed are indexed by
+the ``index_sheets`` management command.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from ..models import ExcelData, ExcelSearchRow, ExcelSearchTerm, ExcelUpload
+
+SEARCH_PAGE_SIZE = 20
+MAX_TERM_LENGTH = ExcelSearchTerm._meta.get_field("term").max_length
+
+TOKEN_RE = re.compile(r"\w+")
+
+# (sheet_id, row_index, text, rank)
+RowMatch = Tuple[int, int, str, float]
+
+
+def uses_postgres_search() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lower-cased words, as stored in the inverted index."""
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text.casefold())]
+
+
+def row_text(row: List[Any]) -> str:
+    """Join a row's cells into the text that gets indexed."""
+    separator = ExcelSearchRow.CELL_SEPARATOR
+    return separator.join(
+        "" if cell is None else str(cell).replace(separator, " ") for cell in row
+    )
+
+
+class SearchIndexWriter:
+    """Indexes a sheet's rows for search as they stream past during ingestion.
+
+    Row text is written in batches of ``batch_size``. The inverted index
+    used without PostgreSQL is held in memory and written when the sheet is
+    finished.
+    """
+
+    def __init__(self, sheet: ExcelData, batch_size: int):
+        self.sheet = sheet
+        self.batch_size = batch_size
+        self.buffer: List[ExcelSearchRow] = []
+        self.row_index = 0
+        self.postings: Optional[Dict[str, List[int]]] = (
+            None if uses_postgres_search() else {}
+        )
+
+    def write(self, row: List[Any]) -> None:
+        text = row_text(row)
+        if text.strip():
+            self.buffer.append(
+                ExcelSearchRow(sheet=self.sheet, row_index=self.row_index, text=text)
+            )
+            if self.postings is not None:
+                for term in set(tokenize(text)):
+                    self.postings.setdefault(term, []).append(self.row_index)
+            if len(self.buffer) >= self.batch_size:
+                self.flush()
+        self.row_index += 1
+
+    def flush(self) -> None:
+        ExcelSearchRow.objects.bulk_create(self.buffer)
+        self.buffer = []
+
+    def close(self) -> None:
+        self.flush()
+        if self.postings:
+            ExcelSearchTerm.objects.bulk_create(
+                [
+                    ExcelSearchTerm(sheet=self.sheet, term=term, rows=rows)
+                    for term, rows in self.postings.items()
+                ],
+                batch_size=self.batch_size,
+            )
+
+
+def clear_search_index(sheet: ExcelData) -> None:
+    """Drop a sheet's index entries before it is parsed again."""
+    sheet.search_rows.all().delete()  # type: ignore
+    sheet.search_terms.all().delete()  # type: ignore
+
+
+def visible_sheets(uploads: List[ExcelUpload]):
+    """Queryset of the sheets behind ``uploads``."""
+    # Content-addressed uploads share their blob's sheets
+    return ExcelData.objects.filter(
+        Q(upload__in=uploads) | Q(blob__in=[u.blob_id for u in uploads if u.blob_id])
+    )
+
+
+def unindexed_sheets(sheets=None):
+    """Sheets, of ``sheets`` or all of them, with rows that are not indexed.
+
+    That is sheets not parsed yet, and parsed sheets with rows but no
+    ExcelSearchRow, such as those stored before search existed.
+    """
+    if sheets is None:
+        sheets = ExcelData.objects.all()
+    return sheets.filter(
+        Q(parsed_at__isnull=True) | Q(row_count__gt=0),
+        ~Exists(ExcelSearchRow.objects.filter(sheet=OuterRef("pk"))),
+    )
+
+
+def count_unindexed_sheets(user) -> int:
+    """Number of sheets of the user's uploads that search cannot find yet."""
+    uploads = list(ExcelUpload.objects.filter(user=user))
+    return unindexed_sheets(visible_sheets(uploads)).count()
+
+
+def index_sheet(sheet: ExcelData, batch_size: int) -> None:
+    """(Re)build the search index of an already parsed sheet."""
+    with transaction.atomic():
+        clear_search_index(sheet)
+        writer = SearchIndexWriter(sheet, batch_size)
+        for row in sheet.iter_rows():
+            writer.write(row)
+        writer.close()
+
+
+@dataclass
+class SearchHit:
+    upload: ExcelUpload
+    sheet: ExcelData
+    row_index: int
+    # (header, cell text) of the cells that matched
+    cells: List[Tuple[str, str]]
+    rank: float
+
+    @property
+    def row_number(self) -> int:
+        """1-based row number as shown in the sheet table."""
+        return self.row_index + 1
+
+
+def search_cells(
+    user, query: str, page: int = 1, page_size: int = SEARCH_PAGE_SIZE
+) -> Tuple[List[SearchHit], bool]:
+    """Find rows containing ``query`` in any sheet of the user's uploads.
+
+    Returns:
+        One page of hits, best first, and whether another page follows
+    """
+    terms = tokenize(query)
+    if not terms:
+        return [], False
+
+    uploads = list(ExcelUpload.objects.filter(user=user))
+    sheets = visible_sheets(uploads)
+    offset = (page - 1) * page_size
+    if uses_postgres_search():
+        matches = _search_postgres(sheets, query.strip(), offset, page_size + 1)
+    else:
+        matches = _search_inverted_index(sheets, terms, offset, page_size + 1)
+
+    by_blob = {u.blob_id: u for u in uploads if u.blob_id}
+    by_pk = {u.pk: u for u in uploads}
+    sheet_map = ExcelData.objects.only(
+        "sheet_name", "sheet_index", "headers", "upload_id", "blob_id"
+    ).in_bulk({sheet_id for sheet_id, _, _, _ in matches})
+
+    hits = []
+    for sheet_id, row_index, text, rank in matches[:page_size]:
+        sheet = sheet_map[sheet_id]
+        upload = by_blob.get(sheet.blob_id) or by_pk[sheet.upload_id]
+        hits.append(
+            SearchHit(
+                upload=upload,
+                sheet=sheet,
+                row_index=row_index,
+                cells=_matching_cells(sheet.headers, text, terms),
+                rank=rank,
+            )
+        )
+    return hits, len(matches) > page_size
+
+
+def _matching_cells(
+    headers: List[str], text: str, terms: List[str]
+) -> List[Tuple[str, str]]:
+    cells = []
+    for i, cell in enumerate(text.split(ExcelSearchRow.CELL_SEPARATOR)):
+        folded = cell.casefold()
+        if cell and any(term in folded for term in terms):
+            header = headers[i] if i < len(headers) else f"Column {i+1}"
+            cells.append((header, cell))
+    return cells
+
+
+def _search_postgres(sheets, query: str, offset: int, limit: int) -> List[RowMatch]:
+    """Rank rows with full-text search, also matching substrings by trigram."""
+    sheet_sql, sheet_params = sheets.values("pk").query.sql_with_params()
+    pattern = "%{}%".format(re.sub(r"([\\%_])", r"\\\1", query))
+    table = connection.ops.quote_name(ExcelSearchRow._meta.db_table)
+    sql = f"""
+        SELECT r.sheet_id, r.row_index, r.text,
+               ts_rank(to_tsvector('simple', r.text), q) AS rank
+        FROM {table} r, plainto_tsquery('simple', %s) q
+        WHERE r.sheet_id IN ({sheet_sql})
+          AND (to_tsvector('simple', r.text) @@ q OR r.text ILIKE %s)
+        ORDER BY rank DESC, r.sheet_id DESC, r.row_index
+        LIMIT %s OFFSET %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [query, *sheet_params, pattern, limit, offset])
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+def _search_inverted_index(
+    sheets, terms: List[str], offset: int, limit: int
+) -> List[RowMatch]:
+    """Intersect the posting lists of every term, matching words by prefix.
+
+    A row scores 1 per term it contains as a whole word and 0.5 per term it
+    only contains as a word prefix.
+    """
+    scores: Optional[Dict[Tuple[int, int], float]] = None
+    for term in set(terms):
+        matches: Dict[Tuple[int, int], float] = {}
+        postings = ExcelSearchTerm.objects.filter(
+            sheet__in=sheets, term__startswith=term
+        ).values_list("sheet_id", "term", "rows")
+        for sheet_id, indexed, rows in postings:
+            weight = 1.0 if indexed == term else 0.5
+            for row_index in rows:
+                key = (sheet_id, row_index)
+                matches[key] = max(matches.get(key, 0.0), weight)
+        if scores is None:
+            scores = matches
+        else:
+            scores = {
+                key: scores[key] + w for key, w in matches.items() if key in scores
+            }
+        if not scores:
+            return []
+
+    ranked = sorted(
+        scores.items(),  # type: ignore
+        key=lambda item: (-item[1], -item[0][0], item[0][1]),
+    )[offset : offset + limit]
+    if not ranked:
+        return []
+
+    rows_by_sheet: Dict[int, List[int]] = {}
+    for (sheet_id, row_index), _ in ranked:
+        rows_by_sheet.setdefault(sheet_id, []).append(row_index)
+    query = Q()
+    for sheet_id, row_indexes in rows_by_sheet.items():
+        query |= Q(sheet_id=sheet_id, row_index__in=row_indexes)
+    texts = {
+        (sheet_id, row_index): text
+        for sheet_id, row_index, text in ExcelSearchRow.objects.filter(
+            query
+        ).values_list("sheet_id", "row_index", "text")
+    }
+    return [
+        (sheet_id, row_index, texts.get((sheet_id, row_index), ""), score)
+        for (sheet_id, row_index), score in ranked
+    ]
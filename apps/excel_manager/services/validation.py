@@ -0,0 +1,614 @@
+"""Data-quality validation of uploads with Claude.
+
+Each prompt describes one sheet: its columns and inferred types, per-column
+statistics over every row (from ExcelData.profile) and a sample of rows.
+Every sheet with rows gets its own prompt (only the first one with
+EXCEL_CONFIG["VALIDATION_ALL_SHEETS"] off); the prompts are sent
+concurrently and their results merged into one AIValidation.
+
+The sample only shows the first 50 rows. With
+EXCEL_CONFIG["VALIDATION_FULL_COVERAGE"] on, every row is sent instead:
+sheets are split into chunks of rows that fit VALIDATION_CHUNK_TOKENS, the
+chunks are validated concurrently (map) and their results combined per
+sheet (reduce). Each chunk's result is saved as a ValidationChunk when it
+arrives, so after a failure validating again only sends the missing chunks.
+"""
+
+import json
+import logging
+import re
+import time
+from itertools import groupby
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from apps.core.services.ai_service import AIService, AsyncAIService
+
+from ..models import AIValidation, ValidationChunk
+
+logger = logging.getLogger(__name__)
+
+VALIDATION_SYSTEM_PROMPT = """You are a data quality analyst. Analyze Excel data and return ONLY valid JSON without any markdown formatting or code blocks.
+
+Return exactly this structure (no markdown, no ```json blocks, just raw JSON):
+{
+  "valid_rows": integer,
+  "warning_rows": integer,
+  "error_rows": integer,
+  "issues": [
+    {"row": integer, "column": string, "issue": string, "severity": "error"|"warning"}
+  ],
+  "summary": string (2-3 sentences),
+  "suggestions": [string],
+  "severity": "low"|"medium"|"high"
+}
+
+Focus on: missing values, format inconsistencies, data type errors, duplicates, logical errors.
+IMPORTANT: Return ONLY the JSON object, no explanations, no markdown."""
+
+
+def describe_column_profile(column):
+    """One-line summary of a column profile for the validation prompt."""
+    parts = [f"{column['null_count']} empty", f"~{column['distinct']} distinct"]
+    if column["min"] is not None:
+        parts.append(f"range {column['min']} to {column['max']}")
+    if column["mean"] is not None:
+        parts.append(f"mean {column['mean']:g}, stddev {column['stddev']:g}")
+    if column["top_values"]:
+        top = ", ".join(f"{value!r} x{count}" for value, count in column["top_values"])
+        parts.append(f"most common {top}")
+    return f"- {column['name']}: {'; '.join(parts)}"
+
+
+def format_row(columns, row, number):
+    """One row of a validation prompt, numbered as in the sheet."""
+    row_dict = {col: "" if val is None else val for col, val in zip(columns, row)}
+    return f"Row {number}: {row_dict}"
+
+
+def describe_sheet(data):
+    """Sheet name, size, columns, types and statistics for a validation prompt."""
+    columns = data.get("columns", [])
+
+    # Inferred column types save the model from guessing them from samples
+    column_types = [
+        f"{col['name']} ({col['type']}, {col['null_ratio']:.0%} empty)"
+        for col in data.get("schema", [])
+    ]
+
+    # Statistics over every row, where the sample only shows the first 50
+    column_stats = [describe_column_profile(col) for col in data.get("profile", [])]
+
+    return f"""Sheet: {data.get('sheet_name', 'Sheet1')}
+Total rows in file: {data.get('total_rows', 0)}
+Columns: {', '.join(columns)}
+Column types: {', '.join(column_types) or 'unknown'}
+Column statistics (all rows):
+{chr(10).join(column_stats) or 'unknown'}"""
+
+
+def format_validation_prompt(data):
+    """Format Excel data for validation, optimizing token usage."""
+    columns = data.get("columns", [])
+    rows = data.get("sample", [])
+
+    # Format data for AI
+    # Limit to 50 rows for token optimization
+    formatted_rows = [format_row(columns, row, i) for i, row in enumerate(rows[:50], 1)]
+
+    prompt = f"""Validate this Excel data:
+
+{describe_sheet(data)}
+
+Sample data (first 50 rows):
+{chr(10).join(formatted_rows)}
+
+Analyze for data quality issues and return JSON as specified."""
+
+    return prompt
+
+
+# Ranks for combining per-sheet severities; the highest wins
+SEVERITY_ORDER = ("unknown", "low", "medium", "high")
+
+
+def highest_severity(severities):
+    """The most severe of ``severities``; "unknown" if none is recognised."""
+    ranks = [SEVERITY_ORDER.index(s) for s in severities if s in SEVERITY_ORDER]
+    return SEVERITY_ORDER[max(ranks, default=0)]
+
+
+def build_validation_prompts(excel_upload):
+    """(sheet name, prompt) for each sheet to validate.
+
+    Raises:
+        ValueError: The upload has no rows to validate
+    """
+    if settings.EXCEL_CONFIG["VALIDATION_ALL_SHEETS"]:
+        previews = excel_upload.get_sheets_preview_data(rows=100)
+    else:
+        previews = [excel_upload.get_preview_data(rows=100)]
+    previews = [preview for preview in previews if preview.get("sample")]
+    if not previews:
+        raise ValueError("No data to validate")
+    return [
+        (preview["sheet_name"], format_validation_prompt(preview))
+        for preview in previews
+    ]
+
+
+def parse_validation_content(content):
+    """Parse the model's JSON reply, tolerating code fences and stray text.
+
+    Replies that are not JSON are kept as the summary of a result with
+    ``severity`` "unknown".
+    """
+    text = content
+
+    # Remove markdown code blocks if present
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0].strip()
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0].strip()
+
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # Try to extract JSON from the content
+        json_match = re.search(r'\{[^{}]*"valid_rows"[^{}]*\}', content, re.DOTALL)
+        if json_match:
+            try:
+                return json.loads(json_match.group())
+            except json.JSONDecodeError:
+                pass
+
+    # If AI didn't return valid JSON, create a basic structure
+    return {
+        "valid_rows": 0,
+        "warning_rows": 0,
+        "error_rows": 0,
+        "issues": [],
+        "summary": content[:500],
+        "suggestions": [],
+        "severity": "unknown",
+    }
+
+
+def merge_sheet_results(sections):
+    """Combine per-sheet validation results into one workbook result.
+
+    Row counts are summed, issues are tagged with their sheet, suggestions
+    are deduplicated and the highest severity wins. ``sheets`` keeps a short
+    section per sheet; sheets whose call failed carry its ``error``.
+    A single sheet's result is returned unchanged.
+    """
+    if len(sections) == 1 and "error" not in sections[0]:
+        return {k: v for k, v in sections[0].items() if k != "sheet_name"}
+
+    merged = {
+        "valid_rows": 0,
+        "warning_rows": 0,
+        "error_rows": 0,
+        "issues": [],
+        "summary": "",
+        "suggestions": [],
+        "severity": "unknown",
+        "sheets": [],
+    }
+    summaries = []
+    for section in sections:
+        sheet_name = section["sheet_name"]
+        if "error" in section:
+            summaries.append(f"{sheet_name}: validation failed ({section['error']}).")
+            merged["sheets"].append(
+                {
+                    "sheet_name": sheet_name,
+                    "severity": "unknown",
+                    "error": section["error"],
+                }
+            )
+            continue
+
+        for key in ("valid_rows", "warning_rows", "error_rows"):
+            merged[key] += section.get(key) or 0
+        issues = section.get("issues", [])
+        merged["issues"].extend({**issue, "sheet": sheet_name} for issue in issues)
+        for suggestion in section.get("suggestions", []):
+            if suggestion not in merged["suggestions"]:
+                merged["suggestions"].append(suggestion)
+
+        severity = highest_severity([section.get("severity")])
+        merged["severity"] = highest_severity([merged["severity"], severity])
+
+        summary = section.get("summary", "")
+        summaries.append(f"{sheet_name}: {summary}")
+        merged["sheets"].append(
+            {
+                "sheet_name": sheet_name,
+                "severity": severity,
+                "summary": summary,
+                "valid_rows": section.get("valid_rows") or 0,
+                "warning_rows": section.get("warning_rows") or 0,
+                "error_rows": section.get("error_rows") or 0,
+                "issues_found": len(issues),
+            }
+        )
+
+    merged["summary"] = " ".join(summaries)
+    return merged
+
+
+def save_validation(excel_upload, validation_result, usages, start_time):
+    """Create the AIValidation for a result, adding up the tokens of every call."""
+    # Calculate response time
+    response_time_ms = int((time.time() - start_time) * 1000)
+
+    # Extract suggestions if present
+    suggestions_text = "\n".join(validation_result.get("suggestions", []))
+
+    tokens = {"input_tokens": 0, "output_tokens": 0}
+    for usage in usages:
+        for key in tokens:
+            tokens[key] += usage.get(key, 0)
+
+    # Create validation record
+    return AIValidation.objects.create(
+        excel_upload=excel_upload,
+        validation_result=validation_result,
+        issues_found=len(validation_result.get("issues", [])),
+        suggestions=suggestions_text,
+        ai_metadata={
+            "tokens": tokens,
+            "model": settings.AI_CONFIG.get("MODEL"),
+            "response_time_ms": response_time_ms,
+        },
+    )
+
+
+def record_validation(excel_upload, sheet_results, start_time):
+    """Save one AIValidation from the AIService results of each sheet.
+
+    Args:
+        sheet_results: (sheet name, AIService result) pairs
+
+    Raises:
+        Exception: The AI call failed for every sheet
+    """
+    results = [result for _, result in sheet_results]
+    if not any(result.get("success") for result in results):
+        error = results[0].get("error", "Unknown error")
+        raise Exception(f"AI validation failed: {error}")
+
+    sections = []
+    for sheet_name, result in sheet_results:
+        if result.get("success"):
+            section = parse_validation_content(result["content"])
+        else:
+            section = {"error": result.get("error", "Unknown error")}
+        sections.append({**section, "sheet_name": sheet_name})
+
+    return save_validation(
+        excel_upload,
+        merge_sheet_results(sections),
+        [result.get("usage", {}) for result in results],
+        start_time,
+    )
+
+
+# Rough prompt size: Claude averages about 4 characters a token
+CHARS_PER_TOKEN = 4
+
+# Keeps each chunk's reply well within AI_CONFIG's MAX_TOKENS
+MAX_CHUNK_ISSUES = 20
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_rows(sheet, token_budget):
+    """Split a sheet's rows into chunks whose prompt lines fit ``token_budget``.
+
+    Yields ``(start, stop, lines)``; rows ``start`` to ``stop`` (exclusive,
+    0-based) formatted with their sheet row numbers. A row larger than the
+    budget gets a chunk of its own.
+    """
+    start, lines, tokens = 0, [], 0
+    for index, row in enumerate(sheet.iter_rows()):
+        line = format_row(sheet.headers, row, index + 1)
+        line_tokens = estimate_tokens(line)
+        if lines and tokens + line_tokens > token_budget:
+            yield start, index, lines
+            start, lines, tokens = index, [], 0
+        lines.append(line)
+        tokens += line_tokens
+    if lines:
+        yield start, start + len(lines), lines
+
+
+def format_chunk_prompt(data, start, stop, lines):
+    """Prompt validating rows ``start`` to ``stop`` of a sheet."""
+    return f"""Validate rows {start + 1} to {stop} of this Excel data:
+
+{describe_sheet(data)}
+
+Rows {start + 1} to {stop}:
+{chr(10).join(lines)}
+
+Use the row numbers shown above in issues.
+Count valid_rows, warning_rows and error_rows over these {stop - start} rows only.
+List at most {MAX_CHUNK_ISSUES} issues, the most severe first.
+Analyze for data quality issues and return JSON as specified."""
+
+
+def build_chunk_prompts(excel_upload):
+    """Plan the row chunks of a full-coverage validation.
+
+    Returns:
+        ``(planned, pending)``: the ``(sheet pk, start, stop)`` of every
+        chunk, and ``(sheet, start, stop, prompt)`` for each chunk without
+        a saved ValidationChunk
+
+    Raises:
+        ValueError: The upload has no rows to validate
+    """
+    sheets = list(excel_upload.get_sheets())
+    if not settings.EXCEL_CONFIG["VALIDATION_ALL_SHEETS"]:
+        sheets = sheets[:1]
+    budget = settings.EXCEL_CONFIG["VALIDATION_CHUNK_TOKENS"]
+    done = set(
+        excel_upload.validation_chunks.values_list("sheet_id", "start_row", "stop_row")
+    )
+
+    planned, pending = [], []
+    for sheet in sheets:
+        data = sheet.get_preview_data(rows=0)
+        for start, stop, lines in split_rows(sheet, budget):
+            planned.append((sheet.pk, start, stop))
+            if (sheet.pk, start, stop) not in done:
+                prompt = format_chunk_prompt(data, start, stop, lines)
+                pending.append((sheet, start, stop, prompt))
+
+    if not planned:
+        raise ValueError("No data to validate")
+    return planned, pending
+
+
+def save_chunk_result(excel_upload, chunk, result):
+    """Save a chunk's result as soon as it arrives. Returns the error, if any."""
+    sheet, start, stop, _ = chunk
+    if not result.get("success"):
+        logger.warning(
+            f"Validation of rows {start + 1}-{stop} of sheet {sheet.pk} failed: "
+            f"{result.get('error')}"
+        )
+        return result.get("error", "Unknown error")
+
+    ValidationChunk.objects.update_or_create(
+        excel_upload=excel_upload,
+        sheet=sheet,
+        start_row=start,
+        stop_row=stop,
+        defaults={
+            "result": parse_validation_content(result["content"]),
+            "usage": result.get("usage", {}),
+        },
+    )
+    return None
+
+
+def globalize_issue_row(row, start, stop):
+    """Sheet row number of an issue reported for rows ``start`` to ``stop``.
+
+    The prompt numbers rows as in the sheet, but replies that count from 1
+    within the chunk are shifted to match.
+    """
+    if not isinstance(row, int) or start < row <= stop:
+        return row
+    if 1 <= row <= stop - start:
+        return start + row
+    return row
+
+
+def _as_count(value):
+    """A row count from a model reply, or 0 if it is not a number."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def reduce_chunk_results(chunks):
+    """Combine a sheet's ValidationChunks, in row order, into one sheet result.
+
+    Row counts are summed (each capped at its chunk's size), issues get sheet
+    row numbers and are deduplicated, as are suggestions. The summary quotes
+    the chunks with the highest severity.
+    """
+    reduced = {
+        "valid_rows": 0,
+        "warning_rows": 0,
+        "error_rows": 0,
+        "issues": [],
+        "suggestions": [],
+    }
+    seen_issues = set()
+    for chunk in chunks:
+        size = chunk.stop_row - chunk.start_row
+        for key in ("valid_rows", "warning_rows", "error_rows"):
+            reduced[key] += min(max(_as_count(chunk.result.get(key)), 0), size)
+
+        for issue in chunk.result.get("issues", []):
+            row = globalize_issue_row(issue.get("row"), chunk.start_row, chunk.stop_row)
+            key = (row, issue.get("column"), str(issue.get("issue", "")).lower())
+            if key not in seen_issues:
+                seen_issues.add(key)
+                reduced["issues"].append({**issue, "row": row})
+
+        for suggestion in chunk.result.get("suggestions", []):
+            if suggestion not in reduced["suggestions"]:
+                reduced["suggestions"].append(suggestion)
+
+    severity = highest_severity(chunk.result.get("severity") for chunk in chunks)
+    findings = [
+        f"Rows {chunk.start_row + 1}-{chunk.stop_row}: {chunk.result['summary']}"
+        for chunk in chunks
+        if chunk.result.get("summary") and chunk.result.get("severity") == severity
+    ]
+    total = sum(chunk.stop_row - chunk.start_row for chunk in chunks)
+    reduced["summary"] = " ".join(
+        [f"Checked all {total} rows in {len(chunks)} chunks."] + findings[:3]
+    )
+    reduced["severity"] = severity
+    return reduced
+
+
+def record_chunked_validation(excel_upload, planned, errors, start_time):
+    """Reduce the saved chunks into one AIValidation and delete them.
+
+    Raises:
+        Exception: Some chunks failed; the others stay saved for a retry
+    """
+    if errors:
+        raise Exception(
+            f"AI validation failed for {len(errors)} of {len(planned)} chunks: "
+            f"{errors[0]}. Validate again to retry them."
+        )
+
+    planned = set(planned)
+    chunks = [
+        chunk
+        for chunk in excel_upload.validation_chunks.select_related("sheet").order_by(
+            "sheet__sheet_index", "start_row"
+        )
+        if (chunk.sheet_id, chunk.start_row, chunk.stop_row) in planned
+    ]
+    sections = [
+        {**reduce_chunk_results(list(sheet_chunks)), "sheet_name": sheet.sheet_name}
+        for sheet, sheet_chunks in groupby(chunks, key=lambda chunk: chunk.sheet)
+    ]
+
+    with transaction.atomic():
+        validation = save_validation(
+            excel_upload,
+            merge_sheet_results(sections),
+            [chunk.usage for chunk in chunks],
+            start_time,
+        )
+        excel_upload.validation_chunks.all().delete()
+    return validation
+
+
+def validate_excel_in_chunks(excel_upload, heartbeat=None):
+    """Validate every row of the upload, in concurrently sent row chunks.
+
+    ``heartbeat`` is called after each chunk's reply is saved; whatever it
+    raises aborts the validation, keeping the chunks saved so far.
+    """
+    start_time = time.time()
+    service = AIService()
+
+    planned, pending = build_chunk_prompts(excel_upload)
+    errors = []
+    for index, result in service.iter_messages(
+        [prompt for *_, prompt in pending], system=VALIDATION_SYSTEM_PROMPT
+    ):
+        error = save_chunk_result(excel_upload, pending[index], result)
+        if error:
+            errors.append(error)
+        if heartbeat:
+            heartbeat()
+
+    return record_chunked_validation(excel_upload, planned, errors, start_time)
+
+
+async def avalidate_excel_in_chunks(excel_upload, heartbeat=None):
+    """validate_excel_in_chunks() for async views."""
+    start_time = time.time()
+    service = AsyncAIService()
+
+    planned, pending = await sync_to_async(build_chunk_prompts)(excel_upload)
+    errors = []
+    async for index, result in service.iter_messages(
+        [prompt for *_, prompt in pending], system=VALIDATION_SYSTEM_PROMPT
+    ):
+        error = await sync_to_async(save_chunk_result)(
+            excel_upload, pending[index], result
+        )
+        if error:
+            errors.append(error)
+        if heartbeat:
+            await sync_to_async(heartbeat)()
+
+    return await sync_to_async(record_chunked_validation)(
+        excel_upload, planned, errors, start_time
+    )
+
+
+def validate_excel_with_ai(excel_upload, heartbeat=None):
+    """Validate Excel data using AI service.
+
+    Sheets are validated concurrently, up to AI_CONFIG's
+    MAX_CONCURRENT_REQUESTS at a time.
+
+    Args:
+        heartbeat: Called after the API replies, or after each chunk's
+            reply is saved with VALIDATION_FULL_COVERAGE, and before the
+            AIValidation is saved; whatever it raises aborts the validation
+    """
+    if settings.EXCEL_CONFIG["VALIDATION_FULL_COVERAGE"]:
+        return validate_excel_in_chunks(excel_upload, heartbeat)
+
+    start_time = time.time()
+
+    # Initialize AI service
+    service = AIService()
+
+    sheet_prompts = build_validation_prompts(excel_upload)
+
+    # Send to AI for validation
+    results = service.send_messages(
+        [prompt for _, prompt in sheet_prompts], system=VALIDATION_SYSTEM_PROMPT
+    )
+    if heartbeat:
+        heartbeat()
+
+    return record_validation(
+        excel_upload,
+        [
+            (sheet_name, result)
+            for (sheet_name, _), result in zip(sheet_prompts, results)
+        ],
+        start_time,
+    )
+
+
+async def avalidate_excel_with_ai(excel_upload, heartbeat=None):
+    """validate_excel_with_ai() for async views: waits on the API without a thread.
+
+    Database work, and ``heartbeat``, still run in a thread through
+    ``sync_to_async``.
+    """
+    if settings.EXCEL_CONFIG["VALIDATION_FULL_COVERAGE"]:
+        return await avalidate_excel_in_chunks(excel_upload, heartbeat)
+
+    start_time = time.time()
+    service = AsyncAIService()
+
+    sheet_prompts = await sync_to_async(build_validation_prompts)(excel_upload)
+    results = await service.send_messages(
+        [prompt for _, prompt in sheet_prompts], system=VALIDATION_SYSTEM_PROMPT
+    )
+    if heartbeat:
+        await sync_to_async(heartbeat)()
+
+    return await sync_to_async(record_validation)(
+        excel_upload,
+        [
+            (sheet_name, result)
+            for (sheet_name, _), result in zip(sheet_prompts, results)
+        ],
+        start_time,
+    )
@@ -0,0 +1,326 @@
+"""Background AI validation jobs.
+
+A validation waits 10-30s on the Claude API, so ValidateWithAIView only
+queues a ValidationJob and the page polls it until it is done. Workers lease
+jobs the way the ingest queue does (``SELECT ... FOR UPDATE SKIP LOCKED`` on
+PostgreSQL) and, since a validation mostly waits on the network, run up to
+VALIDATION_WORKER_CONCURRENCY of them at once in threads. Each user may have
+at most VALIDATION_MAX_PER_USER validations queued or running.
+
+Failures are not retried: the user sees the error and can validate again.
+Only jobs whose worker died (their lease expired) are leased again, up to
+VALIDATION_MAX_ATTEMPTS times. A running validation renews its lease after
+every reply from the API, so long full-coverage validations keep it, and a
+worker whose lease was taken over stops without recording anything.
+"""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from typing import Callable, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import AIValidation, ExcelUpload, ValidationJob
+from .job_queue import get_worker_id
+from .leases import LeaseLostError
+from .validation import validate_excel_with_ai
+
+logger = logging.getLogger(__name__)
+
+
+class ValidationLimitError(Exception):
+    """The user already has the maximum number of validations in progress."""
+
+
+def get_active_job(upload: ExcelUpload) -> Optional[ValidationJob]:
+    """The upload's queued or running validation, if any."""
+    return (
+        upload.validation_jobs.filter(  # type: ignore
+            status__in=ValidationJob.ACTIVE_STATUSES
+        )
+        .order_by("-created_at")
+        .first()
+    )
+
+
+def _check_validation_limit(user_id: int) -> None:
+    """Raise ValidationLimitError if the user cannot start another validation.
+
+    Call it inside the transaction of _lock_user_validations().
+    """
+    limit = settings.EXCEL_CONFIG["VALIDATION_MAX_PER_USER"]
+    in_progress = ValidationJob.objects.filter(
+        user_id=user_id, status__in=ValidationJob.ACTIVE_STATUSES
+    ).count()
+    if in_progress >= limit:
+        raise ValidationLimitError(
+            f"You already have {in_progress} "
+            f"validation{'s' if in_progress > 1 else ''} in progress. "
+            "Try again when they finish."
+        )
+
+
+def _lock_user_validations(user_id: int) -> None:
+    """Serialize the creation of validation jobs for one user.
+
+    Locks the user's row until the end of the current transaction, so two
+    requests cannot both pass the active-job and limit checks before either
+    creates its job.
+    """
+    get_user_model().objects.select_for_update().only("pk").get(pk=user_id)
+
+
+def _create_job(upload: ExcelUpload, **fields) -> Tuple[ValidationJob, bool]:
+    """Create a job for ``upload`` unless one is already in progress.
+
+    Returns:
+        The new or the in-progress job, and whether it was created
+
+    Raises:
+        ValidationLimitError: The user is at VALIDATION_MAX_PER_USER
+    """
+    with transaction.atomic():
+        _lock_user_validations(upload.user_id)
+        active = get_active_job(upload)
+        if active is not None:
+            return active, False
+        _check_validation_limit(upload.user_id)
+        job = ValidationJob.objects.create(
+            excel_upload=upload, user_id=upload.user_id, **fields
+        )
+        return job, True
+
+
+def enqueue_validation(upload: ExcelUpload) -> ValidationJob:
+    """Queue a validation of ``upload``.
+
+    Repeated clicks while a validation is in progress return the same job.
+
+    Raises:
+        ValidationLimitError: The user is at VALIDATION_MAX_PER_USER
+    """
+    job, _ = _create_job(upload)
+    return job
+
+
+def start_validation(upload: ExcelUpload, worker_id: str) -> Tuple[ValidationJob, bool]:
+    """Record a validation that the caller runs itself, already leased to it.
+
+    The job counts towards VALIDATION_MAX_PER_USER like a queued one. If the
+    caller dies, its lease expires and a worker runs the job instead.
+
+    Returns:
+        The new job, or the upload's job already in progress, and whether the
+        caller should run it
+
+    Raises:
+        ValidationLimitError: The user is at VALIDATION_MAX_PER_USER
+    """
+    now = timezone.now()
+    lease_seconds = settings.EXCEL_CONFIG["VALIDATION_LEASE_SECONDS"]
+    return _create_job(
+        upload,
+        status=ValidationJob.STATUS_RUNNING,
+        attempts=1,
+        leased_by=worker_id,
+        leased_until=now + timedelta(seconds=lease_seconds),
+        started_at=now,
+    )
+
+
+def lease_next_validation(
+    worker_id: str, lease_seconds: Optional[int] = None
+) -> Optional[ValidationJob]:
+    """Lease the oldest queued job, or one whose worker stopped responding."""
+    config = settings.EXCEL_CONFIG
+    if lease_seconds is None:
+        lease_seconds = config["VALIDATION_LEASE_SECONDS"]
+
+    now = timezone.now()
+    stale = Q(status=ValidationJob.STATUS_RUNNING, leased_until__lt=now)
+    # Give up on jobs that keep taking their worker down
+    ValidationJob.objects.filter(
+        stale, attempts__gte=config["VALIDATION_MAX_ATTEMPTS"]
+    ).update(
+        status=ValidationJob.STATUS_FAILED,
+        error="The validation worker stopped responding",
+        leased_until=None,
+        finished_at=now,
+    )
+
+    runnable = ValidationJob.objects.filter(
+        Q(status=ValidationJob.STATUS_QUEUED) | stale
+    ).order_by("created_at", "pk")
+
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            runnable = runnable.select_for_update(skip_locked=True)
+        job = runnable.first()
+        if job is None:
+            return None
+
+        job.status = ValidationJob.STATUS_RUNNING
+        job.attempts += 1
+        job.leased_by = worker_id
+        job.leased_until = now + timedelta(seconds=lease_seconds)
+        job.started_at = now
+        job.save(
+            update_fields=[
+                "status",
+                "attempts",
+                "leased_by",
+                "leased_until",
+                "started_at",
+            ]
+        )
+
+    return job
+
+
+def _held_lease(job: ValidationJob):
+    """Queryset matching ``job`` only while this lease of it is current.
+
+    Every lease increments ``attempts``, so it tells leases by the same
+    worker apart. Jobs run without a lease (VALIDATION_EAGER) match until a
+    worker leases them.
+    """
+    return ValidationJob.objects.filter(
+        pk=job.pk,
+        status__in=ValidationJob.ACTIVE_STATUSES,
+        leased_by=job.leased_by,
+        attempts=job.attempts,
+    )
+
+
+def renew_lease(job: ValidationJob, lease_seconds: Optional[int] = None) -> None:
+    """Extend the lease of a running job.
+
+    Raises:
+        LeaseLostError: Another worker leased the job in the meantime
+    """
+    if lease_seconds is None:
+        lease_seconds = settings.EXCEL_CONFIG["VALIDATION_LEASE_SECONDS"]
+    leased_until = timezone.now() + timedelta(seconds=lease_seconds)
+    if not _held_lease(job).update(leased_until=leased_until):
+        raise LeaseLostError(f"Validation job {job.pk} was leased by another worker")
+    job.leased_until = leased_until
+
+
+def finish_validation_job(
+    job: ValidationJob,
+    validation: Optional[AIValidation] = None,
+    error: str = "",
+) -> bool:
+    """Record the outcome of a job: its validation, or the error it failed with.
+
+    Nothing is written if the job was leased by another worker meanwhile.
+
+    Returns:
+        Whether the outcome was recorded
+    """
+    job.validation = validation
+    job.error = error
+    job.status = (
+        ValidationJob.STATUS_FAILED if validation is None else ValidationJob.STATUS_DONE
+    )
+    job.leased_until = None
+    job.finished_at = timezone.now()
+    recorded = _held_lease(job).update(
+        status=job.status,
+        validation=validation,
+        error=error,
+        leased_until=None,
+        finished_at=job.finished_at,
+    )
+    if not recorded:
+        logger.warning(
+            f"Validation job {job.pk} was leased by another worker; "
+            "not recording its outcome"
+        )
+    return bool(recorded)
+
+
+def run_validation_job(job: ValidationJob) -> bool:
+    """Validate the job's upload and record the outcome. Returns True on success."""
+    try:
+        validation = validate_excel_with_ai(
+            job.excel_upload, heartbeat=lambda: renew_lease(job)
+        )
+    except LeaseLostError as e:
+        logger.warning(f"{e}; stopping")
+        return False
+    except Exception as e:
+        logger.error(f"Validation job {job.pk} failed: {e}")
+        finish_validation_job(job, error=str(e))
+        return False
+    return finish_validation_job(job, validation=validation)
+
+
+def _run_in_thread(job: ValidationJob) -> bool:
+    try:
+        return run_validation_job(job)
+    finally:
+        # Django opens one connection per thread; don't leak them
+        connections.close_all()
+
+
+def run_validation_worker(
+    concurrency: Optional[int] = None,
+    max_jobs: Optional[int] = None,
+    burst: bool = False,
+    poll_interval: Optional[float] = None,
+    should_stop: Callable[[], bool] = lambda: False,
+) -> int:
+    """Run validation jobs, up to ``concurrency`` at a time, until stopped.
+
+    Args:
+        concurrency: Jobs run at once in this process
+        max_jobs: Stop leasing after this many jobs
+        burst: Exit as soon as the queue is empty instead of polling
+        poll_interval: Seconds to wait when the queue is empty
+        should_stop: Callback checked between leases for graceful shutdown;
+            running jobs are always finished
+
+    Returns:
+        Number of jobs processed
+    """
+    config = settings.EXCEL_CONFIG
+    if concurrency is None:
+        concurrency = config["VALIDATION_WORKER_CONCURRENCY"]
+    if poll_interval is None:
+        poll_interval = config["VALIDATION_POLL_INTERVAL"]
+
+    worker_id = get_worker_id()
+    leased = 0
+    running: set = set()
+
+    with ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="validation"
+    ) as pool:
+        while True:
+            stopping = should_stop() or (max_jobs is not None and leased >= max_jobs)
+            if not stopping and len(running) < concurrency:
+                job = lease_next_validation(worker_id)
+                if job is not None:
+                    logger.info(f"Worker {worker_id} running validation job {job.pk}")
+                    running.add(pool.submit(_run_in_thread, job))
+                    leased += 1
+                    continue
+                stopping = burst
+
+            if running:
+                _, running = wait(
+                    running, timeout=poll_interval, return_when=FIRST_COMPLETED
+                )
+            elif stopping:
+                break
+            else:
+                time.sleep(poll_interval)
+
+    return leased
@@ -5,6 +5,8 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from apps.excel_manager.models import ExcelUpload, ExcelData
 from apps.users.models import User
 
+from .helpers import set_rows
+
 
 @pytest.fixture
 def excel_file():
@@ -143,19 +145,20 @@ def excel_upload_factory(db):
 @pytest.fixture
 def excel_upload_with_data(excel_upload):
     """Create an ExcelUpload with associated ExcelData."""
-    ExcelData.objects.create(
+    sheet = ExcelData.objects.create(
         upload=excel_upload,
         sheet_name="Sheet1",
         sheet_index=0,
-        row_data={
-            "headers": ["Name", "Email", "Age"],
-            "rows": [
-                ["John Doe", "john@example.com", "30"],
-                ["Jane Smith", "jane@example.com", "25"],
-                ["Bob Johnson", "", "35"],  # Missing email
-                ["Alice Brown", "alice@invalid", "28"],  # Invalid email
-                ["Charlie Davis", "charlie@example.com", ""],  # Missing age
-            ],
-        },
+        headers=["Name", "Email", "Age"],
+    )
+    set_rows(
+        sheet,
+        [
+            ["John Doe", "john@example.com", "30"],
+            ["Jane Smith", "jane@example.com", "25"],
+            ["Bob Johnson", "", "35"],  # Missing email
+            ["Alice Brown", "alice@invalid", "28"],  # Invalid email
+            ["Charlie Davis", "charlie@example.com", ""],  # Missing age
+        ],
     )
     return excel_upload
@@ -0,0 +1,13 @@
+"""Helpers shared by the excel_manager tests."""
+
+from apps.excel_manager.services.ingestion import write_sheet
+
+
+def set_rows(sheet, rows):
+    """Store ``rows`` as the sheet's data, the way ingestion writes them.
+
+    The sheet's headers are used as the header row, so its schema, profile,
+    search index and columnar files are all built as for an uploaded sheet.
+    """
+    write_sheet(sheet, iter([sheet.headers, *rows]))
+    return sheet
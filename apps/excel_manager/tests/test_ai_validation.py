@@ -2,16 +2,22 @@
 
 import json
 from datetime import timedelta
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
+from asgiref.sync import async_to_sync
 from django.conf import settings
-from django.test import override_settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from django.test import RequestFactory, override_settings
 from django.urls import reverse
 from django.utils import timezone
 
-from apps.excel_manager.models import AIValidation
-from apps.excel_manager.views import validate_excel_with_ai
+from apps.excel_manager.models import AIValidation, ExcelData, ValidationJob
+from apps.excel_manager.services.validation import validate_excel_with_ai
+from apps.excel_manager.views import AsyncValidateWithAIView
+
+from .helpers import set_rows
 
 
 @pytest.mark.django_db
@@ -124,7 +130,7 @@ class TestValidateWithAIView:
 
         assert response.status_code == 404
 
-    @patch("apps.excel_manager.views.AIService")
+    @patch("apps.excel_manager.services.validation.AIService")
     def test_validation_success(
         self, mock_ai_service, authenticated_client, excel_upload_with_data
     ):
@@ -132,29 +138,31 @@ class TestValidateWithAIView:
         # Mock AI service response
         mock_service = Mock()
         mock_ai_service.return_value = mock_service
-        mock_service.send_message.return_value = {
-            "success": True,
-            "content": json.dumps(
-                {
-                    "valid_rows": 95,
-                    "warning_rows": 3,
-                    "error_rows": 2,
-                    "issues": [
-                        {
-                            "row": 5,
-                            "column": "Email",
-                            "issue": "Missing value",
-                            "severity": "error",
-                        }
-                    ],
-                    "summary": "Found 5 data quality issues",
-                    "suggestions": ["Check email fields"],
-                    "severity": "low",
-                }
-            ),
-            "usage": {"input_tokens": 150, "output_tokens": 100},
-            "model": "claude-sonnet-4-20250514",
-        }
+        mock_service.send_messages.return_value = [
+            {
+                "success": True,
+                "content": json.dumps(
+                    {
+                        "valid_rows": 95,
+                        "warning_rows": 3,
+                        "error_rows": 2,
+                        "issues": [
+                            {
+                                "row": 5,
+                                "column": "Email",
+                                "issue": "Missing value",
+                                "severity": "error",
+                            }
+                        ],
+                        "summary": "Found 5 data quality issues",
+                        "suggestions": ["Check email fields"],
+                        "severity": "low",
+                    }
+                ),
+                "usage": {"input_tokens": 150, "output_tokens": 100},
+                "model": "claude-sonnet-4-20250514",
+            }
+        ]
 
         url = reverse(
             "excel_manager:validate_ai", kwargs={"pk": excel_upload_with_data.pk}
@@ -202,14 +210,14 @@ class TestValidateWithAIView:
         assert response.status_code == 503
         assert b"AI features are currently disabled" in response.content
 
-    @patch("apps.excel_manager.views.AIService")
+    @patch("apps.excel_manager.services.validation.AIService")
     def test_validation_handles_ai_error(
         self, mock_ai_service, authenticated_client, excel_upload_with_data
     ):
         """Handle AI service errors gracefully."""
         mock_service = Mock()
         mock_ai_service.return_value = mock_service
-        mock_service.send_message.side_effect = Exception("AI service unavailable")
+        mock_service.send_messages.side_effect = Exception("AI service unavailable")
 
         url = reverse(
             "excel_manager:validate_ai", kwargs={"pk": excel_upload_with_data.pk}
@@ -219,18 +227,20 @@ class TestValidateWithAIView:
         assert response.status_code == 500
         assert b"AI service unavailable" in response.content
 
-    @patch("apps.excel_manager.views.AIService")
+    @patch("apps.excel_manager.services.validation.AIService")
     def test_validation_handles_invalid_json(
         self, mock_ai_service, authenticated_client, excel_upload_with_data
     ):
         """Handle non-JSON AI responses gracefully."""
         mock_service = Mock()
         mock_ai_service.return_value = mock_service
-        mock_service.send_message.return_value = {
-            "success": True,
-            "content": "This is not valid JSON",
-            "usage": {"input_tokens": 100, "output_tokens": 50},
-        }
+        mock_service.send_messages.return_value = [
+            {
+                "success": True,
+                "content": "This is not valid JSON",
+                "usage": {"input_tokens": 100, "output_tokens": 50},
+            }
+        ]
 
         url = reverse(
             "excel_manager:validate_ai", kwargs={"pk": excel_upload_with_data.pk}
@@ -244,40 +254,168 @@ class TestValidateWithAIView:
         assert "This is not valid JSON" in validation.validation_result["summary"]
 
 
+@pytest.mark.django_db
+class TestAsyncValidateWithAIView:
+    """Test the ASGI variant of the AI validation view."""
+
+    @pytest.fixture(autouse=True)
+    def ai_enabled(self, settings):
+        settings.AI_CONFIG = {**settings.AI_CONFIG, "ENABLED": True}
+
+    def post(self, user, upload, data=None):
+        request = RequestFactory().post("/validate-ai/", data or {})
+
+        async def auser():
+            return user
+
+        request.auser = auser
+        view = AsyncValidateWithAIView.as_view()
+        return async_to_sync(view)(request, pk=upload.pk)
+
+    @patch("apps.excel_manager.services.validation.AsyncAIService")
+    def test_validation_success(self, mock_ai_service, user, excel_upload_with_data):
+        """The Claude API is awaited and the result rendered."""
+        mock_ai_service.return_value.send_messages = AsyncMock(
+            return_value=[
+                {
+                    "success": True,
+                    "content": json.dumps(
+                        {
+                            "valid_rows": 5,
+                            "warning_rows": 0,
+                            "error_rows": 0,
+                            "issues": [],
+                            "summary": "Validated without a worker",
+                            "suggestions": [],
+                            "severity": "low",
+                        }
+                    ),
+                    "usage": {"input_tokens": 150, "output_tokens": 100},
+                }
+            ]
+        )
+
+        response = self.post(user, excel_upload_with_data)
+
+        assert response.status_code == 200
+        assert b"Validated without a worker" in response.content
+        validation = AIValidation.objects.get(excel_upload=excel_upload_with_data)
+        assert validation.valid_rows == 5
+        job = ValidationJob.objects.get()
+        assert (job.status, job.validation) == (ValidationJob.STATUS_DONE, validation)
+
+    @patch("apps.excel_manager.services.validation.AsyncAIService")
+    def test_recent_validation_is_served_from_cache(
+        self, mock_ai_service, user, excel_upload_with_data
+    ):
+        """Recent validations are reused unless a refresh is forced."""
+        AIValidation.objects.create(
+            excel_upload=excel_upload_with_data,
+            validation_result={"summary": "Cached validation result"},
+        )
+
+        response = self.post(user, excel_upload_with_data)
+
+        assert b"Cached validation result" in response.content
+        mock_ai_service.assert_not_called()
+
+    def test_unauthenticated_users_are_redirected(self, excel_upload):
+        """Anonymous requests go to the login page."""
+        response = self.post(AnonymousUser(), excel_upload)
+
+        assert response.status_code == 302
+        assert "/auth/login/" in response.url
+
+    def test_validation_requires_ownership(
+        self, user, other_user, excel_upload_factory
+    ):
+        """Users can only validate their own uploads."""
+        with pytest.raises(Http404):
+            self.post(user, excel_upload_factory(user=other_user))
+
+    @patch("apps.excel_manager.services.validation.AsyncAIService")
+    def test_validation_errors_are_rendered(
+        self, mock_ai_service, user, excel_upload_with_data
+    ):
+        """AI failures are reported in the error partial."""
+        mock_ai_service.return_value.send_messages = AsyncMock(
+            return_value=[{"success": False, "error": "Overloaded", "content": None}]
+        )
+
+        response = self.post(user, excel_upload_with_data)
+
+        assert response.status_code == 500
+        assert b"Overloaded" in response.content
+        job = ValidationJob.objects.get()
+        assert job.status == ValidationJob.STATUS_FAILED
+        assert "Overloaded" in job.error
+
+    @patch("apps.excel_manager.services.validation.AsyncAIService")
+    def test_users_over_the_limit_are_rejected(
+        self, mock_ai_service, settings, user, excel_upload_factory
+    ):
+        """Validations run in the request count towards VALIDATION_MAX_PER_USER."""
+        settings.EXCEL_CONFIG = {**settings.EXCEL_CONFIG, "VALIDATION_MAX_PER_USER": 1}
+        running = excel_upload_factory(user=user, file_hash="running")
+        ValidationJob.objects.create(excel_upload=running, user=user)
+
+        response = self.post(user, excel_upload_factory(user=user, file_hash="new"))
+
+        assert response.status_code == 429
+        assert b"already have 1 validation in progress" in response.content
+        mock_ai_service.assert_not_called()
+
+    @patch("apps.excel_manager.services.validation.AsyncAIService")
+    def test_upload_already_being_validated_is_not_validated_again(
+        self, mock_ai_service, user, excel_upload_with_data
+    ):
+        """A second click shows the validation in progress."""
+        job = ValidationJob.objects.create(
+            excel_upload=excel_upload_with_data, user=user
+        )
+
+        response = self.post(user, excel_upload_with_data)
+
+        assert response.status_code == 202
+        assert ValidationJob.objects.get() == job
+        mock_ai_service.assert_not_called()
+
+
 @pytest.mark.django_db
 class TestValidateExcelWithAI:
     """Test the validate_excel_with_ai function."""
 
-    @patch("apps.excel_manager.views.AIService")
+    @patch("apps.excel_manager.services.validation.AIService")
     def test_validate_excel_with_ai_success(
         self, mock_ai_service, excel_upload_with_data
     ):
         """Test successful AI validation."""
         mock_service = Mock()
         mock_ai_service.return_value = mock_service
-        mock_service.send_message.return_value = {
-            "success": True,
-            "content": json.dumps(
-                {
-                    "valid_rows": 90,
-                    "warning_rows": 5,
-                    "error_rows": 5,
-                    "issues": [
-                        {
-                            "row": 3,
-                            "column": "Date",
-                            "issue": "Invalid format",
-                            "severity": "warning",
-                        }
-                    ],
-                    "summary": "Data quality is good",
-                    "suggestions": ["Standardize date formats"],
-                    "severity": "low",
-                }
-            ),
-            "usage": {"input_tokens": 200, "output_tokens": 150},
-            "model": "claude-sonnet-4-20250514",
-        }
+        mock_service.send_messages.return_value = [
+            {
+                "success": True,
+                "content": json.dumps(
+                    {
+                        "valid_rows": 90,
+                        "warning_rows": 5,
+                        "error_rows": 5,
+                        "issues": [
+                            {
+                                "row": 3,
+                                "column": "Date",
+                                "issue": "Invalid format",
+                                "severity": "warning",
+                            }
+                        ],
+                        "summary": "Data quality is good",
+                        "suggestions": ["Standardize date formats"],
+                        "severity": "low",
+                    }
+                ),
+                "usage": {"input_tokens": 200, "output_tokens": 150},
+            }
+        ]
 
         validation = validate_excel_with_ai(excel_upload_with_data)
 
@@ -286,14 +424,131 @@ class TestValidateExcelWithAI:
         assert validation.issues_found == 1
         assert "Standardize date formats" in validation.suggestions
         assert validation.ai_metadata["tokens"]["input_tokens"] == 200
+        assert validation.ai_metadata["model"] == settings.AI_CONFIG["MODEL"]
 
-    @patch("apps.excel_manager.views.AIService")
+    @patch("apps.excel_manager.services.validation.AIService")
     def test_validate_excel_no_data(self, mock_ai_service, excel_upload):
         """Test validation with no data raises error."""
         with pytest.raises(ValueError, match="No data to validate"):
             validate_excel_with_ai(excel_upload)
 
 
+def sheet_response(summary, severity, issues=(), suggestions=()):
+    """AIService result for one sheet."""
+    return {
+        "success": True,
+        "content": json.dumps(
+            {
+                "valid_rows": 4,
+                "warning_rows": 1,
+                "error_rows": len(issues),
+                "issues": list(issues),
+                "summary": summary,
+                "suggestions": list(suggestions),
+                "severity": severity,
+            }
+        ),
+        "usage": {"input_tokens": 100, "output_tokens": 50},
+    }
+
+
+@pytest.mark.django_db
+class TestMultiSheetValidation:
+    """Every sheet with rows is validated and the results merged."""
+
+    @pytest.fixture
+    def workbook(self, excel_upload_with_data):
+        orders = ExcelData.objects.create(
+            upload=excel_upload_with_data,
+            sheet_name="Orders",
+            sheet_index=1,
+            headers=["Order", "Total"],
+        )
+        set_rows(orders, [["A-1", "10"], ["A-2", "-5"]])
+        # Empty sheets are not sent
+        set_rows(
+            ExcelData.objects.create(
+                upload=excel_upload_with_data, sheet_name="Notes", sheet_index=2
+            ),
+            [],
+        )
+        return excel_upload_with_data
+
+    @patch("apps.excel_manager.services.validation.AIService")
+    def test_sheets_are_sent_together_and_merged(self, mock_ai_service, workbook):
+        issue = {"row": 2, "column": "Total", "issue": "Negative", "severity": "error"}
+        mock_ai_service.return_value.send_messages.return_value = [
+            sheet_response("People look fine.", "low", suggestions=["Fill emails"]),
+            sheet_response(
+                "Totals are off.",
+                "high",
+                issues=[issue],
+                suggestions=["Fill emails", "Check totals"],
+            ),
+        ]
+
+        validation = validate_excel_with_ai(workbook)
+
+        prompts = mock_ai_service.return_value.send_messages.call_args.args[0]
+        assert len(prompts) == 2
+        assert "Sheet: Sheet1" in prompts[0] and "Sheet: Orders" in prompts[1]
+        assert (validation.valid_rows, validation.error_rows) == (8, 1)
+        assert validation.severity == "high"
+        assert validation.validation_result["issues"] == [{**issue, "sheet": "Orders"}]
+        assert validation.suggestions == "Fill emails\nCheck totals"
+        assert validation.summary == "Sheet1: People look fine. Orders: Totals are off."
+        assert [sheet["sheet_name"] for sheet in validation.sheets] == [
+            "Sheet1",
+            "Orders",
+        ]
+        assert validation.ai_metadata["tokens"] == {
+            "input_tokens": 200,
+            "output_tokens": 100,
+        }
+
+    @patch("apps.excel_manager.services.validation.AIService")
+    def test_failed_sheets_are_reported_in_their_section(
+        self, mock_ai_service, workbook
+    ):
+        mock_ai_service.return_value.send_messages.return_value = [
+            sheet_response("People look fine.", "medium"),
+            {"success": False, "error": "Overloaded", "content": None},
+        ]
+
+        validation = validate_excel_with_ai(workbook)
+
+        assert validation.severity == "medium"
+        assert validation.sheets[1] == {
+            "sheet_name": "Orders",
+            "severity": "unknown",
+            "error": "Overloaded",
+        }
+
+    @patch("apps.excel_manager.services.validation.AIService")
+    def test_validation_fails_when_every_sheet_fails(self, mock_ai_service, workbook):
+        failure = {"success": False, "error": "Overloaded", "content": None}
+        mock_ai_service.return_value.send_messages.return_value = [failure, failure]
+
+        with pytest.raises(Exception, match="AI validation failed: Overloaded"):
+            validate_excel_with_ai(workbook)
+
+    @patch("apps.excel_manager.services.validation.AIService")
+    def test_first_sheet_only_when_disabled(self, mock_ai_service, workbook, settings):
+        settings.EXCEL_CONFIG = {
+            **settings.EXCEL_CONFIG,
+            "VALIDATION_ALL_SHEETS": False,
+        }
+        mock_ai_service.return_value.send_messages.return_value = [
+            sheet_response("People look fine.", "low")
+        ]
+
+        validation = validate_excel_with_ai(workbook)
+
+        prompts = mock_ai_service.return_value.send_messages.call_args.args[0]
+        assert len(prompts) == 1
+        assert validation.sheets == []
+
+
 @pytest.mark.django_db
 class TestDetailViewAIIntegration:
     """Test detail view AI integration."""
@@ -0,0 +1,63 @@
+"""Tests for content-addressed blob storage and cross-user deduplication."""
+
+import pytest
+from django.urls import reverse
+
+from apps.excel_manager.models import ExcelBlob, ExcelUpload, ExcelData
+
+
+def upload_as(client, user, excel_file):
+    """Upload excel_file as the given user."""
+    excel_file.seek(0)
+    client.force_login(user)
+    return client.post(reverse("excel_manager:upload"), {"file": excel_file})
+
+
+@pytest.mark.django_db
+class TestContentAddressedUploads:
+
+    def test_same_file_from_two_users_is_stored_and_parsed_once(
+        self, client, user, other_user, excel_file
+    ):
+        upload_as(client, user, excel_file)
+        upload_as(client, other_user, excel_file)
+
+        assert ExcelUpload.objects.count() == 2
+        blob = ExcelBlob.objects.get()
+        assert blob.ref_count == 2
+        assert blob.is_parsed
+        # Sharded by hash prefix
+        assert blob.file.name.startswith(
+            f"blobs/{blob.sha256[:2]}/{blob.sha256[2:4]}/{blob.sha256}"
+        )
+        # Parsed sheets exist once and are shared by both uploads
+        assert ExcelData.objects.count() == 2
+        for upload in ExcelUpload.objects.all():
+            assert upload.status == ExcelUpload.STATUS_COMPLETED
+            assert upload.sheet_count == 2
+            assert upload.get_sheets().count() == 2
+
+    def test_blob_is_removed_with_last_reference(
+        self, client, user, other_user, excel_file, django_capture_on_commit_callbacks
+    ):
+        upload_as(client, user, excel_file)
+        upload_as(client, other_user, excel_file)
+        blob = ExcelBlob.objects.get()
+        storage, name = blob.file.storage, blob.file.name
+
+        mine = ExcelUpload.objects.get(user=user)
+        client.force_login(user)
+        client.post(reverse("excel_manager:delete", kwargs={"pk": mine.pk}))
+
+        blob.refresh_from_db()
+        assert blob.ref_count == 1
+        assert storage.exists(name)
+
+        theirs = ExcelUpload.objects.get(user=other_user)
+        client.force_login(other_user)
+        with django_capture_on_commit_callbacks(execute=True):
+            client.post(reverse("excel_manager:delete", kwargs={"pk": theirs.pk}))
+
+        assert not ExcelBlob.objects.exists()
+        assert not ExcelData.objects.exists()
+        assert not storage.exists(name)
@@ -0,0 +1,47 @@
+"""Tests for bulk loading of row chunks."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from apps.excel_manager.models import ExcelData, ExcelRowChunk
+from apps.excel_manager.services.bulk_load import load_chunks
+
+
+@pytest.fixture
+def sheet(excel_upload):
+    return ExcelData.objects.create(
+        upload=excel_upload, sheet_name="Sheet1", sheet_index=0, headers=["N"]
+    )
+
+
+@pytest.mark.django_db
+class TestLoadChunks:
+
+    def test_falls_back_to_bulk_create(self, sheet):
+        load_chunks(ExcelRowChunk.build(sheet, [[i] for i in range(1200)]))
+
+        chunks = sheet.chunks.order_by("chunk_index")
+        assert [len(chunk.rows) for chunk in chunks] == [500, 500, 200]
+
+    def test_uses_copy_on_postgresql(self, sheet):
+        connection = MagicMock(vendor="postgresql")
+        connection.ops.quote_name = lambda name: f'"{name}"'
+        cursor = connection.cursor.return_value.__enter__.return_value
+        copy = cursor.cursor.copy.return_value.__enter__.return_value
+
+        with patch("apps.excel_manager.services.bulk_load.connection", connection):
+            load_chunks(ExcelRowChunk.build(sheet, [[i] for i in range(600)]))
+
+        cursor.cursor.copy.assert_called_once_with(
+            'COPY "excel_manager_excelrowchunk" ("sheet_id", "chunk_index", "rows") '
+            "FROM STDIN"
+        )
+        written = [call.args[0] for call in copy.write_row.call_args_list]
+        assert [(sheet_id, index) for sheet_id, index, _ in written] == [
+            (sheet.pk, 0),
+            (sheet.pk, 1),
+        ]
+        assert written[1][2].obj == [[i] for i in range(500, 600)]
+        # Nothing went through the ORM
+        assert not ExcelRowChunk.objects.exists()
@@ -0,0 +1,275 @@
+"""Tests for full-coverage validation of sheets in row chunks."""
+
+import json
+import re
+from unittest.mock import patch
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.utils import timezone
+
+from apps.excel_manager.models import (
+    AIValidation,
+    ExcelData,
+    ValidationChunk,
+    ValidationJob,
+)
+from apps.excel_manager.services.validation import (
+    avalidate_excel_with_ai,
+    reduce_chunk_results,
+    split_rows,
+    validate_excel_with_ai,
+)
+from apps.excel_manager.services.validation_jobs import (
+    enqueue_validation,
+    finish_validation_job,
+    lease_next_validation,
+    run_validation_job,
+)
+
+from .helpers import set_rows
+
+
+@pytest.fixture(autouse=True)
+def full_coverage(settings):
+    settings.AI_CONFIG = {**settings.AI_CONFIG, "ENABLED": True}
+    settings.EXCEL_CONFIG = {
+        **settings.EXCEL_CONFIG,
+        "VALIDATION_FULL_COVERAGE": True,
+        # Rows of the sheet below are about 6 tokens each: 10 rows per chunk
+        "VALIDATION_CHUNK_TOKENS": 60,
+    }
+
+
+@pytest.fixture
+def big_sheet(excel_upload):
+    sheet = ExcelData.objects.create(
+        upload=excel_upload, sheet_name="Sheet1", sheet_index=0, headers=["Id"]
+    )
+    set_rows(sheet, [[f"id-{i}"] for i in range(1, 26)])
+    return sheet
+
+
+def chunk_reply(prompt):
+    """AIService result flagging the last row of the chunk in ``prompt``."""
+    start, stop = map(int, re.search(r"rows (\d+) to (\d+)", prompt).groups())
+    return {
+        "success": True,
+        "content": json.dumps(
+            {
+                "valid_rows": stop - start,
+                "warning_rows": 0,
+                "error_rows": 1,
+                "issues": [
+                    {
+                        "row": stop,
+                        "column": "Id",
+                        "issue": "Bad id",
+                        "severity": "error",
+                    }
+                ],
+                "summary": f"Row {stop} is bad.",
+                "suggestions": ["Fix ids"],
+                "severity": "medium",
+            }
+        ),
+        "usage": {"input_tokens": 10, "output_tokens": 5},
+    }
+
+
+def test_rows_are_split_to_fit_the_token_budget(big_sheet):
+    chunks = list(split_rows(big_sheet, token_budget=30))
+
+    assert [(start, stop) for start, stop, _ in chunks] == [
+        (0, 5),
+        (5, 10),
+        (10, 15),
+        (15, 20),
+        (20, 25),
+    ]
+    # Rows keep their sheet numbers
+    assert chunks[1][2][0] == "Row 6: {'Id': 'id-6'}"
+
+
+@pytest.mark.django_db
+def test_chunk_results_are_reduced_with_sheet_row_numbers(big_sheet):
+    def chunk(start, stop, issues, severity):
+        return ValidationChunk(
+            sheet=big_sheet,
+            start_row=start,
+            stop_row=stop,
+            result={
+                "valid_rows": 100,
+                "issues": issues,
+                "summary": f"{severity} findings",
+                "severity": severity,
+            },
+        )
+
+    issue = {"row": 12, "column": "Id", "issue": "Duplicate", "severity": "warning"}
+    reduced = reduce_chunk_results(
+        [
+            chunk(0, 10, [{**issue, "row": 3}], "low"),
+            # Counted from 1 within the chunk, and reported twice
+            chunk(10, 20, [{**issue, "row": 2}, issue], "high"),
+        ]
+    )
+
+    assert reduced["valid_rows"] == 20
+    assert [issue["row"] for issue in reduced["issues"]] == [3, 12]
+    assert reduced["severity"] == "high"
+    assert reduced["summary"] == (
+        "Checked all 20 rows in 2 chunks. Rows 11-20: high findings"
+    )
+
+
+@pytest.mark.django_db
+class TestChunkedValidation:
+
+    @patch("apps.excel_manager.services.validation.AIService")
+    def test_every_row_is_validated(self, mock_ai_service, big_sheet):
+        service = mock_ai_service.return_value
+        service.iter_messages.side_effect = lambda prompts, system=None: (
+            (index, chunk_reply(prompt)) for index, prompt in enumerate(prompts)
+        )
+
+        validation = validate_excel_with_ai(big_sheet.upload)
+
+        prompts = service.iter_messages.call_args.args[0]
+        assert len(prompts) == 3
+        assert "Validate rows 21 to 25" in prompts[-1]
+        assert validation.valid_rows == 22
+        assert validation.error_rows == 3
+        assert [issue["row"] for issue in validation.validation_result["issues"]] == [
+            10,
+            20,
+            25,
+        ]
+        assert validation.suggestions == "Fix ids"
+        assert validation.ai_metadata["tokens"] == {
+            "input_tokens": 30,
+            "output_tokens": 15,
+        }
+        assert not ValidationChunk.objects.exists()
+
+    @patch("apps.excel_manager.services.validation.AIService")
+    def test_malformed_counts_in_a_reply_are_read_as_zero(
+        self, mock_ai_service, big_sheet
+    ):
+        def replies(prompts, system=None):
+            for index, prompt in enumerate(prompts):
+                reply = chunk_reply(prompt)
+                if index == 0:
+                    content = json.loads(reply["content"])
+                    content.update(valid_rows="most", warning_rows=None)
+                    reply["content"] = json.dumps(content)
+                yield index, reply
+
+        mock_ai_service.return_value.iter_messages.side_effect = replies
+
+        validation = validate_excel_with_ai(big_sheet.upload)
+
+        # Rows 1-10 count as neither valid nor warnings, the rest as usual
+        assert validation.valid_rows == 13
+        assert validation.warning_rows == 0
+        assert validation.error_rows == 3
+
+    @patch("apps.excel_manager.services.validation.AIService")
+    def test_retry_only_sends_the_failed_chunks(self, mock_ai_service, big_sheet):
+        service = mock_ai_service.return_value
+
+        def fail_second_chunk(prompts, system=None):
+            for index, prompt in enumerate(prompts):
+                if "Validate rows 11 to 20" in prompt:
+                    yield index, {"success": False, "error": "Overloaded"}
+                else:
+                    yield index, chunk_reply(prompt)
+
+        service.iter_messages.side_effect = fail_second_chunk
+        with pytest.raises(Exception, match="failed for 1 of 3 chunks: Overloaded"):
+            validate_excel_with_ai(big_sheet.upload)
+        assert ValidationChunk.objects.count() == 2
+
+        service.iter_messages.side_effect = lambda prompts, system=None: (
+            (index, chunk_reply(prompt)) for index, prompt in enumerate(prompts)
+        )
+        validation = validate_excel_with_ai(big_sheet.upload)
+
+        retried = service.iter_messages.call_args.args[0]
+        assert len(retried) == 1
+        assert "Validate rows 11 to 20" in retried[0]
+        assert validation.error_rows == 3
+        assert not ValidationChunk.objects.exists()
+
+    @patch("apps.excel_manager.services.validation.AsyncAIService")
+    def test_async_validation_saves_chunks_as_they_arrive(
+        self, mock_ai_service, big_sheet
+    ):
+        async def replies(prompts, system=None):
+            # Replies arrive out of order
+            for index in reversed(range(len(prompts))):
+                yield index, chunk_reply(prompts[index])
+
+        mock_ai_service.return_value.iter_messages = replies
+
+        validation = async_to_sync(avalidate_excel_with_ai)(big_sheet.upload)
+
+        assert [issue["row"] for issue in validation.validation_result["issues"]] == [
+            10,
+            20,
+            25,
+        ]
+
+
+@pytest.mark.django_db
+class TestLeasedChunkedValidation:
+
+    @pytest.fixture
+    def job(self, big_sheet):
+        enqueue_validation(big_sheet.upload)
+        return lease_next_validation("worker-1", lease_seconds=0)
+
+    @patch("apps.excel_manager.services.validation.AIService")
+    def test_lease_is_renewed_after_each_chunk(self, mock_ai_service, job):
+        leases = []
+
+        def replies(prompts, system=None):
+            for index, prompt in enumerate(prompts):
+                leases.append(ValidationJob.objects.get().leased_until)
+                yield index, chunk_reply(prompt)
+
+        mock_ai_service.return_value.iter_messages.side_effect = replies
+
+        assert run_validation_job(job)
+
+        # Each chunk starts under a lease extended by the previous one
+        assert leases[0] == job.started_at
+        assert leases[0] < leases[1] < leases[2]
+        assert ValidationJob.objects.get().status == ValidationJob.STATUS_DONE
+
+    @patch("apps.excel_manager.services.validation.AIService")
+    def test_worker_stops_once_another_leased_the_job(self, mock_ai_service, job):
+        def replies(prompts, system=None):
+            yield 0, chunk_reply(prompts[0])
+            # The lease expired and another worker took the job over
+            ValidationJob.objects.update(leased_until=timezone.now())
+            lease_next_validation("worker-2")
+            yield 1, chunk_reply(prompts[1])
+
+        mock_ai_service.return_value.iter_messages.side_effect = replies
+
+        assert not run_validation_job(job)
+
+        job = ValidationJob.objects.get()
+        assert (job.status, job.leased_by) == (ValidationJob.STATUS_RUNNING, "worker-2")
+        assert not AIValidation.objects.exists()
+        # Replies saved so far are reused by the new lease
+        assert ValidationChunk.objects.count() == 2
+
+    def test_results_are_not_recorded_without_the_lease(self, job):
+        lease_next_validation("worker-2")
+
+        assert not finish_validation_job(job, error="Too late")
+
+        job = ValidationJob.objects.get()
+        assert (job.status, job.error) == (ValidationJob.STATUS_RUNNING, "")
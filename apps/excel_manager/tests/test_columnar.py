@@ -0,0 +1,194 @@
+"""Tests for the memory-mapped columnar sheet format."""
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+from django.urls import reverse
+
+from apps.excel_manager.models import ExcelData, ExcelUpload
+from apps.excel_manager.services.columnar import (
+    SORT_ORDER_FILE,
+    ensure_columnar,
+    get_columnar_path,
+    open_columnar_writer,
+    write_columnar,
+)
+
+from .helpers import set_rows
+from .test_ingestion import build_workbook
+
+
+@pytest.mark.django_db
+class TestColumnarSheet:
+
+    def test_ingestion_writes_memory_mapped_columns(self, authenticated_client):
+        rows = [(1, "Widget"), (2, "Gadget"), (None, "Widget"), (4.5, None)]
+        authenticated_client.post(
+            reverse("excel_manager:upload"), {"file": build_workbook(rows)}
+        )
+        sheet = ExcelUpload.objects.get().get_sheets().get().ensure_parsed()
+
+        columns = sheet.columns()
+
+        assert columns.names == ["ID", "Name"]
+        assert columns.row_count == 4
+        ids = columns[0]
+        assert isinstance(ids, np.memmap)
+        assert ids.dtype == np.float64
+        assert np.nansum(ids) == 7.5
+        # Repeated strings share one pool entry
+        names = columns[1]
+        assert names.dtype == np.int32
+        assert names[0] == names[2]
+        assert columns.strings(1) == ["Widget", "Gadget", "Widget", ""]
+        assert columns.strings(0) == ["1", "2", "", "4.5"]
+
+    def test_columns_are_rebuilt_from_stored_rows(self, excel_upload_with_data):
+        sheet = excel_upload_with_data.sheets.get()
+        shutil.rmtree(get_columnar_path(sheet))
+        assert sheet.columns() is None
+
+        write_columnar(sheet)
+
+        columns = sheet.columns()
+        assert columns.names == ["Name", "Email", "Age"]
+        assert columns.strings(columns.index_of("Email"))[0] == "john@example.com"
+
+    def test_only_number_cells_make_a_numeric_column(self, excel_upload):
+        sheet = ExcelData.objects.create(
+            upload=excel_upload,
+            sheet_name="Codes",
+            sheet_index=0,
+            headers=["Count", "Code", "Flag"],
+        )
+        set_rows(sheet, [[1, "00123", True], [2.5, "1e3", False]])
+
+        columns = sheet.columns()
+
+        assert columns.is_numeric(0)
+        # Number-like text and booleans stay strings
+        assert not columns.is_numeric(1)
+        assert columns.strings(1) == ["00123", "1e3"]
+        assert not columns.is_numeric(2)
+
+    def test_writer_spills_each_batch_to_disk(self, excel_upload):
+        sheet = ExcelData.objects.create(
+            upload=excel_upload, sheet_name="Mixed", sheet_index=0, headers=["A"]
+        )
+        writer = open_columnar_writer(sheet, batch_size=2)
+        # Column A turns textual after two batches; a third column appears late
+        for row in [[1, "a"], [2.5, "b"], [3, "a"], [None, "b"], ["x", "c", 5]]:
+            writer.write(row)
+            assert len(writer.buffer) < 2
+
+        path = writer.save(sheet)
+
+        columns = sheet.columns()
+        assert columns.names == ["A", "Column 2", "Column 3"]
+        assert [columns.is_numeric(i) for i in range(3)] == [False, False, True]
+        assert columns.strings(0) == ["1", "2.5", "3", "", "x"]
+        assert columns.strings(1) == ["a", "b", "a", "b", "c"]
+        assert columns.strings(2) == ["", "", "", "", "5"]
+        assert columns.sort_order(0).tolist() == [0, 1, 2, 4, 3]
+        # Only the finished sheet is left next to the workbook
+        assert os.listdir(os.path.dirname(path)) == ["0"]
+
+    def test_concurrent_writers_leave_one_copy(self, excel_upload_with_data):
+        sheet = excel_upload_with_data.sheets.get()
+        writers = [open_columnar_writer(sheet, batch_size=2) for _ in range(2)]
+        for row in sheet.iter_rows():
+            for writer in writers:
+                writer.write(row)
+
+        paths = {writer.save(sheet) for writer in writers}
+
+        assert paths == {get_columnar_path(sheet)}
+        assert os.listdir(os.path.dirname(get_columnar_path(sheet))) == ["0"]
+        assert sheet.columns().row_count == 5
+
+    def test_columns_are_deleted_with_the_upload(
+        self, authenticated_client, django_capture_on_commit_callbacks
+    ):
+        authenticated_client.post(
+            reverse("excel_manager:upload"), {"file": build_workbook([(1, "a")])}
+        )
+        upload = ExcelUpload.objects.get()
+        path = get_columnar_path(upload.get_sheets().get().ensure_parsed())
+        assert os.path.isdir(path)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            authenticated_client.post(
+                reverse("excel_manager:delete", kwargs={"pk": upload.pk})
+            )
+
+        assert not os.path.exists(path)
+
+
+@pytest.fixture
+def price_sheet(excel_upload):
+    sheet = ExcelData.objects.create(
+        upload=excel_upload,
+        sheet_name="Prices",
+        sheet_index=0,
+        headers=["Item", "Price"],
+    )
+    set_rows(
+        sheet,
+        [
+            ["pear", 3],
+            ["Apple", None],
+            ["fig", 10],
+            [None, 2.5],
+            ["apple pie", 3],
+        ],
+    )
+    return sheet
+
+
+@pytest.mark.django_db
+class TestSortAndFilter:
+
+    def test_sort_orders_are_written_with_the_columns(self, price_sheet):
+        path = write_columnar(price_sheet)
+
+        columns = price_sheet.columns()
+
+        assert os.path.exists(os.path.join(path, SORT_ORDER_FILE.format(index=1)))
+        # Strings sort case-insensitively, numbers numerically, blanks last
+        assert columns.sort_order(0).tolist() == [1, 4, 2, 0, 3]
+        assert columns.sort_order(1).tolist() == [3, 0, 4, 2, 1]
+
+    def test_missing_sort_order_is_computed_and_kept(self, price_sheet):
+        path = write_columnar(price_sheet)
+        os.remove(os.path.join(path, SORT_ORDER_FILE.format(index=0)))
+
+        columns = price_sheet.columns()
+
+        assert columns.sort_order(0).tolist() == [1, 4, 2, 0, 3]
+        assert os.path.exists(os.path.join(path, SORT_ORDER_FILE.format(index=0)))
+
+    def test_descending_window_keeps_blanks_last(self, price_sheet):
+        columns = ensure_columnar(price_sheet)
+
+        positions, total = columns.window(0, 10, sort=1, descending=True)
+
+        assert total == 5
+        assert positions.tolist() == [2, 4, 0, 3, 1]
+        assert columns.window(1, 3, sort=1, descending=True)[0].tolist() == [4, 0]
+
+    def test_filter_matches_substrings_ignoring_case(self, price_sheet):
+        columns = ensure_columnar(price_sheet)
+
+        assert columns.match("APPLE").tolist() == [False, True, False, False, True]
+        # Numbers match their displayed text
+        assert columns.match("3", 1).tolist() == [True, False, False, False, True]
+        positions, total = columns.window(0, 10, sort=0, query="p")
+        assert (positions.tolist(), total) == ([1, 4, 0], 3)
+
+    def test_rows_are_gathered_from_the_columns(self, price_sheet):
+        columns = ensure_columnar(price_sheet)
+
+        assert columns.rows(np.array([3, 2])) == [[None, 2.5], ["fig", 10]]
+        assert columns.rows(np.array([0]), start=1) == [[3]]
@@ -0,0 +1,197 @@
+"""Tests for the rendered sheet table fragment cache."""
+
+import time
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.excel_manager.models import ExcelData
+from apps.excel_manager.services import fragment_cache
+from apps.excel_manager.services.fragment_cache import (
+    fragment_key,
+    get_fragment_cache_stats,
+    get_or_render,
+    invalidate_upload,
+)
+
+from .helpers import set_rows
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class Renderer:
+    def __init__(self, html="<tr></tr>"):
+        self.html = html
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.html
+
+
+class TestGetOrRender:
+
+    def test_second_lookup_is_a_hit(self):
+        render = Renderer()
+        key = fragment_key(1, "hash", 0)
+
+        assert get_or_render(1, key, render) == ("<tr></tr>", False)
+        assert get_or_render(1, key, render) == ("<tr></tr>", True)
+
+        assert render.calls == 1
+        assert get_fragment_cache_stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+    def test_oversized_fragments_are_not_cached(self, settings):
+        settings.EXCEL_CONFIG = {
+            **settings.EXCEL_CONFIG,
+            "TABLE_CACHE_MAX_FRAGMENT_BYTES": 4,
+        }
+        render = Renderer()
+        key = fragment_key(1, "hash", 0)
+
+        get_or_render(1, key, render)
+        get_or_render(1, key, render)
+
+        assert render.calls == 2
+
+    def test_oldest_fragments_are_evicted_past_the_upload_budget(self, settings):
+        settings.EXCEL_CONFIG = {
+            **settings.EXCEL_CONFIG,
+            "TABLE_CACHE_UPLOAD_BYTES": 20,
+        }
+        keys = [fragment_key(1, "hash", page) for page in range(3)]
+
+        for key in keys:
+            get_or_render(1, key, Renderer("x" * 8))
+
+        assert cache.get(keys[0]) is None
+        assert cache.get(keys[1]) and cache.get(keys[2])
+
+    def test_invalidate_upload_only_drops_its_fragments(self):
+        mine, other = fragment_key(1, "hash", 0), fragment_key(2, "hash", 0)
+        get_or_render(1, mine, Renderer())
+        get_or_render(2, other, Renderer())
+
+        invalidate_upload(1)
+
+        assert cache.get(mine) is None
+        assert cache.get(other)
+
+    def test_concurrent_miss_waits_for_the_lock_holder(self, monkeypatch):
+        key = fragment_key(1, "hash", 0)
+        cache.add(fragment_cache._lock_key(key), 1)
+
+        def lock_holder_finishes(seconds):
+            cache.set(key, {"html": "<tr>done</tr>", "delta": 0, "expires": 0})
+
+        monkeypatch.setattr(fragment_cache.time, "sleep", lock_holder_finishes)
+        render = Renderer()
+
+        assert get_or_render(1, key, render) == ("<tr>done</tr>", True)
+        assert render.calls == 0
+
+    def test_renders_when_the_lock_holder_is_too_slow(self, monkeypatch):
+        key = fragment_key(1, "hash", 0)
+        lock_key = fragment_cache._lock_key(key)
+        cache.add(lock_key, 1)
+        monkeypatch.setattr(fragment_cache, "LOCK_WAIT_SECONDS", 0.01)
+
+        assert get_or_render(1, key, Renderer()) == ("<tr></tr>", False)
+        # The lock belongs to the other request
+        assert lock_key in cache
+
+    def test_entries_near_expiry_are_refreshed_early(self, monkeypatch):
+        key = fragment_key(1, "hash", 0)
+        stale = {"html": "<tr>old</tr>", "delta": 5.0, "expires": time.time() + 1}
+        cache.set(key, stale)
+        monkeypatch.setattr(fragment_cache.random, "random", lambda: 0.5)
+
+        assert get_or_render(1, key, Renderer("<tr>new</tr>")) == (
+            "<tr>new</tr>",
+            False,
+        )
+        assert cache.get(key)["html"] == "<tr>new</tr>"
+
+
+@pytest.fixture
+def cached_sheet(excel_upload):
+    sheet = ExcelData.objects.create(
+        upload=excel_upload, sheet_name="Long", sheet_index=0, headers=["N", "Sq"]
+    )
+    set_rows(sheet, [[i, i * i] for i in range(300)])
+    return sheet
+
+
+@pytest.mark.django_db
+class TestSheetViews:
+
+    def test_repeated_sheet_window_skips_rows(
+        self, authenticated_client, excel_upload, cached_sheet
+    ):
+        url = reverse(
+            "excel_manager:sheet_data", kwargs={"pk": excel_upload.pk, "sheet_index": 0}
+        )
+        first = authenticated_client.get(url + "?cursor=100")
+
+        with CaptureQueriesContext(connection) as queries:
+            second = authenticated_client.get(url + "?cursor=100")
+
+        assert second.content == first.content
+        assert second["HX-Replace-Url"] == first["HX-Replace-Url"]
+        assert not any("excelrowchunk" in query["sql"] for query in queries)
+
+    def test_detail_page_shares_the_table_fragment(
+        self, authenticated_client, excel_upload, cached_sheet
+    ):
+        table_url = reverse(
+            "excel_manager:sheet_data", kwargs={"pk": excel_upload.pk, "sheet_index": 0}
+        )
+        detail_url = reverse("excel_manager:detail", kwargs={"pk": excel_upload.pk})
+        table = authenticated_client.get(table_url + "?cursor=200")
+
+        detail = authenticated_client.get(detail_url + "?sheet=0&row=200")
+
+        assert table.content in detail.content
+        assert get_fragment_cache_stats()["hits"] == 1
+
+    def test_deleting_an_upload_drops_its_fragments(
+        self, authenticated_client, excel_upload, cached_sheet
+    ):
+        url = reverse(
+            "excel_manager:sheet_data", kwargs={"pk": excel_upload.pk, "sheet_index": 0}
+        )
+        authenticated_client.get(url)
+        index_key = fragment_cache._index_key(excel_upload.pk)
+        ((key, _),) = cache.get(index_key)
+
+        authenticated_client.post(
+            reverse("excel_manager:delete", kwargs={"pk": excel_upload.pk})
+        )
+
+        assert cache.get(key) is None
+        assert cache.get(index_key) is None
+
+
+def test_stats_command_reports_the_hit_rate():
+    key = fragment_key(1, "hash", 0)
+    for _ in range(4):
+        get_or_render(1, key, Renderer())
+    out = StringIO()
+
+    call_command("sheet_cache_stats", "--reset", stdout=out)
+
+    assert "Hits: 3\nMisses: 1\nHit rate: 75.0%" in out.getvalue()
+    assert get_fragment_cache_stats()["hit_rate"] is None
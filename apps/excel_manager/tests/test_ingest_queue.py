@@ -0,0 +1,189 @@
+"""Tests for background Excel ingestion."""
+
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.excel_manager.models import ExcelUpload, ExcelData, IngestJob
+from apps.excel_manager.services.job_queue import (
+    complete_job,
+    enqueue_ingest,
+    lease_next_job,
+    run_job,
+    run_worker,
+)
+
+
+@pytest.mark.django_db
+class TestBackgroundUpload:
+    """Uploads are stored and queued without parsing in the request."""
+
+    @pytest.fixture(autouse=True)
+    def background_ingest(self, settings):
+        settings.EXCEL_CONFIG = {**settings.EXCEL_CONFIG, "INGEST_EAGER": False}
+
+    def test_upload_returns_pending_and_queues_job(
+        self, authenticated_client, excel_file
+    ):
+        url = reverse("excel_manager:upload")
+        response = authenticated_client.post(
+            url, {"file": excel_file}, HTTP_HX_REQUEST="true"
+        )
+
+        assert response.status_code == 200
+        upload = ExcelUpload.objects.get()
+        assert upload.status == ExcelUpload.STATUS_PENDING
+        assert ExcelData.objects.count() == 0
+        assert upload.ingest_jobs.get().status == IngestJob.STATUS_QUEUED
+        # The list keeps polling until ingestion finishes
+        assert reverse("excel_manager:file_list").encode() in response.content
+
+    def test_worker_processes_queued_upload(self, authenticated_client, excel_file):
+        authenticated_client.post(reverse("excel_manager:upload"), {"file": excel_file})
+
+        assert run_worker(burst=True) == 1
+
+        upload = ExcelUpload.objects.get()
+        assert upload.status == ExcelUpload.STATUS_COMPLETED
+        assert upload.processed_at is not None
+        assert upload.sheet_count == 2
+        assert upload.get_sheets().count() == 2
+        assert upload.ingest_jobs.get().status == IngestJob.STATUS_DONE
+
+    def test_file_list_partial_stops_polling_when_done(
+        self, authenticated_client, excel_upload
+    ):
+        response = authenticated_client.get(reverse("excel_manager:file_list"))
+
+        assert response.status_code == 200
+        assert b"every 3s" not in response.content
+
+
+@pytest.mark.django_db
+class TestJobQueue:
+    """Leasing, retries and lease expiry."""
+
+    def test_leased_job_is_not_leased_twice(self, excel_upload):
+        enqueue_ingest(excel_upload)
+
+        job = lease_next_job("worker-a")
+        assert job.status == IngestJob.STATUS_LEASED
+        assert job.attempts == 1
+        assert lease_next_job("worker-b") is None
+
+    def test_expired_lease_is_picked_up_again(self, excel_upload):
+        enqueue_ingest(excel_upload)
+        job = lease_next_job("worker-a")
+        IngestJob.objects.filter(pk=job.pk).update(
+            leased_until=timezone.now() - timedelta(seconds=1)
+        )
+
+        job = lease_next_job("worker-b")
+        assert job.leased_by == "worker-b"
+        assert job.attempts == 2
+
+    def test_job_that_keeps_killing_its_worker_fails(self, excel_upload):
+        job = enqueue_ingest(excel_upload)
+        job.max_attempts = 1
+        job.save()
+        lease_next_job("worker-a")
+        # The worker was killed before it could record a failure
+        IngestJob.objects.filter(pk=job.pk).update(
+            leased_until=timezone.now() - timedelta(seconds=1)
+        )
+
+        assert lease_next_job("worker-b") is None
+
+        job.refresh_from_db()
+        excel_upload.refresh_from_db()
+        assert job.status == IngestJob.STATUS_FAILED
+        assert job.finished_at is not None
+        assert excel_upload.status == ExcelUpload.STATUS_FAILED
+        assert excel_upload.error_message == "The ingest worker stopped responding"
+
+    @patch(
+        "apps.excel_manager.services.job_queue.ingest_upload",
+        side_effect=Exception("corrupt workbook"),
+    )
+    def test_failed_job_is_retried_then_fails(self, mock_ingest, excel_upload):
+        job = enqueue_ingest(excel_upload)
+        job.max_attempts = 2
+        job.save()
+
+        assert run_job(lease_next_job("worker")) is False
+        job.refresh_from_db()
+        assert job.status == IngestJob.STATUS_QUEUED
+        assert job.available_at > timezone.now()
+        assert job.last_error == "corrupt workbook"
+        # Backoff keeps the job out of the queue for now
+        assert lease_next_job("worker") is None
+        excel_upload.refresh_from_db()
+        assert excel_upload.status == ExcelUpload.STATUS_PENDING
+
+        IngestJob.objects.filter(pk=job.pk).update(available_at=timezone.now())
+        assert run_job(lease_next_job("worker")) is False
+        job.refresh_from_db()
+        assert job.status == IngestJob.STATUS_FAILED
+        assert job.finished_at is not None
+        excel_upload.refresh_from_db()
+        assert excel_upload.status == ExcelUpload.STATUS_FAILED
+        assert excel_upload.error_message == "corrupt workbook"
+
+    def test_failed_attempt_is_not_shown_as_failed(self, excel_upload):
+        excel_upload.status = ExcelUpload.STATUS_PENDING
+        excel_upload.save()
+        enqueue_ingest(excel_upload)
+
+        with patch(
+            "apps.excel_manager.services.ingestion.process_excel_file",
+            side_effect=Exception("database went away"),
+        ):
+            assert run_job(lease_next_job("worker")) is False
+
+        excel_upload.refresh_from_db()
+        # Waiting for the retry, not failed
+        assert excel_upload.status == ExcelUpload.STATUS_PENDING
+
+    def test_worker_that_lost_its_lease_stops_without_writing(self, excel_upload):
+        enqueue_ingest(excel_upload)
+        job = lease_next_job("worker-a")
+        # worker-a stalled past its lease and worker-b took the job over
+        IngestJob.objects.filter(pk=job.pk).update(
+            leased_until=timezone.now() - timedelta(seconds=1)
+        )
+        lease_next_job("worker-b")
+
+        with patch(
+            "apps.excel_manager.services.ingestion.process_excel_file"
+        ) as mock_process:
+            assert run_job(job) is False
+
+        mock_process.assert_not_called()
+        job.refresh_from_db()
+        assert job.status == IngestJob.STATUS_LEASED
+        assert job.leased_by == "worker-b"
+        assert job.last_error == ""
+
+    def test_job_is_not_completed_without_its_lease(self, excel_upload):
+        enqueue_ingest(excel_upload)
+        job = lease_next_job("worker-a")
+        IngestJob.objects.filter(pk=job.pk).update(
+            leased_until=timezone.now() - timedelta(seconds=1)
+        )
+        lease_next_job("worker-b")
+
+        assert complete_job(job) is False
+        job.refresh_from_db()
+        assert job.status == IngestJob.STATUS_LEASED
+
+    def test_worker_recycles_after_max_jobs(self, excel_upload_factory, user):
+        for i in range(3):
+            enqueue_ingest(excel_upload_factory(user=user, file_hash=f"hash{i}"))
+
+        with patch("apps.excel_manager.services.job_queue.ingest_upload"):
+            assert run_worker(max_jobs=2, burst=True) == 2
+
+        assert IngestJob.objects.filter(status=IngestJob.STATUS_QUEUED).count() == 1
@@ -0,0 +1,158 @@
+"""Tests for the pluggable workbook parsers."""
+
+import datetime
+import io
+import zipfile
+
+import pytest
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+from apps.excel_manager.services.parsers import (
+    ENGINE_LXML,
+    ENGINE_OPENPYXL,
+    ENGINE_XLS,
+    MAX_COLUMNS,
+    MAX_ROWS,
+    LxmlXlsxParser,
+    OpenpyxlParser,
+    choose_engine,
+    is_bogus_dimension,
+)
+
+
+def workbook_bytes(wb):
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def mixed_workbook():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    ws.append(["Id", "Price", "Active", "When", "Note"])
+    ws.append([1, 9.5, True, datetime.datetime(2024, 3, 1, 12, 30), "first"])
+    ws.append([2, 1e-7, False, datetime.date(1999, 12, 31), None])
+    # Leaves row 4 and column C of row 5 unwritten
+    ws["A5"] = 3
+    ws["D5"] = datetime.time(8, 15)
+    ws["E5"] = "last"
+    wb.create_sheet("Empty")
+    return workbook_bytes(wb)
+
+
+class TestLxmlXlsxParser:
+
+    def test_rows_match_openpyxl(self, mixed_workbook):
+        with OpenpyxlParser(io.BytesIO(mixed_workbook)) as reference:
+            expected = [list(reference.iter_rows(0)), list(reference.iter_rows(1))]
+
+        with LxmlXlsxParser(io.BytesIO(mixed_workbook)) as parser:
+            assert parser.sheet_names == ["Data", "Empty"]
+            rows = list(parser.iter_rows(0))
+            assert list(parser.iter_rows(1)) == expected[1]
+
+        # Trailing cells openpyxl pads with None are simply absent
+        assert [list(row) for row in rows] == [
+            list(row[: len(rows[i])]) for i, row in enumerate(expected[0])
+        ]
+        assert rows[1][3] == datetime.datetime(2024, 3, 1, 12, 30)
+        assert rows[3] == ()
+        assert rows[4] == (3, None, None, datetime.time(8, 15), "last")
+
+    def test_1904_date_system(self):
+        wb = Workbook()
+        wb.epoch = datetime.datetime(1904, 1, 1)
+        wb.active.append([datetime.date(2020, 5, 17)])
+
+        with LxmlXlsxParser(io.BytesIO(workbook_bytes(wb))) as parser:
+            assert list(parser.iter_rows(0)) == [(datetime.datetime(2020, 5, 17),)]
+
+    def test_inline_and_rich_strings(self):
+        sheet = (
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            '<sheetData><row r="1">'
+            '<c r="A1" t="inlineStr"><is><t>inline</t></is></c>'
+            '<c r="B1" t="s"><v>0</v></c>'
+            '<c r="C1" t="str"><v>formula</v></c>'
+            '<c r="D1" t="e"><v>#DIV/0!</v></c>'
+            "</row></sheetData></worksheet>"
+        )
+        shared = (
+            '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            "<si><r><t>rich </t></r><r><t>text</t></r><rPh><t>x</t></rPh></si></sst>"
+        )
+        wb = Workbook()
+        wb.active.append(["placeholder"])
+        source = io.BytesIO(workbook_bytes(wb))
+        # Swap in a hand-written sheet using cell types openpyxl never writes
+        patched = io.BytesIO()
+        with zipfile.ZipFile(source) as zin, zipfile.ZipFile(patched, "w") as zout:
+            for item in zin.infolist():
+                if item.filename == "xl/worksheets/sheet1.xml":
+                    zout.writestr(item, sheet)
+                else:
+                    zout.writestr(item, zin.read(item))
+            # openpyxl writes inline strings, so add a shared string table
+            zout.writestr("xl/sharedStrings.xml", shared)
+
+        with LxmlXlsxParser(patched) as parser:
+            assert list(parser.iter_rows(0)) == [
+                ("inline", "rich text", "formula", "#DIV/0!")
+            ]
+
+
+@pytest.fixture
+def whole_column_formatting():
+    """A two-row sheet whose formatting reaches the last row and column."""
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Name", None, "Score"])
+    ws.append(["a", None, 1])
+    ws.cell(row=MAX_ROWS, column=MAX_COLUMNS).font = Font(bold=True)
+    ws.cell(row=40, column=2).font = Font(bold=True)
+    return workbook_bytes(wb)
+
+
+class TestBogusDimensions:
+
+    def test_dimension_at_sheet_limits_is_bogus(self):
+        assert is_bogus_dimension("A1:XFD1048576")
+        assert is_bogus_dimension("A1:AMJ1048576")
+        assert not is_bogus_dimension("A1:F200")
+        assert not is_bogus_dimension(None)
+
+    def test_used_range_ignores_styled_empty_cells(self, whole_column_formatting):
+        with LxmlXlsxParser(io.BytesIO(whole_column_formatting)) as parser:
+            assert parser.sheet_dimension(0) == "A1:XFD1048576"
+            assert parser.used_range(0) == (2, 3)
+
+    @pytest.mark.parametrize("parser_class", [OpenpyxlParser, LxmlXlsxParser])
+    def test_rows_are_trimmed_to_used_range(
+        self, whole_column_formatting, parser_class
+    ):
+        with parser_class(io.BytesIO(whole_column_formatting)) as parser:
+            rows = list(parser.iter_rows(0))
+
+        assert rows == [("Name", None, "Score"), ("a", None, 1)]
+
+
+class TestChooseEngine:
+
+    def test_xls_always_uses_biff_engine(self):
+        assert choose_engine("legacy.XLS", 10, preferred=ENGINE_LXML) == ENGINE_XLS
+
+    def test_auto_picks_lxml_for_large_files(self):
+        assert choose_engine("a.xlsx", 999, lxml_min_bytes=1000) == ENGINE_OPENPYXL
+        assert choose_engine("a.xlsx", 1000, lxml_min_bytes=1000) == ENGINE_LXML
+
+    def test_preferred_engine_wins_for_xlsx(self):
+        assert choose_engine("a.xlsx", 10**9, preferred=ENGINE_OPENPYXL) == (
+            ENGINE_OPENPYXL
+        )
+
+    def test_unknown_engine_is_rejected(self):
+        with pytest.raises(ValueError):
+            choose_engine("a.xlsx", 1, preferred="calamine")
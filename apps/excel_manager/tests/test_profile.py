@@ -0,0 +1,81 @@
+"""Tests for per-column profiles computed at ingest."""
+
+import numpy as np
+import pytest
+
+from apps.excel_manager.services.profile import ColumnProfiler, HyperLogLog
+
+
+def profile_rows(rows, headers, batch_size=3):
+    profiler = ColumnProfiler(batch_size)
+    for row in rows:
+        profiler.write(row)
+    return profiler.profile(headers)
+
+
+class TestHyperLogLog:
+
+    def test_small_counts_are_exact(self):
+        hll = HyperLogLog()
+        hll.add_strings(["a", "b", "c"])
+        hll.add_numbers(np.array([1.0, 2.0, 1.0]))
+
+        assert hll.estimate() == 5
+
+    def test_large_counts_are_close(self):
+        hll = HyperLogLog()
+        hll.add_numbers(np.arange(100_000, dtype=np.float64))
+        hll.add_strings(f"id-{i}" for i in range(50_000))
+
+        assert hll.estimate() == pytest.approx(150_000, rel=0.05)
+
+
+class TestColumnProfiler:
+
+    def test_numeric_statistics_span_batches(self):
+        values = [3, 1.5, None, 7, 2, 10, ""]
+
+        (price,) = profile_rows([[v] for v in values], ["Price"])
+
+        present = np.array([3, 1.5, 7, 2, 10])
+        assert price["count"] == 5
+        assert price["null_count"] == 2
+        assert price["distinct"] == 5
+        assert (price["min"], price["max"]) == (1.5, 10)
+        assert price["mean"] == pytest.approx(present.mean())
+        assert price["stddev"] == pytest.approx(present.std(), abs=1e-6)
+        assert price["length_histogram"] == []
+
+    def test_text_statistics(self):
+        values = ["b", "apple", "b", "cherry pie", "b", "apple"]
+
+        (fruit,) = profile_rows([[v] for v in values], ["Fruit"])
+
+        assert fruit["distinct"] == 3
+        assert (fruit["min"], fruit["max"]) == ("apple", "cherry pie")
+        assert fruit["mean"] is None
+        assert fruit["top_values"][:2] == [["b", 3], ["apple", 2]]
+        assert fruit["length_histogram"] == [
+            {"min_length": 1, "max_length": 1, "count": 3},
+            {"min_length": 4, "max_length": 7, "count": 2},
+            {"min_length": 8, "max_length": 15, "count": 1},
+        ]
+
+    def test_top_values_stay_bounded(self):
+        rows = [["hot"] if i % 2 else [f"cold-{i}"] for i in range(2000)]
+
+        (column,) = profile_rows(rows, ["Key"], batch_size=500)
+
+        assert column["top_values"][0][0] == "hot"
+        assert column["distinct"] == pytest.approx(1001, rel=0.05)
+
+    def test_late_and_missing_columns_count_as_empty(self):
+        rows = [["a"], ["b"], ["c", 1], ["d", 2]]
+
+        profile = profile_rows(rows, ["First", "Second", "Third"], batch_size=2)
+
+        assert [c["name"] for c in profile] == ["First", "Second", "Third"]
+        assert profile[1]["null_count"] == 2
+        assert (profile[1]["min"], profile[1]["max"]) == (1, 2)
+        assert profile[2]["null_count"] == 4
+        assert profile[2]["distinct"] == 0
@@ -0,0 +1,154 @@
+"""Tests for search across uploads."""
+
+from io import StringIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+
+from apps.excel_manager.models import ExcelSearchRow, ExcelUpload
+from apps.excel_manager.services.ingestion import write_sheet
+from apps.excel_manager.services.search import (
+    clear_search_index,
+    count_unindexed_sheets,
+    search_cells,
+)
+
+from .test_ingestion import build_workbook
+
+
+@pytest.fixture(autouse=True)
+def eager_sheets(settings):
+    settings.EXCEL_CONFIG = {**settings.EXCEL_CONFIG, "INGEST_LAZY_SHEETS": False}
+
+
+def upload_rows(client, rows, headers=("SKU", "Customer")):
+    return upload_file(client, build_workbook(rows, headers))
+
+
+def upload_file(client, file):
+    client.post(reverse("excel_manager:upload"), {"file": file})
+    return ExcelUpload.objects.latest("pk")
+
+
+@pytest.mark.django_db
+class TestSearchCells:
+
+    def test_hits_point_at_upload_sheet_row_and_column(
+        self, authenticated_client, user
+    ):
+        upload = upload_rows(
+            authenticated_client,
+            [("AB-1001", "Acme Corp"), ("AB-2002", "Globex"), ("CD-3003", "acme")],
+        )
+
+        hits, has_next = search_cells(user, "acme")
+
+        assert not has_next
+        assert [(hit.upload, hit.row_index) for hit in hits] == [
+            (upload, 0),
+            (upload, 2),
+        ]
+        assert hits[0].sheet.sheet_name == "Sheet"
+        assert hits[0].cells == [("Customer", "Acme Corp")]
+
+    def test_words_match_by_prefix_and_all_terms_are_required(
+        self, authenticated_client, user
+    ):
+        upload_rows(
+            authenticated_client,
+            [("AB-1001", "Acme Corp"), ("AB-2002", "Acme Inc"), ("XY-9", "Corp")],
+        )
+
+        hits, _ = search_cells(user, "ab-100")
+        assert [hit.row_index for hit in hits] == [0]
+
+        hits, _ = search_cells(user, "corp acme")
+        assert [hit.row_index for hit in hits] == [0]
+
+    def test_results_are_scoped_to_the_user(
+        self, authenticated_client, user, other_user
+    ):
+        upload_rows(authenticated_client, [("AB-1", "Shared Customer")])
+        authenticated_client.force_login(other_user)
+        upload_rows(authenticated_client, [("ZZ-9", "Shared Customer")])
+
+        hits, _ = search_cells(user, "shared")
+
+        assert [hit.upload.user for hit in hits] == [user]
+        assert len(search_cells(other_user, "shared")[0]) == 1
+
+    def test_shared_blob_hits_use_the_users_own_upload(
+        self, authenticated_client, user, other_user
+    ):
+        # Workbooks are timestamped, so build the bytes once to share a blob
+        content = build_workbook([("AB-1", "Initech")]).read()
+        first = upload_file(
+            authenticated_client, SimpleUploadedFile("rows.xlsx", content)
+        )
+        authenticated_client.force_login(other_user)
+        second = upload_file(
+            authenticated_client, SimpleUploadedFile("rows.xlsx", content)
+        )
+        assert first.blob_id == second.blob_id
+
+        hits, _ = search_cells(other_user, "initech")
+
+        assert [hit.upload for hit in hits] == [second]
+
+    def test_results_are_paginated(self, authenticated_client, user):
+        upload_rows(authenticated_client, [(f"AB-{i}", "Acme") for i in range(5)])
+
+        first, has_next = search_cells(user, "acme", page=1, page_size=2)
+        last, has_more = search_cells(user, "acme", page=3, page_size=2)
+
+        assert [hit.row_index for hit in first] == [0, 1]
+        assert has_next
+        assert [hit.row_index for hit in last] == [4]
+        assert not has_more
+
+    def test_reparsing_replaces_the_index(self, authenticated_client, user):
+        upload = upload_rows(authenticated_client, [("AB-1", "Acme")])
+        sheet = upload.get_sheets().get()
+
+        write_sheet(sheet, iter([("SKU", "Customer"), ("AB-1", "Umbrella")]))
+
+        assert ExcelSearchRow.objects.filter(sheet=sheet).count() == 1
+        assert search_cells(user, "acme") == ([], False)
+        assert len(search_cells(user, "umbrella")[0]) == 1
+
+    def test_sheets_parsed_before_search_are_backfilled(
+        self, authenticated_client, user
+    ):
+        upload = upload_rows(authenticated_client, [("AB-1", "Acme")])
+        upload_rows(authenticated_client, [], headers=("Empty",))
+        # As stored before search existed
+        clear_search_index(upload.get_sheets().get())
+        assert count_unindexed_sheets(user) == 1
+        assert search_cells(user, "acme") == ([], False)
+
+        call_command("index_sheets", stdout=StringIO())
+
+        assert count_unindexed_sheets(user) == 0
+        assert len(search_cells(user, "acme")[0]) == 1
+
+
+@pytest.mark.django_db
+class TestSearchView:
+
+    def test_search_requires_login(self, client):
+        response = client.get(reverse("excel_manager:search"), {"q": "acme"})
+        assert response.status_code == 302
+
+    def test_results_link_to_the_matching_row(self, authenticated_client):
+        upload = upload_rows(authenticated_client, [("AB-1", "x"), ("AB-2", "Acme")])
+
+        response = authenticated_client.get(
+            reverse("excel_manager:search"), {"q": "acme"}, HTTP_HX_REQUEST="true"
+        )
+
+        assert response.status_code == 200
+        assert b"<html" not in response.content
+        detail_url = reverse("excel_manager:detail", kwargs={"pk": upload.pk})
+        assert f"{detail_url}?sheet=0&row=1".encode() in response.content
@@ -0,0 +1,54 @@
+"""Tests for the single-pass upload handler."""
+
+import hashlib
+
+import pytest
+from django.test import RequestFactory
+
+from apps.excel_manager.forms import ExcelUploadForm
+from apps.excel_manager.upload_handlers import (
+    MAGIC_HEADER_BYTES,
+    SinglePassUploadHandler,
+)
+
+
+def stream_through_handler(content, chunk_size=1024):
+    """Feed content to the handler in chunks, like MultiPartParser does."""
+    handler = SinglePassUploadHandler(RequestFactory().post("/"))
+    handler.new_file("file", "data.xlsx", "application/octet-stream", len(content))
+    for start in range(0, len(content), chunk_size):
+        handler.receive_data_chunk(content[start : start + chunk_size], start)
+    return handler.file_complete(len(content))
+
+
+class TestSinglePassUploadHandler:
+
+    def test_hash_and_header_captured_while_streaming(self):
+        content = b"PK\x03\x04" + bytes(range(256)) * 100
+
+        uploaded = stream_through_handler(content)
+
+        assert uploaded.sha256 == hashlib.sha256(content).hexdigest()
+        assert uploaded.magic_header == content[:MAGIC_HEADER_BYTES]
+        assert uploaded.has_macros is False
+        # Content is spooled to disk so storage can move it into place
+        with open(uploaded.temporary_file_path(), "rb") as f:
+            assert f.read() == content
+
+    def test_macro_signature_split_across_chunks(self):
+        content = b"x" * 1020 + b"xl/vbaProject.bin" + b"y" * 2000
+
+        uploaded = stream_through_handler(content, chunk_size=1024)
+
+        assert uploaded.has_macros is True
+
+    @pytest.mark.django_db
+    def test_form_rejects_macros_beyond_first_kilobyte(self, excel_file):
+        excel_file.magic_header = excel_file.read(MAGIC_HEADER_BYTES)
+        excel_file.seek(0)
+        excel_file.has_macros = True
+
+        form = ExcelUploadForm(files={"file": excel_file})
+
+        assert not form.is_valid()
+        assert "macros are not allowed" in str(form.errors["file"])
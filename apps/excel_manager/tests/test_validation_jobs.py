@@ -0,0 +1,213 @@
+"""Tests for background AI validation jobs."""
+
+import json
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from apps.excel_manager.models import ExcelData, ValidationJob
+from apps.excel_manager.services.validation_jobs import (
+    ValidationLimitError,
+    enqueue_validation,
+    lease_next_validation,
+    run_validation_job,
+    run_validation_worker,
+)
+
+from .helpers import set_rows
+
+AI_RESPONSE = {
+    "success": True,
+    "content": json.dumps(
+        {
+            "valid_rows": 2,
+            "warning_rows": 0,
+            "error_rows": 0,
+            "issues": [],
+            "summary": "Background validation result",
+            "suggestions": [],
+            "severity": "low",
+        }
+    ),
+    "usage": {"input_tokens": 10, "output_tokens": 5},
+}
+
+
+@pytest.fixture(autouse=True)
+def background_validation(settings):
+    settings.AI_CONFIG = {**settings.AI_CONFIG, "ENABLED": True}
+    settings.EXCEL_CONFIG = {
+        **settings.EXCEL_CONFIG,
+        "VALIDATION_EAGER": False,
+        "VALIDATION_MAX_PER_USER": 2,
+    }
+
+
+@pytest.fixture
+def ai_service():
+    with patch("apps.excel_manager.services.validation.AIService") as service:
+        service.return_value.send_messages.return_value = [AI_RESPONSE]
+        yield service.return_value
+
+
+def add_sheet(upload):
+    sheet = ExcelData.objects.create(
+        upload=upload, sheet_name="Sheet1", sheet_index=0, headers=["Name"]
+    )
+    set_rows(sheet, [["Ada"], ["Grace"]])
+    return upload
+
+
+@pytest.mark.django_db
+class TestEnqueueValidation:
+
+    def test_repeated_requests_share_the_active_job(self, excel_upload):
+        assert enqueue_validation(excel_upload) == enqueue_validation(excel_upload)
+
+    def test_users_are_limited_to_a_few_jobs_in_progress(
+        self, user, excel_upload_factory
+    ):
+        uploads = [
+            excel_upload_factory(user=user, file_hash=f"hash-{i}") for i in range(3)
+        ]
+        enqueue_validation(uploads[0])
+        enqueue_validation(uploads[1])
+
+        with pytest.raises(ValidationLimitError):
+            enqueue_validation(uploads[2])
+
+    def test_stale_leases_are_retried_then_failed(self, excel_upload):
+        job = enqueue_validation(excel_upload)
+        assert lease_next_validation("a", lease_seconds=-1) == job
+
+        # The first worker died; another one picks the job up again
+        retried = lease_next_validation("b", lease_seconds=-1)
+        assert (retried, retried.attempts) == (job, 2)
+
+        assert lease_next_validation("c") is None
+        job.refresh_from_db()
+        assert job.status == ValidationJob.STATUS_FAILED
+        assert "stopped responding" in job.error
+
+
+@pytest.mark.django_db
+class TestValidationViews:
+
+    def test_post_returns_a_polling_placeholder(
+        self, authenticated_client, excel_upload_with_data, ai_service
+    ):
+        url = reverse(
+            "excel_manager:validate_ai", kwargs={"pk": excel_upload_with_data.pk}
+        )
+
+        response = authenticated_client.post(url)
+
+        job = ValidationJob.objects.get()
+        status_url = reverse(
+            "excel_manager:validate_ai_status",
+            kwargs={"pk": excel_upload_with_data.pk, "job_pk": job.pk},
+        )
+        assert response.status_code == 202
+        assert status_url.encode() in response.content
+        assert job.status == ValidationJob.STATUS_QUEUED
+        ai_service.send_messages.assert_not_called()
+
+    def test_poll_returns_the_result_once_the_worker_is_done(
+        self, authenticated_client, excel_upload_with_data, ai_service
+    ):
+        job = enqueue_validation(excel_upload_with_data)
+        status_url = reverse(
+            "excel_manager:validate_ai_status",
+            kwargs={"pk": excel_upload_with_data.pk, "job_pk": job.pk},
+        )
+        assert authenticated_client.get(status_url).status_code == 202
+
+        run_validation_job(job)
+        response = authenticated_client.get(status_url)
+
+        assert response.status_code == 200
+        assert b"Background validation result" in response.content
+
+    def test_failed_jobs_end_polling_with_the_error(
+        self, authenticated_client, excel_upload
+    ):
+        job = enqueue_validation(excel_upload)
+        run_validation_job(job)
+        status_url = reverse(
+            "excel_manager:validate_ai_status",
+            kwargs={"pk": excel_upload.pk, "job_pk": job.pk},
+        )
+
+        response = authenticated_client.get(status_url)
+
+        assert response.status_code == 200
+        assert b"No data to validate" in response.content
+
+    def test_jobs_of_other_users_are_not_visible(
+        self, authenticated_client, other_user, excel_upload_factory
+    ):
+        job = enqueue_validation(excel_upload_factory(user=other_user))
+        status_url = reverse(
+            "excel_manager:validate_ai_status",
+            kwargs={"pk": job.excel_upload_id, "job_pk": job.pk},
+        )
+
+        assert authenticated_client.get(status_url).status_code == 404
+
+    def test_limit_is_reported(
+        self, authenticated_client, user, excel_upload_factory, settings
+    ):
+        settings.EXCEL_CONFIG = {**settings.EXCEL_CONFIG, "VALIDATION_MAX_PER_USER": 1}
+        enqueue_validation(excel_upload_factory(user=user, file_hash="busy"))
+        upload = excel_upload_factory(user=user, file_hash="next")
+
+        response = authenticated_client.post(
+            reverse("excel_manager:validate_ai", kwargs={"pk": upload.pk})
+        )
+
+        assert response.status_code == 429
+        assert b"validation in progress" in response.content
+
+    def test_detail_page_resumes_polling(
+        self, authenticated_client, excel_upload_with_data
+    ):
+        job = enqueue_validation(excel_upload_with_data)
+
+        response = authenticated_client.get(
+            reverse("excel_manager:detail", kwargs={"pk": excel_upload_with_data.pk})
+        )
+
+        assert response.context["validation_job"] == job
+        assert b'hx-trigger="every 2s"' in response.content
+
+
+# Jobs run in worker threads, which need committed data. SQLite's shared
+# in-memory database locks tables across threads, so run one at a time.
+@pytest.mark.django_db(transaction=True)
+def test_worker_runs_every_queued_job(user, excel_upload_factory, ai_service):
+    uploads = [
+        add_sheet(excel_upload_factory(user=user, file_hash=f"hash-{i}"))
+        for i in range(2)
+    ]
+    jobs = [enqueue_validation(upload) for upload in uploads]
+
+    processed = run_validation_worker(concurrency=1, burst=True, poll_interval=0.01)
+
+    assert processed == 2
+    for job in jobs:
+        job.refresh_from_db()
+        assert job.status == ValidationJob.STATUS_DONE
+        assert job.validation.summary == "Background validation result"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_command_closes_pooled_clients_on_exit(ai_service):
+    with patch(
+        "apps.excel_manager.management.commands.run_validation_workers.close_clients"
+    ) as close_clients:
+        call_command("run_validation_workers", "--burst", stdout=StringIO())
+
+    close_clients.assert_called_once_with()
@@ -1,7 +1,14 @@
+from unittest.mock import patch
+
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import urlencode
 from apps.excel_manager.models import ExcelUpload, ExcelData
 
+from .helpers import set_rows
+
 
 @pytest.mark.django_db
 class TestExcelUpload:
@@ -38,12 +45,16 @@ class TestExcelUpload:
         assert upload.status == ExcelUpload.STATUS_COMPLETED
         assert upload.sheet_count == 2
 
-        # Check sheets were parsed
+        # Check sheets were listed; rows are parsed on first view
         assert ExcelData.objects.count() == 2
         sheet1 = ExcelData.objects.get(sheet_index=0)
         assert sheet1.sheet_name == "Sheet1"
-        assert len(sheet1.row_data["headers"]) == 4
-        assert len(sheet1.row_data["rows"]) == 3
+        assert sheet1.dimension == "A1:D4"
+        assert not sheet1.is_parsed
+
+        sheet1.ensure_parsed()
+        assert len(sheet1.headers) == 4
+        assert sheet1.row_count == 3
 
     def test_file_size_limit(self, authenticated_client):
         """Test that files over 5MB are rejected."""
@@ -167,6 +178,24 @@ class TestExcelUpload:
         # Sheet2 data should be in response
         assert b"Product" in response.content or b"Price" in response.content
 
+    def test_detail_view_loads_content_of_active_sheet_only(
+        self, authenticated_client, excel_file
+    ):
+        """Test that sheet tabs are built from metadata only."""
+        authenticated_client.post(reverse("excel_manager:upload"), {"file": excel_file})
+        upload = ExcelUpload.objects.first()
+
+        detail_url = reverse("excel_manager:detail", kwargs={"pk": upload.pk})
+        response = authenticated_client.get(detail_url + "?sheet=1")
+
+        tabs = response.context["sheets"]
+        assert [tab.sheet_name for tab in tabs] == ["Sheet1", "Sheet2"]
+        assert all("string_pool" in tab.get_deferred_fields() for tab in tabs)
+        current_sheet = response.context["current_sheet"]
+        assert current_sheet.sheet_index == 1
+        assert not current_sheet.get_deferred_fields()
+        assert current_sheet.headers
+
     def test_upload_form_has_error_display_structure(self, authenticated_client):
         """Test that upload form includes error display structure for client-side validation."""
         url = reverse("excel_manager:index")
@@ -207,3 +236,196 @@ class TestExcelUpload:
                 b"error" in response.content.lower()
                 or b"5mb" in response.content.lower()
             )
+
+
+@pytest.fixture
+def long_sheet(excel_upload):
+    """A parsed sheet with 1200 rows spread over three chunks."""
+    sheet = ExcelData.objects.create(
+        upload=excel_upload, sheet_name="Long", sheet_index=0, headers=["N", "Sq"]
+    )
+    set_rows(sheet, [[i, i * i] for i in range(1200)])
+    return sheet
+
+
+@pytest.mark.django_db
+class TestSheetTableWindows:
+
+    def sheet_url(self, upload, **params):
+        url = reverse(
+            "excel_manager:sheet_data", kwargs={"pk": upload.pk, "sheet_index": 0}
+        )
+        return f"{url}?{urlencode(params)}"
+
+    def test_rows_window_is_read_without_offset(
+        self, authenticated_client, excel_upload, long_sheet
+    ):
+        url = self.sheet_url(excel_upload, part="rows", cursor=1050, limit=100)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get(url)
+
+        assert [row[0] for row in response.context["rows"]] == list(range(1050, 1150))
+        assert b"<thead" not in response.content
+        assert b'hx-trigger="revealed"' in response.content
+        assert "cursor=1150" in response.context["next_url"]
+        assert not any("OFFSET" in query["sql"] for query in queries)
+        assert response["HX-Replace-Url"] == (
+            reverse("excel_manager:detail", kwargs={"pk": excel_upload.pk})
+            + "?sheet=0&row=1050"
+        )
+
+    def test_last_window_stops_infinite_scroll(
+        self, authenticated_client, excel_upload, long_sheet
+    ):
+        url = self.sheet_url(excel_upload, part="rows", cursor=1150, limit=100)
+
+        response = authenticated_client.get(url)
+
+        assert len(response.context["rows"]) == 50
+        assert response.context["next_url"] is None
+        assert b'hx-trigger="revealed"' not in response.content
+
+    def test_detail_view_restores_position_from_url(
+        self, authenticated_client, excel_upload, long_sheet
+    ):
+        detail_url = reverse("excel_manager:detail", kwargs={"pk": excel_upload.pk})
+
+        response = authenticated_client.get(detail_url + "?sheet=0&row=600")
+
+        assert response.context["rows"][0] == [600, 360000]
+        assert response.context["earlier_url"]
+        assert b"Starting at row 601" in response.content
+
+    def test_wide_sheets_render_a_window_of_columns(
+        self, authenticated_client, excel_upload
+    ):
+        headers = [f"C{i}" for i in range(120)]
+        sheet = ExcelData.objects.create(
+            upload=excel_upload, sheet_name="Wide", sheet_index=0, headers=headers
+        )
+        set_rows(sheet, [list(range(120))])
+
+        response = authenticated_client.get(self.sheet_url(excel_upload, col=100))
+
+        assert [h["name"] for h in response.context["headers"]] == headers[100:]
+        assert response.context["rows"] == [list(range(100, 120))]
+        window = response.context["column_window"]
+        assert (window["first"], window["last"], window["total"]) == (101, 120, 120)
+        assert "col=50" in window["prev_url"]
+        assert window["next_url"] is None
+
+    def test_sorted_and_filtered_window(
+        self, authenticated_client, excel_upload, long_sheet
+    ):
+        url = self.sheet_url(
+            excel_upload, sort=0, order="desc", q="99", qcol=0, limit=3
+        )
+
+        response = authenticated_client.get(url)
+
+        assert [row[0] for row in response.context["rows"]] == [1199, 1099, 999]
+        # 99, 199, ..., 1199 and 990-998
+        assert response.context["total_rows"] == 21
+        assert "sort=0&order=desc&q=99&qcol=0" in response.context["next_url"]
+        headers = response.context["headers"]
+        assert headers[0]["sorted"] == "desc"
+        # A third click on the sorted header clears the sort
+        assert "sort=" not in headers[0]["sort_url"]
+        assert "21 of 1200 rows match" in response.content.decode()
+        assert "q=99" in response["HX-Replace-Url"]
+
+
+@pytest.mark.django_db
+class TestConditionalRequests:
+
+    def test_unchanged_sheet_is_not_re_rendered(
+        self, authenticated_client, excel_upload, long_sheet
+    ):
+        url = reverse(
+            "excel_manager:sheet_data", kwargs={"pk": excel_upload.pk, "sheet_index": 0}
+        )
+        response = authenticated_client.get(url)
+        assert response["Cache-Control"] == "private, no-cache"
+        assert response["Last-Modified"]
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = authenticated_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+        assert cached.status_code == 304
+        assert not any("excelrowchunk" in query["sql"] for query in queries)
+
+    def test_etag_depends_on_the_requested_window(
+        self, authenticated_client, excel_upload, long_sheet
+    ):
+        url = reverse(
+            "excel_manager:sheet_data", kwargs={"pk": excel_upload.pk, "sheet_index": 0}
+        )
+        first = authenticated_client.get(url)
+
+        response = authenticated_client.get(
+            url + "?cursor=100", HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+
+        assert response.status_code == 200
+        assert response["ETag"] != first["ETag"]
+
+    def test_unparsed_sheets_have_no_etag(self, authenticated_client, excel_upload):
+        ExcelData.objects.create(upload=excel_upload, sheet_name="Stub", sheet_index=0)
+        url = reverse(
+            "excel_manager:sheet_data", kwargs={"pk": excel_upload.pk, "sheet_index": 0}
+        )
+
+        response = authenticated_client.get(url)
+
+        assert not response.has_header("ETag")
+
+    def test_detail_etag_changes_with_ai_validation(
+        self, authenticated_client, excel_upload, long_sheet
+    ):
+        from apps.excel_manager.models import AIValidation
+
+        url = reverse("excel_manager:detail", kwargs={"pk": excel_upload.pk})
+        # The first visit sets the CSRF cookie the page embeds
+        authenticated_client.get(url)
+        etag = authenticated_client.get(url)["ETag"]
+
+        assert authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        AIValidation.objects.create(excel_upload=excel_upload, validation_result={})
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+    def test_detail_etag_describes_the_rendered_sheet(
+        self, authenticated_client, excel_upload, long_sheet
+    ):
+        other = ExcelData.objects.create(
+            upload=excel_upload, sheet_name="Other", sheet_index=1, headers=["A"]
+        )
+        set_rows(other, [["x"]])
+        url = reverse("excel_manager:detail", kwargs={"pk": excel_upload.pk})
+        authenticated_client.get(url)
+
+        response = authenticated_client.get(url + "?sheet=-1")
+        etag = response["ETag"]
+        assert response.context["current_sheet"].pk == long_sheet.pk
+
+        # Re-parsing the rendered sheet must invalidate the page
+        set_rows(long_sheet, [[1, 1]])
+        response = authenticated_client.get(url + "?sheet=-1", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+
+    def test_detail_page_of_a_lazy_stub_has_no_etag(
+        self, authenticated_client, excel_upload
+    ):
+        ExcelData.objects.create(upload=excel_upload, sheet_name="Stub", sheet_index=0)
+        url = reverse("excel_manager:detail", kwargs={"pk": excel_upload.pk})
+
+        with patch(
+            "apps.excel_manager.views.render_sheet_table", return_value=("", {})
+        ):
+            response = authenticated_client.get(url)
+
+        assert not response.has_header("ETag")
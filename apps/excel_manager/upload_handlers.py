@@ -0,0 +1,58 @@
+"""Upload handlers that inspect files while they stream in."""
+
+import hashlib
+
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+# Enough of the ZIP central entries for libmagic to tell .xlsx from .zip
+MAGIC_HEADER_BYTES = 8192
+
+# Markers of embedded VBA projects in .xlsm/.xls content
+MACRO_SIGNATURES = (b"vbaProject", b"_VBA_PROJECT")
+
+
+class SinglePassUploadHandler(TemporaryFileUploadHandler):
+    """Hash, sniff and spool an upload to disk in a single read.
+
+    Django hands every chunk to this handler exactly once as it arrives. The
+    chunk is fed to SHA-256, the first bytes are kept for libmagic, the data
+    is scanned for macro signatures and then written to the temporary file.
+    The results are attached to the uploaded file object:
+
+    - ``sha256``: hex digest of the full content
+    - ``magic_header``: the first MAGIC_HEADER_BYTES bytes
+    - ``has_macros``: True if a VBA signature appeared anywhere in the file
+
+    Because the file lands on disk, FileSystemStorage moves it into MEDIA_ROOT
+    instead of copying it.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.magic_header = bytearray()
+        self.has_macros = False
+        # Tail of the previous chunk, so signatures split across chunks match
+        self._overlap = b""
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+
+        missing = MAGIC_HEADER_BYTES - len(self.magic_header)
+        if missing > 0:
+            self.magic_header += raw_data[:missing]
+
+        if not self.has_macros:
+            window = self._overlap + raw_data
+            self.has_macros = any(sig in window for sig in MACRO_SIGNATURES)
+            keep = max(len(sig) for sig in MACRO_SIGNATURES) - 1
+            self._overlap = raw_data[-keep:]
+
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.sha256.hexdigest()
+        file.magic_header = bytes(self.magic_header)
+        file.has_macros = self.has_macros
+        return file
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -8,6 +9,10 @@ urlpatterns = [
     path("", views.ExcelManagerView.as_view(), name="index"),
     # HTMX upload endpoint
     path("upload/", views.ExcelUploadView.as_view(), name="upload"),
+    # Search across all of the user's uploads
+    path("search/", views.ExcelSearchView.as_view(), name="search"),
+    # HTMX partial for polling ingestion status
+    path("files/", views.file_list_partial, name="file_list"),
     # Detail view for specific Excel file
     path("<int:pk>/", views.ExcelDetailView.as_view(), name="detail"),
     # HTMX partial for sheet switching
@@ -19,9 +24,18 @@ urlpatterns = [
     # AI validation endpoint (HTMX)
     path(
         "<int:pk>/validate-ai/",
-        views.ValidateWithAIView.as_view(),
+        (
+            views.AsyncValidateWithAIView
+            if settings.EXCEL_CONFIG["VALIDATION_ASYNC"]
+            else views.ValidateWithAIView
+        ).as_view(),
         name="validate_ai",
     ),
+    path(
+        "<int:pk>/validate-ai/<int:job_pk>/",
+        views.ValidationJobStatusView.as_view(),
+        name="validate_ai_status",
+    ),
     # Delete endpoint (HTMX)
     path(
         "<int:pk>/delete/",
@@ -1,22 +1,74 @@
 import hashlib
-import json
-import time
 from datetime import timedelta
-import openpyxl
+from functools import partial
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.views import redirect_to_login
 from django.db import transaction
 from django.http import HttpResponse
-from django.shortcuts import render, get_object_or_404, redirect
-from django.urls import reverse_lazy
+from django.shortcuts import aget_object_or_404, render, get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
 from django.views import View
+from django.views.decorators.http import condition
 from django.views.generic import TemplateView, FormView, DetailView
 
-from apps.core.services.ai_service import AIService
 from .forms import ExcelUploadForm
-from .models import ExcelUpload, ExcelData, AIValidation
+from .models import ExcelUpload, ValidationJob
+from .services.blob_store import acquire_blob, release_blob
+from .services.columnar import delete_columnar, ensure_columnar
+from .services.fragment_cache import fragment_key, get_or_render, invalidate_upload
+from .services.ingestion import ingest_upload
+from .services.job_queue import enqueue_ingest, get_worker_id
+from .services.search import count_unindexed_sheets, search_cells
+from .services.validation import avalidate_excel_with_ai
+from .services.validation_jobs import (
+    LeaseLostError,
+    ValidationLimitError,
+    enqueue_validation,
+    finish_validation_job,
+    get_active_job,
+    renew_lease,
+    run_validation_job,
+    start_validation,
+)
+
+# Rows rendered per window of the sheet table
+TABLE_PREVIEW_ROWS = 100
+TABLE_MAX_PAGE_ROWS = 500
+# Columns rendered at once; wider sheets page through their columns
+TABLE_COLUMN_WINDOW = 50
+TABLE_MAX_FILTER_LENGTH = 200
+# Part of every sheet ETag; bump when the table markup changes so browsers
+# stop revalidating copies rendered by the old templates
+TABLE_TEMPLATE_VERSION = "1"
+
+# Templates can touch the database; render them off the event loop
+arender = sync_to_async(render)
+
+
+def get_file_list_context(user):
+    """Build the context for the _file_list.html partial.
+
+    The list polls for updates while any upload is still waiting for or
+    running through background ingestion.
+    """
+    uploads = list(ExcelUpload.objects.filter(user=user).select_related("user")[:10])
+    return {
+        "uploads": uploads,
+        "poll_for_updates": any(
+            upload.status
+            in (ExcelUpload.STATUS_PENDING, ExcelUpload.STATUS_PROCESSING)
+            for upload in uploads
+        ),
+    }
 
 
 class ExcelManagerView(LoginRequiredMixin, TemplateView):
@@ -28,9 +80,7 @@ class ExcelManagerView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         context["title"] = "Excel Manager"
         context["form"] = ExcelUploadForm()
-        context["uploads"] = ExcelUpload.objects.filter(
-            user=self.request.user
-        ).select_related("user")[:10]
+        context.update(get_file_list_context(self.request.user))
         return context
 
 
@@ -45,12 +95,14 @@ class ExcelUploadView(LoginRequiredMixin, FormView):
         """Handle successful form submission."""
         excel_file = form.cleaned_data["file"]
 
-        # Calculate file hash for duplicate detection
-        sha256_hash = hashlib.sha256()
-        for chunk in excel_file.chunks():
-            sha256_hash.update(chunk)
-        file_hash = sha256_hash.hexdigest()
-        excel_file.seek(0)
+        # Hash for duplicate detection, computed by SinglePassUploadHandler
+        file_hash = getattr(excel_file, "sha256", None)
+        if file_hash is None:
+            sha256_hash = hashlib.sha256()
+            for chunk in excel_file.chunks():
+                sha256_hash.update(chunk)
+            file_hash = sha256_hash.hexdigest()
+            excel_file.seek(0)
 
         # Check for duplicates
         existing_upload = ExcelUpload.objects.filter(
@@ -73,36 +125,42 @@ class ExcelUploadView(LoginRequiredMixin, FormView):
             messages.warning(self.request, "This file has already been uploaded.")
             return super().form_valid(form)
 
+        upload = None
         try:
             with transaction.atomic():
-                # Create ExcelUpload record
+                # Identical content is stored once and shared across users
+                blob = acquire_blob(excel_file, file_hash)
                 upload = ExcelUpload.objects.create(
                     user=self.request.user,
-                    file=excel_file,
+                    blob=blob,
+                    file=blob.file.name,
                     original_filename=excel_file.name,
                     file_hash=file_hash,
                     file_size=excel_file.size,
-                    status=ExcelUpload.STATUS_PROCESSING,
+                    status=ExcelUpload.STATUS_PENDING,
                 )
 
-                # Process Excel file synchronously (MVP)
-                self.process_excel_file(upload)
-
-                # Mark as completed
-                upload.status = ExcelUpload.STATUS_COMPLETED
-                from django.utils import timezone
-
-                upload.processed_at = timezone.now()
-                upload.save()
+                if blob.is_parsed:
+                    # Already parsed for someone else: metadata insert only
+                    upload.sheet_count = blob.sheet_count
+                    upload.status = ExcelUpload.STATUS_COMPLETED
+                    upload.processed_at = timezone.now()
+                    upload.save()
+                elif not settings.EXCEL_CONFIG["INGEST_EAGER"]:
+                    enqueue_ingest(upload)
+
+            if upload.status == ExcelUpload.STATUS_COMPLETED:
+                success_message = "Excel file uploaded successfully!"
+            elif settings.EXCEL_CONFIG["INGEST_EAGER"]:
+                ingest_upload(upload)
+                success_message = "Excel file uploaded successfully!"
+            else:
+                success_message = "Excel file uploaded! Processing in the background..."
 
             # Return success response for HTMX
             if hasattr(self.request, "htmx") and self.request.htmx:
-                context = {
-                    "uploads": ExcelUpload.objects.filter(
-                        user=self.request.user
-                    ).select_related("user")[:10],
-                    "success_message": "Excel file uploaded successfully!",
-                }
+                context = get_file_list_context(self.request.user)
+                context["success_message"] = success_message
                 response = render(
                     self.request, "excel_manager/partials/_file_list.html", context
                 )
@@ -110,12 +168,12 @@ class ExcelUploadView(LoginRequiredMixin, FormView):
                 response["HX-Trigger"] = "excel-uploaded"
                 return response
 
-            messages.success(self.request, "Excel file uploaded successfully!")
+            messages.success(self.request, success_message)
             return super().form_valid(form)
 
         except Exception as e:
             # Mark as failed
-            if upload:
+            if upload and upload.status != ExcelUpload.STATUS_FAILED:
                 upload.status = ExcelUpload.STATUS_FAILED
                 upload.error_message = str(e)
                 upload.save()
@@ -136,56 +194,6 @@ class ExcelUploadView(LoginRequiredMixin, FormView):
             messages.error(self.request, f"Failed to process file: {str(e)}")
             return self.form_invalid(form)
 
-    def process_excel_file(self, upload):
-        """Process the Excel file and store data."""
-        try:
-            # Load workbook
-            wb = openpyxl.load_workbook(upload.file, data_only=True)
-            sheet_count = len(wb.sheetnames)
-            upload.sheet_count = sheet_count
-            upload.save()
-
-            # Process each sheet
-            for sheet_index, sheet_name in enumerate(wb.sheetnames):
-                sheet = wb[sheet_name]
-
-                # Get headers from first row
-                headers = []
-                first_row = next(
-                    sheet.iter_rows(min_row=1, max_row=1, values_only=True), None
-                )
-                if first_row:
-                    headers = [
-                        str(cell) if cell is not None else f"Column {i+1}"
-                        for i, cell in enumerate(first_row)
-                    ]
-
-                # Get data rows (limit to first 100 for MVP)
-                rows = []
-                for row_idx, row in enumerate(
-                    sheet.iter_rows(min_row=2, max_row=101, values_only=True)
-                ):
-                    if row_idx >= 100:  # Limit to 100 rows
-                        break
-                    # Convert row to list, handling None values
-                    row_data = [str(cell) if cell is not None else "" for cell in row]
-                    # Only add non-empty rows
-                    if any(cell for cell in row_data):
-                        rows.append(row_data)
-
-                # Store sheet data
-                ExcelData.objects.create(
-                    upload=upload,
-                    sheet_name=sheet_name,
-                    sheet_index=sheet_index,
-                    row_data={"headers": headers, "rows": rows},
-                )
-
-            wb.close()
-
-        except Exception as e:
-            raise Exception(f"Error processing Excel file: {str(e)}")
-
     def form_invalid(self, form):
         """Handle form validation errors."""
         if hasattr(self.request, "htmx") and self.request.htmx:
@@ -198,6 +206,328 @@ class ExcelUploadView(LoginRequiredMixin, FormView):
         return super().form_invalid(form)
 
 
+def get_table_params(query, cursor_param="cursor"):
+    """Read the window, sort and filter of the sheet table from a query.
+
+    Invalid or out-of-range values fall back to the defaults.
+    """
+
+    def read_int(name, default, low, high=None):
+        try:
+            value = int(query.get(name, default))
+        except (ValueError, TypeError):
+            return default
+        if value < low:
+            return default
+        return value if high is None else min(value, high)
+
+    return {
+        "cursor": read_int(cursor_param, 0, 0),
+        "limit": read_int("limit", TABLE_PREVIEW_ROWS, 1, TABLE_MAX_PAGE_ROWS),
+        "col": read_int("col", 0, 0),
+        "sort": read_int("sort", None, 0),
+        "order": "desc" if query.get("order") == "desc" else "asc",
+        "q": query.get("q", "").strip()[:TABLE_MAX_FILTER_LENGTH],
+        "qcol": read_int("qcol", None, 0),
+    }
+
+
+def get_requested_sheet(query, sheets):
+    """The entry of ``sheets`` that the query's ``sheet`` index asks for.
+
+    Invalid indexes fall back to the first sheet and out-of-range ones are
+    clamped, so the detail page and its ETag always agree on the sheet.
+    """
+    try:
+        sheet_index = int(query.get("sheet", 0))
+    except (ValueError, TypeError):
+        sheet_index = 0
+    return sheets[min(max(sheet_index, 0), len(sheets) - 1)]
+
+
+def encode_table_params(params):
+    """Drop parameters left at their default to keep URLs short."""
+    defaults = get_table_params({})
+    return {name: value for name, value in params.items() if value != defaults[name]}
+
+
+def get_table_url(upload, sheet, part=None, **params):
+    """URL of the sheet_data partial for a given table window."""
+    url = reverse(
+        "excel_manager:sheet_data",
+        kwargs={"pk": upload.pk, "sheet_index": sheet.sheet_index},
+    )
+    query = {"part": part} if part else {}
+    query.update(encode_table_params(params))
+    return f"{url}?{urlencode(query)}"
+
+
+def get_detail_url(upload, sheet, **params):
+    """Detail page URL that reopens the table at the same window and view."""
+    url = reverse("excel_manager:detail", kwargs={"pk": upload.pk})
+    query = {"sheet": sheet.sheet_index}
+    for name, value in encode_table_params(params).items():
+        query["row" if name == "cursor" else name] = value
+    return f"{url}?{urlencode(query)}"
+
+
+def get_sheet_table_context(
+    upload,
+    sheet,
+    cursor=0,
+    limit=TABLE_PREVIEW_ROWS,
+    col=0,
+    sort=None,
+    order="asc",
+    q="",
+    qcol=None,
+):
+    """Build the context for the _data_table.html and _data_rows.html partials.
+
+    The table renders one window of ``limit`` rows starting at row ``cursor``.
+    Rows are keyed by their position, so a window is read by seeking the
+    chunk index rather than with OFFSET, and the last row of each window
+    fetches the next one when it scrolls into view. Sheets wider than
+    TABLE_COLUMN_WINDOW only render the columns starting at ``col``.
+    Sheets can belong to a shared blob, so links are built from ``upload``.
+
+    Sorting by column ``sort`` and filtering for cells containing ``q``
+    (in column ``qcol``, or anywhere) run over the sheet's columnar copy:
+    a window of the view is sliced from a precomputed sort order and only
+    its rows are gathered from the columns.
+
+    Sheets are parsed on first view when ingestion only stored stubs.
+    """
+    context = {
+        "current_sheet": sheet,
+        "current_sheet_index": sheet.sheet_index,
+        "rows": [],
+    }
+    try:
+        sheet.ensure_parsed()
+    except Exception as e:
+        context["sheet_error"] = str(e)
+        return context
+
+    width = max(sheet.column_count, len(sheet.headers))
+    col = min(col, max(width - 1, 0))
+    col_stop = col + TABLE_COLUMN_WINDOW
+    if sort is not None and sort >= width:
+        sort = None
+    if qcol is not None and qcol >= width:
+        qcol = None
+
+    columns = None
+    if sort is not None or q:
+        columns = ensure_columnar(sheet)
+        if columns is None:
+            context["view_unavailable"] = True
+            sort, q, qcol = None, "", None
+
+    if columns is not None:
+        positions, total_rows = columns.window(
+            cursor, cursor + limit, sort, order == "desc", q, qcol
+        )
+        rows = columns.rows(positions, col, col_stop)
+    else:
+        total_rows = sheet.row_count
+        rows = sheet.get_rows(cursor, cursor + limit)
+        if col or width > TABLE_COLUMN_WINDOW:
+            rows = [row[col:col_stop] for row in rows]
+    cursor = min(cursor, total_rows)
+    next_cursor = cursor + len(rows)
+
+    params = {
+        "cursor": cursor,
+        "limit": limit,
+        "col": col,
+        "sort": sort,
+        "order": order,
+        "q": q,
+        "qcol": qcol,
+    }
+    context.update(
+        {
+            "rows": rows,
+            "total_rows": total_rows,
+            "table_params": params,
+            "filter_url": get_table_url(upload, sheet),
+            "filter_columns": list(enumerate(sheet.headers)),
+            "next_url": None,
+            "earlier_url": None,
+        }
+    )
+
+    headers = []
+    for index, name in enumerate(sheet.headers[col:col_stop], start=col):
+        # Sorting cycles through ascending, descending and unsorted
+        if sort != index:
+            header_sort = {"sort": index, "order": "asc"}
+        elif order == "asc":
+            header_sort = {"sort": index, "order": "desc"}
+        else:
+            header_sort = {"sort": None, "order": "asc"}
+        headers.append(
+            {
+                "name": name,
+                "sorted": order if sort == index else None,
+                "sort_url": get_table_url(
+                    upload, sheet, **{**params, "cursor": 0, **header_sort}
+                ),
+            }
+        )
+    context["headers"] = headers
+
+    if next_cursor < total_rows:
+        context["next_url"] = get_table_url(
+            upload, sheet, "rows", **{**params, "cursor": next_cursor}
+        )
+    if cursor:
+        context["earlier_url"] = get_table_url(upload, sheet, **{**params, "cursor": 0})
+    if width > TABLE_COLUMN_WINDOW:
+        context["column_window"] = {
+            "first": col + 1,
+            "last": min(col_stop, width),
+            "total": width,
+            "prev_url": (
+                get_table_url(
+                    upload,
+                    sheet,
+                    **{**params, "col": max(col - TABLE_COLUMN_WINDOW, 0)},
+                )
+                if col
+                else None
+            ),
+            "next_url": (
+                get_table_url(upload, sheet, **{**params, "col": col_stop})
+                if col_stop < width
+                else None
+            ),
+        }
+    return context
+
+
+def render_sheet_table(request, upload, sheet, template_name, params):
+    """Render a sheet table partial through the fragment cache.
+
+    ``sheet`` may be loaded with ``metadata()``: its content is only fetched
+    when the fragment has to be rendered. Unparsed sheets bypass the cache,
+    since their first view parses them.
+
+    Returns:
+        The HTML and the table context, which is None on a cache hit
+    """
+    table_context = None
+
+    def render_table():
+        nonlocal table_context
+        full_sheet = sheet
+        if sheet.get_deferred_fields():
+            full_sheet = upload.get_sheets().get(pk=sheet.pk)
+        table_context = get_sheet_table_context(upload, full_sheet, **params)
+        return render_to_string(
+            template_name, {"upload": upload, **table_context}, request
+        )
+
+    if sheet.parsed_at is None or not settings.EXCEL_CONFIG["TABLE_CACHE_ENABLED"]:
+        return render_table(), table_context
+
+    key = fragment_key(
+        upload.pk,
+        upload.file_hash,
+        sheet.sheet_index,
+        sheet.parsed_at.isoformat(),
+        template_name,
+        urlencode(encode_table_params(params)),
+        TABLE_TEMPLATE_VERSION,
+    )
+    html, _ = get_or_render(upload.pk, key, render_table)
+    return mark_safe(html), table_context
+
+
+def build_etag(*parts):
+    """Strong ETag value from the inputs that determine a response."""
+    return hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:32]
+
+
+def get_parsed_sheet_state(upload, sheet_index):
+    """``parsed_at`` of an upload's sheet without loading its content.
+
+    Returns None if the sheet does not exist or is not parsed yet.
+    """
+    return (
+        upload.get_sheets()
+        .filter(sheet_index=sheet_index)
+        .values_list("parsed_at", flat=True)
+        .first()
+    )
+
+
+def sheet_data_last_modified(request, pk, sheet_index):
+    """Parsed sheets never change, so they were last modified when parsed."""
+    if not request.user.is_authenticated:
+        return None
+    upload = ExcelUpload.objects.filter(pk=pk, user=request.user).first()
+    return get_parsed_sheet_state(upload, sheet_index) if upload else None
+
+
+def sheet_data_etag(request, pk, sheet_index):
+    """ETag for sheet_data_partial, computed without touching sheet rows.
+
+    Unparsed sheets get none: their first view parses them.
+    """
+    if not request.user.is_authenticated:
+        return None
+    upload = ExcelUpload.objects.filter(pk=pk, user=request.user).first()
+    parsed_at = get_parsed_sheet_state(upload, sheet_index) if upload else None
+    if parsed_at is None:
+        return None
+    return build_etag(
+        upload.file_hash,
+        sheet_index,
+        parsed_at.isoformat(),
+        request.GET.urlencode(),
+        TABLE_TEMPLATE_VERSION,
+    )
+
+
+def detail_etag(request, pk):
+    """ETag for ExcelDetailView.
+
+    Besides the shown sheet, the page reflects the upload's AI validation
+    and embeds the user's CSRF token, so both are part of the tag.
+    """
+    if not request.user.is_authenticated:
+        return None
+    upload = ExcelUpload.objects.filter(pk=pk, user=request.user).first()
+    if upload is None or upload.status != ExcelUpload.STATUS_COMPLETED:
+        return None
+
+    sheets = list(upload.get_sheets().values_list("sheet_index", "parsed_at"))
+    if not sheets:
+        return None
+    _, parsed_at = get_requested_sheet(request.GET, sheets)
+    # Lazy stubs are parsed while the page renders
+    if parsed_at is None:
+        return None
+
+    validation = upload.ai_validations.values_list("pk", "validated_at").first()
+    recent = bool(validation and validation[1] >= timezone.now() - timedelta(hours=1))
+    job = get_active_job(upload)
+    return build_etag(
+        upload.file_hash,
+        request.GET.urlencode(),
+        parsed_at.isoformat(),
+        validation[0] if validation else None,
+        recent,
+        job.pk if job else None,
+        settings.AI_CONFIG["ENABLED"],
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+        TABLE_TEMPLATE_VERSION,
+    )
+
+
+@method_decorator(condition(etag_func=detail_etag), name="get")
 class ExcelDetailView(LoginRequiredMixin, DetailView):
     """View for displaying Excel file contents."""
 
@@ -207,9 +537,7 @@ class ExcelDetailView(LoginRequiredMixin, DetailView):
 
     def get_queryset(self):
         """Ensure users can only view their own uploads."""
-        return ExcelUpload.objects.filter(user=self.request.user).prefetch_related(
-            "sheets"
-        )
+        return ExcelUpload.objects.filter(user=self.request.user)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -225,173 +553,118 @@ class ExcelDetailView(LoginRequiredMixin, DetailView):
         ).first()
         context["recent_validation"] = recent_validation
         context["has_cached_validation"] = recent_validation is not None
+        # Keep polling a validation started before the page was (re)loaded
+        context["validation_job"] = get_active_job(self.object)
 
-        # Get the requested sheet or default to first
-        sheet_index = self.request.GET.get("sheet", 0)
-        try:
-            sheet_index = int(sheet_index)
-        except (ValueError, TypeError):
-            sheet_index = 0
-
-        # Get all sheets for tabs
-        sheets = list(self.object.sheets.all())
+        # Tabs only need names and counts, not every sheet's content
+        sheets = list(self.object.get_sheets().metadata())
         context["sheets"] = sheets
 
         # Get current sheet data
         if sheets:
-            current_sheet = sheets[min(sheet_index, len(sheets) - 1)]
-            context["current_sheet"] = current_sheet
-            context["current_sheet_index"] = current_sheet.sheet_index
+            # Get the requested sheet or default to first
+            current = get_requested_sheet(self.request.GET, sheets)
+            context["current_sheet"] = current
+            context["current_sheet_index"] = current.sheet_index
+            # Reopen the table where the URL says the user had scrolled to
+            table_html, table_context = render_sheet_table(
+                self.request,
+                self.object,
+                current,
+                "excel_manager/partials/_data_table.html",
+                get_table_params(self.request.GET, "row"),
+            )
+            context["table_html"] = table_html
+            context.update(table_context or {})
         else:
             context["current_sheet"] = None
             context["current_sheet_index"] = 0
 
         return context
 
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        # Always revalidate; unchanged pages come back as 304 via the ETag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
-def sheet_data_partial(request, pk, sheet_index):
-    """HTMX partial for switching between sheets."""
-    if not request.user.is_authenticated:
-        return render(request, "403.html", status=403)
-
-    upload = get_object_or_404(ExcelUpload, pk=pk, user=request.user)
-    sheet = get_object_or_404(ExcelData, upload=upload, sheet_index=sheet_index)
-
-    context = {
-        "upload": upload,
-        "current_sheet": sheet,
-        "current_sheet_index": sheet_index,
-    }
-
-    return render(request, "excel_manager/partials/_data_table.html", context)
 
+class ExcelSearchView(LoginRequiredMixin, TemplateView):
+    """Search the cells of every sheet the user has uploaded.
 
-# AI Validation Constants
-VALIDATION_SYSTEM_PROMPT = """You are a data quality analyst. Analyze Excel data and return ONLY valid JSON without any markdown formatting or code blocks.
+    HTMX requests only get the results partial.
+    """
 
-Return exactly this structure (no markdown, no ```json blocks, just raw JSON):
-{
-  "valid_rows": integer,
-  "warning_rows": integer,
-  "error_rows": integer,
-  "issues": [
-    {"row": integer, "column": string, "issue": string, "severity": "error"|"warning"}
-  ],
-  "summary": string (2-3 sentences),
-  "suggestions": [string],
-  "severity": "low"|"medium"|"high"
-}
+    template_name = "excel_manager/search.html"
 
-Focus on: missing values, format inconsistencies, data type errors, duplicates, logical errors.
-IMPORTANT: Return ONLY the JSON object, no explanations, no markdown."""
-
-
-def format_validation_prompt(data):
-    """Format Excel data for validation, optimizing token usage."""
-    columns = data.get("columns", [])
-    rows = data.get("sample", [])
-    total_rows = data.get("total_rows", 0)
-
-    # Format data for AI
-    formatted_rows = []
-    for i, row in enumerate(rows[:50], 1):  # Limit to 50 rows for token optimization
-        row_dict = {col: val for col, val in zip(columns, row)}
-        formatted_rows.append(f"Row {i}: {row_dict}")
-
-    prompt = f"""Validate this Excel data:
-
-Sheet: {data.get('sheet_name', 'Sheet1')}
-Total rows in file: {total_rows}
-Columns: {', '.join(columns)}
-
-Sample data (first 50 rows):
-{chr(10).join(formatted_rows)}
-
-Analyze for data quality issues and return JSON as specified."""
-
-    return prompt
-
-
-def validate_excel_with_ai(excel_upload):
-    """Validate Excel data using AI service."""
-    start_time = time.time()
-
-    # Initialize AI service
-    service = AIService()
+    def get_template_names(self):
+        if hasattr(self.request, "htmx") and self.request.htmx:
+            return ["excel_manager/partials/_search_results.html"]
+        return [self.template_name]
 
-    # Prepare data sample
-    data_sample = excel_upload.get_preview_data(rows=100)
-    if not data_sample.get("sample"):
-        raise ValueError("No data to validate")
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get("q", "").strip()[:TABLE_MAX_FILTER_LENGTH]
+        try:
+            page = max(int(self.request.GET.get("page", 1)), 1)
+        except (ValueError, TypeError):
+            page = 1
+
+        hits, has_next = search_cells(self.request.user, query, page)
+        context.update(
+            {
+                "title": "Search",
+                "query": query,
+                "hits": hits,
+                "page": page,
+                "has_next": has_next,
+                "unindexed_sheets": (
+                    count_unindexed_sheets(self.request.user) if query else 0
+                ),
+            }
+        )
+        return context
 
-    prompt = format_validation_prompt(data_sample)
 
-    # Send to AI for validation
-    result = service.send_message(prompt=prompt, system=VALIDATION_SYSTEM_PROMPT)
+def file_list_partial(request):
+    """HTMX partial for refreshing the file list while uploads are ingested."""
+    if not request.user.is_authenticated:
+        return render(request, "403.html", status=403)
 
-    if not result.get("success"):
-        raise Exception(f"AI validation failed: {result.get('error', 'Unknown error')}")
+    return render(
+        request,
+        "excel_manager/partials/_file_list.html",
+        get_file_list_context(request.user),
+    )
 
-    # Parse AI response
-    content = result["content"]
 
-    # Remove markdown code blocks if present
-    if "```json" in content:
-        content = content.split("```json")[1].split("```")[0].strip()
-    elif "```" in content:
-        content = content.split("```")[1].split("```")[0].strip()
+@condition(etag_func=sheet_data_etag, last_modified_func=sheet_data_last_modified)
+def sheet_data_partial(request, pk, sheet_index):
+    """HTMX partial for switching sheets and scrolling, sorting and filtering rows.
 
-    try:
-        validation_result = json.loads(content)
-    except json.JSONDecodeError:
-        # Try to extract JSON from the content
-        import re
-        json_match = re.search(r'\{[^{}]*"valid_rows"[^{}]*\}', result["content"], re.DOTALL)
-        if json_match:
-            try:
-                validation_result = json.loads(json_match.group())
-            except:
-                # If AI didn't return valid JSON, create a basic structure
-                validation_result = {
-                    "valid_rows": 0,
-                    "warning_rows": 0,
-                    "error_rows": 0,
-                    "issues": [],
-                    "summary": result["content"][:500],
-                    "suggestions": [],
-                    "severity": "unknown",
-                }
-        else:
-            validation_result = {
-                "valid_rows": 0,
-                "warning_rows": 0,
-                "error_rows": 0,
-                "issues": [],
-                "summary": result["content"][:500],
-                "suggestions": [],
-                "severity": "unknown",
-            }
+    ``part=rows`` returns only the next window of table rows for infinite
+    scroll. Every response records the window in the browser URL so a
+    reload reopens the table at the same position.
+    """
+    if not request.user.is_authenticated:
+        return render(request, "403.html", status=403)
 
-    # Calculate response time
-    response_time_ms = int((time.time() - start_time) * 1000)
-
-    # Extract suggestions if present
-    suggestions_text = "\n".join(validation_result.get("suggestions", []))
-
-    # Create validation record
-    validation = AIValidation.objects.create(
-        excel_upload=excel_upload,
-        validation_result=validation_result,
-        issues_found=len(validation_result.get("issues", [])),
-        suggestions=suggestions_text,
-        ai_metadata={
-            "tokens": result.get("usage", {}),
-            "model": result.get("model", settings.AI_CONFIG.get("MODEL")),
-            "response_time_ms": response_time_ms,
-        },
+    upload = get_object_or_404(ExcelUpload, pk=pk, user=request.user)
+    sheet = get_object_or_404(upload.get_sheets().metadata(), sheet_index=sheet_index)
+
+    params = get_table_params(request.GET)
+    if request.GET.get("part") == "rows":
+        template = "excel_manager/partials/_data_rows.html"
+    else:
+        template = "excel_manager/partials/_data_table.html"
+    html, context = render_sheet_table(request, upload, sheet, template, params)
+
+    response = HttpResponse(html)
+    response["HX-Replace-Url"] = get_detail_url(
+        upload, sheet, **(context or {}).get("table_params", params)
     )
-
-    return validation
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 class ValidateWithAIView(LoginRequiredMixin, View):
@@ -444,24 +717,139 @@ class ValidateWithAIView(LoginRequiredMixin, View):
                 },
             )
 
-        # Perform new validation
-        logger.info("Performing fresh validation")
+        # Validation runs in the background; the page polls the job
         try:
-            validation = validate_excel_with_ai(excel_upload)
-            logger.info(f"Fresh validation completed: {validation.id}")
+            job = enqueue_validation(excel_upload)
+        except ValidationLimitError as e:
             return render(
+                request,
+                "excel_manager/partials/_ai_validation_error.html",
+                {"error": str(e)},
+                status=429,
+            )
+        logger.info(f"Queued validation job {job.pk}")
+
+        if settings.EXCEL_CONFIG["VALIDATION_EAGER"]:
+            run_validation_job(job)
+        return render_validation_job(request, job, failed_status=500)
+
+
+class AsyncValidateWithAIView(View):
+    """ValidateWithAIView for ASGI deployments (EXCEL_CONFIG["VALIDATION_ASYNC"]).
+
+    Awaiting the Claude API holds no worker thread under ASGI, so the
+    validation runs inside the request instead of in a validation worker.
+    It is still recorded as a ValidationJob, leased to this process, so the
+    per-user limit and the one-validation-per-upload rule apply.
+    """
+
+    async def post(self, request, pk):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+
+        if not settings.AI_CONFIG.get("ENABLED", False):
+            return await arender(
+                request,
+                "excel_manager/partials/_ai_validation_error.html",
+                {"error": "AI features are currently disabled"},
+                status=503,
+            )
+
+        excel_upload = await aget_object_or_404(ExcelUpload, pk=pk, user=user)
+
+        recent_validation = None
+        if request.POST.get("force_refresh", "false") != "true":
+            recent_validation = await excel_upload.ai_validations.filter(
+                validated_at__gte=timezone.now() - timedelta(hours=1)
+            ).afirst()
+        if recent_validation:
+            return await arender(
                 request,
                 "excel_manager/partials/_ai_validation_result.html",
-                {"validation": validation, "cached": False, "upload": excel_upload},
+                {
+                    "validation": recent_validation,
+                    "cached": True,
+                    "upload": excel_upload,
+                },
+            )
+
+        try:
+            job, started = await sync_to_async(start_validation)(
+                excel_upload, get_worker_id()
             )
+        except ValidationLimitError as e:
+            return await arender(
+                request,
+                "excel_manager/partials/_ai_validation_error.html",
+                {"error": str(e)},
+                status=429,
+            )
+        if not started:
+            # Another request or a worker is validating this upload already
+            return await sync_to_async(render_validation_job)(request, job)
+
+        try:
+            validation = await avalidate_excel_with_ai(
+                excel_upload, heartbeat=partial(renew_lease, job)
+            )
+        except LeaseLostError:
+            # The request outlived its lease and a worker took the job over
+            await job.arefresh_from_db()
+            return await sync_to_async(render_validation_job)(request, job)
         except Exception as e:
-            logger.error(f"Validation failed: {str(e)}")
-            return render(
+            await sync_to_async(finish_validation_job)(job, error=str(e))
+            return await arender(
                 request,
                 "excel_manager/partials/_ai_validation_error.html",
                 {"error": str(e)},
                 status=500,
             )
+        await sync_to_async(finish_validation_job)(job, validation=validation)
+        return await arender(
+            request,
+            "excel_manager/partials/_ai_validation_result.html",
+            {"validation": validation, "cached": False, "upload": excel_upload},
+        )
+
+
+def render_validation_job(request, job, failed_status=200):
+    """Render a validation job: its result, its error, or a polling placeholder.
+
+    HTMX only swaps successful responses, so polls report failures with 200.
+    """
+    if job.status == ValidationJob.STATUS_DONE:
+        return render(
+            request,
+            "excel_manager/partials/_ai_validation_result.html",
+            {"validation": job.validation, "cached": False, "upload": job.excel_upload},
+        )
+    if job.status == ValidationJob.STATUS_FAILED:
+        return render(
+            request,
+            "excel_manager/partials/_ai_validation_error.html",
+            {"error": job.error},
+            status=failed_status,
+        )
+    return render(
+        request,
+        "excel_manager/partials/_ai_validation_loading.html",
+        {"job": job},
+        status=202,
+    )
+
+
+class ValidationJobStatusView(LoginRequiredMixin, View):
+    """HTMX endpoint polled while a validation job is queued or running."""
+
+    def get(self, request, pk, job_pk):
+        job = get_object_or_404(
+            ValidationJob.objects.select_related("excel_upload", "validation"),
+            pk=job_pk,
+            excel_upload__pk=pk,
+            user=request.user,
+        )
+        return render_validation_job(request, job)
 
 
 class DeleteExcelView(LoginRequiredMixin, View):
@@ -471,23 +859,25 @@ class DeleteExcelView(LoginRequiredMixin, View):
         """Handle delete request."""
         excel_upload = get_object_or_404(ExcelUpload, pk=pk, user=request.user)
 
-        # Delete the file from storage if it exists
-        if excel_upload.file:
+        blob_id = excel_upload.blob_id
+        invalidate_upload(excel_upload.pk)
+        if not blob_id and excel_upload.file:
+            # Delete the file from storage if it exists
+            delete_columnar(excel_upload.file)
             excel_upload.file.delete()
 
         # Delete the database record (cascade will handle related data)
         excel_upload.delete()
 
+        # Shared content goes away with its last reference
+        if blob_id:
+            release_blob(blob_id)
+
         # Return updated file list for HTMX
         if hasattr(request, "htmx") and request.htmx:
-            uploads = ExcelUpload.objects.filter(
-                user=request.user
-            ).select_related("user")[:10]
-            return render(
-                request,
-                "excel_manager/partials/_file_list.html",
-                {"uploads": uploads, "success_message": "File deleted successfully"}
-            )
+            context = get_file_list_context(request.user)
+            context["success_message"] = "File deleted successfully"
+            return render(request, "excel_manager/partials/_file_list.html", context)
 
         messages.success(request, "Excel file deleted successfully")
         return redirect("excel_manager:index")
@@ -133,6 +133,11 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Upload handling: hash, sniff and spool uploads to disk in a single pass
+FILE_UPLOAD_HANDLERS = [
+    'apps.excel_manager.upload_handlers.SinglePassUploadHandler',
+]
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -251,5 +256,62 @@ AI_CONFIG = {
     'ANTHROPIC_API_KEY': os.environ.get('ANTHROPIC_API_KEY'),
     'MODEL': os.environ.get('CLAUDE_MODEL', 'claude-sonnet-4-20250514'),
     'MAX_TOKENS': int(os.environ.get('CLAUDE_MAX_TOKENS', '1000')),
-    'TIMEOUT': 30,  # seconds
-}
\ No newline at end of file
+    'TIMEOUT': 30,  # seconds to wait for each read or write
+    'CONNECT_TIMEOUT': 5,  # seconds to open a connection
+    'POOL_TIMEOUT': 10,  # seconds to wait for a free pooled connection
+    'MAX_RETRIES': 2,
+    # Connections kept per process by the shared client
+    'MAX_CONNECTIONS': int(os.environ.get('CLAUDE_MAX_CONNECTIONS', '20')),
+    'MAX_KEEPALIVE_CONNECTIONS': 10,
+    'KEEPALIVE_EXPIRY': 60,  # seconds an idle connection stays open
+    # Prompts AsyncAIService.send_messages() has in flight at once
+    'MAX_CONCURRENT_REQUESTS': int(os.environ.get('CLAUDE_MAX_CONCURRENT_REQUESTS', '4')),
+}
+# Excel ingestion configuration
+EXCEL_CONFIG = {
+    # Parse uploads inside the request instead of via run_ingest_workers
+    'INGEST_EAGER': os.environ.get('EXCEL_INGEST_EAGER', 'False') == 'True',
+    'INGEST_MAX_ATTEMPTS': int(os.environ.get('EXCEL_INGEST_MAX_ATTEMPTS', '3')),
+    'INGEST_LEASE_SECONDS': int(os.environ.get('EXCEL_INGEST_LEASE_SECONDS', '300')),
+    'INGEST_RETRY_BACKOFF': 30,  # seconds, doubled per attempt
+    'INGEST_POLL_INTERVAL': 2,  # seconds between empty queue polls
+    'INGEST_MAX_JOBS_PER_WORKER': int(os.environ.get('EXCEL_INGEST_MAX_JOBS', '100')),
+    'INGEST_BATCH_ROWS': 1000,  # rows buffered per sheet before writing
+    # Only list sheets at upload; parse each sheet's rows when first viewed
+    'INGEST_LAZY_SHEETS': os.environ.get('EXCEL_INGEST_LAZY_SHEETS', 'True') == 'True',
+    # Processes parsing sheets of one workbook in parallel; 0 parses serially
+    'INGEST_PARSE_WORKERS': int(os.environ.get('EXCEL_INGEST_PARSE_WORKERS', '0')),
+    # Smaller workbooks are parsed serially even when workers are configured
+    'INGEST_PARALLEL_MIN_BYTES': 5 * 1024 * 1024,
+    # Sheet parser: 'auto', 'openpyxl' or 'lxml' (.xls always uses xlrd)
+    'INGEST_PARSER': os.environ.get('EXCEL_INGEST_PARSER', 'auto'),
+    # With 'auto', .xlsx files from this size up use the lxml engine
+    'INGEST_LXML_MIN_BYTES': 256 * 1024,
+    # Write memory-mapped NumPy columns next to each workbook
+    'COLUMNAR_ENABLED': os.environ.get('EXCEL_COLUMNAR_ENABLED', 'True') == 'True',
+    # Index cell text at ingest for search across uploads
+    'SEARCH_INDEX_ENABLED': os.environ.get('EXCEL_SEARCH_INDEX_ENABLED', 'True') == 'True',
+    # Cache rendered sheet table windows in the default cache
+    'TABLE_CACHE_ENABLED': os.environ.get('EXCEL_TABLE_CACHE_ENABLED', 'True') == 'True',
+    'TABLE_CACHE_SECONDS': int(os.environ.get('EXCEL_TABLE_CACHE_SECONDS', '3600')),
+    # Larger fragments are rendered on every request
+    'TABLE_CACHE_MAX_FRAGMENT_BYTES': 512 * 1024,
+    # Oldest fragments of an upload are evicted past this total
+    'TABLE_CACHE_UPLOAD_BYTES': 4 * 1024 * 1024,
+    # Run AI validation inside the request instead of via run_validation_workers
+    'VALIDATION_EAGER': os.environ.get('EXCEL_VALIDATION_EAGER', 'False') == 'True',
+    # Validate every sheet with rows, not just the first, in concurrent calls
+    'VALIDATION_ALL_SHEETS': os.environ.get('EXCEL_VALIDATION_ALL_SHEETS', 'True') == 'True',
+    # Validate every row in token-budgeted chunks instead of a 50-row sample
+    'VALIDATION_FULL_COVERAGE': os.environ.get('EXCEL_VALIDATION_FULL_COVERAGE', 'False') == 'True',
+    'VALIDATION_CHUNK_TOKENS': 6000,  # estimated prompt tokens of each chunk's rows
+    # Under ASGI, validate inside an async view instead of queueing a job
+    'VALIDATION_ASYNC': os.environ.get('EXCEL_VALIDATION_ASYNC', 'False') == 'True',
+    # Validations one worker process runs at once (they mostly wait on the API)
+    'VALIDATION_WORKER_CONCURRENCY': int(os.environ.get('EXCEL_VALIDATION_CONCURRENCY', '4')),
+    # Queued or running validations allowed per user
+    'VALIDATION_MAX_PER_USER': int(os.environ.get('EXCEL_VALIDATION_MAX_PER_USER', '2')),
+    'VALIDATION_LEASE_SECONDS': 120,  # renewed after each reply from the API
+    'VALIDATION_MAX_ATTEMPTS': 2,  # leases of a job whose worker died
+    'VALIDATION_POLL_INTERVAL': 1,  # seconds between empty queue polls
+}
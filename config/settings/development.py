@@ -54,6 +54,9 @@ LOGGING['loggers']['django.db.backends'] = {
     'propagate': False,
 }
 
+# Parse uploads in-process unless a worker is explicitly used
+EXCEL_CONFIG['INGEST_EAGER'] = os.environ.get('EXCEL_INGEST_EAGER', 'True') == 'True'
+
 # Tailwind CSS is now handled as a build tool, not a Django app
 
 # Authentication settings for development
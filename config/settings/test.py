@@ -51,4 +51,8 @@ LOGGING_CONFIG = None
 CELERY_TASK_ALWAYS_EAGER = True
 CELERY_TASK_EAGER_PROPAGATES = True
 
+# Parse uploads synchronously so tests see finished ingestion
+# and AI validation without a worker
+EXCEL_CONFIG = {**EXCEL_CONFIG, 'INGEST_EAGER': True, 'VALIDATION_EAGER': True}
+
 print("🧪 Running in TEST mode")
\ No newline at end of file